@@ -8,43 +8,62 @@
 # - "/"              → Ana yönlendirme (ileride dashboard'a bağlanabilir)
 # - "/train"         → Eğitim arayüzü (train.html)
 # - "/train-model"   → POST ile eğitim başlatma
-# - "/check-updates" → JSON & görsel güncellemelerini kontrol eder
+# - "/check-updates" → JSON & görsel güncellemelerini kontrol eder (eklenen / değişen / silinen dosyalar, aşama süreleri)
 # - "/find-similar"  → Benzer desen görsellerini getirir
+#                       (varsayılan "hızlı tam" mod: normalize float32 mat-vec + argpartition top-k;
+#                        ?index=ivf|faiss-ivf|faiss-hnsw ile ANN indeksi kullanılır;
+#                        knn_graph.py ile üretilmiş güncel kNN grafı varsa önce graftan cevaplanır;
+#                        ?quant=float16|int8|pq&rerank=N ile sıkıştırılmış feature'lar üzerinde aranır;
+#                        ?page_size=N ile ilk sayfa + cursor, ?stream=1 ile NDJSON akışı döner)
+# - "/find-similar/page" → find-similar cursor'ı ile sonraki sayfayı getirir (yeniden puanlama yapılmaz)
 # - "/realImages/<path:filename>" → Gerçek görselleri sunar
+# - "/metadata/query" → Sol panel için filtreli / sıralı / sayfalı metadata (ETag + If-None-Match)
 # - "/create-cluster" → Seçilen görsellerle yeni cluster oluşturur
-
-from flask import Flask, render_template, request, jsonify, send_from_directory
+# - "/bulk-assign-clusters" → (görsel, hedef cluster) listesini tek geçişte uygular, üyelik farkını döner
+# - "/find-similar-batch" → Çok sayıda sorgu görseli veya çoklu anchor (centroid / sum) ile toplu arama
+# - "/find-similar-upload" → Yüklenen (katalog dışı) görseli bellekteki modelle gömüp katalogda arar
+# - "/find-similar-fused" → pattern / color / texture modellerini ağırlıklarla tek geçişte birleştirerek arar
+# - "/feature-store/stats"  → Bellekteki feature deposunun yükleme süreleri
+# - "/feature-store/reload" → Feature deposunu zorla yeniden yükler
+# - "/find-similar/cache-stats" → find-similar LRU sonuç önbelleğinin sayaçları
+# - "/submit-feedback" → Yıldız oyunu append-only feedback_log.jsonl günlüğüne ekler
+# - "/feedback/summary" → Anchor veya model / versiyon bazında feedback özetleri (günlük taranmaz)
+# Metadata yazmaları SQLite (WAL) deposuna gider (metadata_store.py);
+# /image_metadata_map.json istendiğinde depo JSON'a export edilir.
+
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response
 import json
 import subprocess
 import sys
 import os
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
 import shutil
 from datetime import datetime
 import json
 import os
 import random
 import traceback
+import hashlib
+from feature_store import feature_store, MODEL_TYPES
+from metadata_store import metadata_db
+from metadata_filter import canonical_filters
+from feedback_log import feedback_log
+import cluster_ops
+import similarity_index
+import knn_graph
+from result_cache import similar_cache, filter_hash
+from result_cursor import ranked_results, make_cursor, parse_cursor
+import quantize_features
+import embedding_model
+from image_io import open_image
 
 app = Flask(__name__)
 
 # Metadata güncelleme yardımcı fonksiyonu
 def update_metadata(filename, updates):
-    """Görsel metadatasını günceller"""
-    metadata_path = "image_metadata_map.json"
+    """Görsel metadatasını günceller (SQLite deposunda tek transaction)"""
     try:
-        with open(metadata_path, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-        
-        if filename in metadata:
-            metadata[filename].update(updates)
-        else:
-            metadata[filename] = updates
-            
-        with open(metadata_path, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-            
+        metadata_db.update_many({filename: updates})
         return True
     except Exception as e:
         print(f"Metadata güncelleme hatası: {str(e)}")
@@ -95,8 +114,61 @@ def train_model_route():
 
 @app.route('/image_metadata_map.json')
 def serve_metadata_map():
+    # Depoda JSON'a yansımamış değişiklik varsa önce export edilir (geriye uyumluluk)
+    metadata_db.sync_from_json()
+    metadata_db.export_json()
     return send_from_directory('.', 'image_metadata_map.json')
 
+METADATA_PAGE_MAX = 1000
+
+
+@app.route("/metadata/query", methods=["GET", "POST"])
+def metadata_query():
+    """Sol panel için sunucu tarafında filtrelenmiş, sıralanmış ve sayfalanmış metadata.
+    Filtreler (POST gövdesi veya GET ?filters=) find_similar filtreleriyle aynıdır
+    (mixFilters / features / cluster; ek olarak season / quality / design listeleri). ?sort=position|filename|design|season|quality|cluster
+    &order=asc|desc&offset=0&limit=100. Yanıt ETag taşır; If-None-Match tutarsa 304 döner."""
+    try:
+        if request.method == "POST":
+            filters = request.get_json(silent=True) or {}
+        else:
+            # GET'te filtreler ?filters=<json> ile gelir (tarayıcı önbelleği / If-None-Match yalnızca GET'te çalışır)
+            filters = json.loads(request.args.get("filters") or "{}")
+    except ValueError:
+        return jsonify({"status": "error", "message": "filters geçerli bir JSON değil"}), 400
+    sort = request.args.get("sort", "position")
+    descending = request.args.get("order", "asc") == "desc"
+    offset = max(0, int(request.args.get("offset", 0)))
+    limit = min(METADATA_PAGE_MAX, max(1, int(request.args.get("limit", 100))))
+
+    # ETag: depo sürümü + sorgu; veri değişmediyse sorgu hiç çalıştırılmaz
+    metadata_db.sync_from_json()
+    etag = hashlib.sha1(
+        f"{metadata_db.version()}|{canonical_filters(filters)}|{sort}|{descending}|{offset}|{limit}".encode("utf-8")
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    try:
+        total, page = metadata_db.query(filters, sort, descending, offset, limit)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"status": "error", "message": f"Geçersiz sorgu: {e}"}), 400
+
+    response = jsonify({
+        "items": [{"filename": fname, **entry} for fname, entry in page.items()],
+        "total": total,
+        "catalog_total": metadata_db.count(),
+        "offset": offset,
+        "limit": limit,
+        "htypes": metadata_db.htypes(),
+    })
+    response.set_etag(etag)
+    # Tarayıcı her seferinde doğrulasın (If-None-Match); değişmeyen sayfa 304 ile gövdesiz döner
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @app.route('/realImages/<path:filename>')
 def serve_real_image(filename):
     return send_from_directory('realImages', filename)
@@ -107,7 +179,8 @@ def check_updates():
         from check_updates import check_for_updates
         updated = check_for_updates()
         if updated:
-            return jsonify({"status": "🔄 Değişiklik algılandı: metadata yeniden oluşturuluyor..."})
+            return jsonify({"status": f"🔄 Değişiklik algılandı ({updated.changes.summary()}): {updated.summary()}",
+                            **updated.to_dict()})
         else:
             return jsonify({"status": "✅ Değişiklik yok, metadata güncel."})
     except Exception as ex:
@@ -128,88 +201,395 @@ def find_similar():
     model = request.args.get("model", "pattern")
     topN = int(request.args.get("topN", 100))
     metric = request.args.get("metric", "cosine")
+    # "exact" (varsayılan) veya similarity_index backend'lerinden biri: ivf / faiss-ivf / faiss-hnsw
+    index_backend = request.args.get("index", "exact")
+    # Sıkıştırılmış arama: quantize_features.py çıktısı (float16 / int8 / pq) + opsiyonel tam yeniden sıralama
+    quant_mode = request.args.get("quant")
+    # Sayfalı (page_size) veya akış (stream=1) yanıt; ikisi de verilmezse tek JSON listesi
+    page_size = max(0, int(request.args.get("page_size", 0)))
+    stream = request.args.get("stream") in ("1", "true")
+    if quant_mode:
+        rerank = int(request.args.get("rerank", 0))
+        return _find_similar_quantized(filename, model, metric, topN, quant_mode, rerank, filters,
+                                       page_size, stream)
+
+    # Feature matrisi, filename indeksi ve metadata bellekteki depodan gelir
+    store = feature_store.get(model)
+    if store is None:
+        return jsonify([])
+    features = store.features
+    filenames = store.filenames
+    meta_snapshot = feature_store.metadata()
+    metadata = meta_snapshot.data
 
-    feature_path = f"image_features/{model}_features.npy"
-    index_path = f"image_features/{model}_filenames.json"
-    metadata_path = "image_metadata_map.json"
+    idx = store.row(filename)
+    if idx is None:
+        return jsonify([])
 
-    if not os.path.exists(feature_path) or not os.path.exists(index_path):
+    if metric not in similarity_index.METRICS:
         return jsonify([])
 
-    features = np.load(feature_path)
-    with open(index_path, "r", encoding="utf-8") as f:
-        filenames = json.load(f)
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    # 💾 Aynı sorgu + filtre + veri sürümü için önbellekteki hazır gövdeyi döndür
+    # (tek parça liste ve NDJSON akışı ayrı anahtarla saklanır; sayfalı yanıt önbelleğe girmez)
+    use_cache = not page_size
+    cache_key = (filename, model, metric, topN, index_backend, filter_hash(filters), "ndjson" if stream else "json")
+    cache_version = (store.signature, meta_snapshot.signature)
+    cached_body = similar_cache.get(cache_key, cache_version) if use_cache else None
+    if cached_body is not None:
+        return app.response_class(cached_body, mimetype="application/x-ndjson" if stream else "application/json")
+
+    # 🎯 Filtre varsa sütunsal filtre indeksinden bool maske derle (aynı filtreler önbellekten gelir);
+    # maske özellik matrisini kopyalamadan doğrudan puan vektörüne uygulanır
+    allowed_mask = None
+    if filters:
+        allowed_mask = feature_store.filter_index(store, meta_snapshot).mask(filters)
+        if not allowed_mask.any():
+            return jsonify([])
+
+    graph = knn_graph.load_graph(store, metric) if index_backend == "exact" else None
+    graph_hit = None
+    if graph is not None:
+        # 🕸️ Önceden hesaplanmış kNN grafı: filtresiz sorgular doğrudan, filtreliler
+        # graf satırında yeterli aday kaldıkça buradan cevaplanır
+        allowed_count = int(np.count_nonzero(allowed_mask)) if allowed_mask is not None else None
+        graph_hit = graph.lookup(idx, topN, allowed_mask, allowed_count)
+
+    if graph_hit is not None:
+        rows, sims = graph_hit
+    elif index_backend == "exact":
+        # ⚡ Hızlı tam arama: feature store'daki normalize float32 kopya (cosine) veya
+        # ham matris + kare normlar (euclidean) üzerinde tek mat-vec, argpartition ile top-k.
+        # Sonuçlar sklearn cosine_similarity / euclidean_distances + tam argsort ile aynıdır.
+        vectors = store.vectors_for(metric)
+        rows, sims = similarity_index.exact_search(vectors, store.sq_norms, vectors[idx], metric, topN, allowed_mask)
+    elif index_backend in similarity_index.BACKENDS:
+        # ANN indeksi üzerinden ara (filtre sonrası sonuç yetmezse tam aramaya düşer)
+        rows, sims = similarity_index.search(store, index_backend, metric, features[idx], topN, allowed=allowed_mask)
+    else:
+        return jsonify([])
 
-    if filename not in filenames:
+    if page_size or stream:
+        # Akış tamamlanınca gövde önbelleğe yazılır
+        on_complete = (lambda body: similar_cache.put(cache_key, cache_version, body)) if use_cache else None
+        return _ranked_response(rows, sims, filenames, metadata, page_size, stream, on_complete)
+
+    final_results = [
+        _similar_result(filenames[row], metadata, sim) for row, sim in zip(rows.tolist(), sims.tolist())
+    ]
+    response = jsonify(final_results)
+    similar_cache.put(cache_key, cache_version, response.get_data())
+    return response
+
+
+def _find_similar_quantized(filename, model, metric, topN, quant_mode, rerank, filters,
+                            page_size=0, stream=False):
+    """find_similar'ın sıkıştırılmış feature'lar üzerinde çalışan yolu (float32 matris belleğe alınmaz)."""
+    if quant_mode not in quantize_features.QUANT_MODES or metric not in similarity_index.METRICS:
         return jsonify([])
+    qf = quantize_features.get_quantized(model, quant_mode)
+    if qf is None:
+        return jsonify([])
+    meta_snapshot = feature_store.metadata()
 
-    idx = filenames.index(filename)
-    query_vector = features[idx].reshape(1, -1)
+    idx = qf.row(filename)
+    if idx is None:
+        return jsonify([])
 
-    # 🎯 Eğer filtre varsa, sadece filtreyi geçen indeksleri topla
-    allowed_indices = []
+    allowed_mask = None
     if filters:
-        mix_filters = filters.get("mixFilters", [])
-        feature_filters = filters.get("features", [])
-        cluster_status = filters.get("cluster", "")
+        allowed_mask = feature_store.filter_index(qf, meta_snapshot).mask(filters)
+        if not allowed_mask.any():
+            return jsonify([])
+
+    rows, sims = quantize_features.quantized_search(qf, idx, metric, topN, allowed_mask, rerank)
+    if page_size or stream:
+        return _ranked_response(rows, sims, qf.filenames, meta_snapshot.data, page_size, stream)
+    return jsonify([
+        _similar_result(qf.filenames[row], meta_snapshot.data, sim) for row, sim in zip(rows.tolist(), sims.tolist())
+    ])
+
+
+STREAM_CHUNK_ROWS = 64
+
+
+def _ranked_response(rows, sims, filenames, metadata, page_size, stream, on_complete=None):
+    """Sıralanmış sonuçları NDJSON akışı (stream) veya ilk sayfa + cursor (page_size) olarak döner.
+    on_complete verilirse akış sonuna kadar gönderildiğinde tüm NDJSON gövdesiyle (bytes) çağrılır."""
+    if stream:
+        def generate():
+            # Satırlar küçük parçalar halinde serileştirilir; istemci ilk sonuçları tümü hazır olmadan alır
+            row_list, sim_list = rows.tolist(), sims.tolist()
+            parts = []
+            for start in range(0, len(row_list), STREAM_CHUNK_ROWS):
+                chunk = zip(row_list[start:start + STREAM_CHUNK_ROWS], sim_list[start:start + STREAM_CHUNK_ROWS])
+                part = "".join(
+                    json.dumps(_similar_result(filenames[row], metadata, sim), ensure_ascii=False) + "\n"
+                    for row, sim in chunk
+                )
+                parts.append(part)
+                yield part
+            if on_complete is not None:
+                on_complete("".join(parts).encode("utf-8"))
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    result_id, result_set = ranked_results.put(rows, sims, filenames, metadata, page_size)
+    return jsonify(_result_page(result_id, result_set, 0, page_size))
+
+
+def _result_page(result_id, result_set, offset, page_size):
+    """Saklanan sonuç kümesinden [offset, offset + page_size) dilimini ve sonraki cursor'ı döner."""
+    end = min(offset + page_size, result_set.total)
+    rows = result_set.rows[offset:end].tolist()
+    sims = result_set.sims[offset:end].tolist()
+    return {
+        "results": [_similar_result(result_set.filenames[row], result_set.metadata, sim)
+                    for row, sim in zip(rows, sims)],
+        "total": result_set.total,
+        "offset": offset,
+        "next_cursor": make_cursor(result_id, end) if end < result_set.total else None,
+        "expires_in": result_set.expires_in(),
+    }
 
-        for i, fname in enumerate(filenames):
-            meta = metadata.get(fname, {})
-            feature_map = {f[0]: f[1] for f in meta.get("features", [])}
-            cluster = meta.get("cluster")
 
-            match_mix = all(
-                mix["min"] <= feature_map.get(mix["type"], 0) <= mix["max"]
-                for mix in mix_filters
-            )
+@app.route("/find-similar/page")
+def find_similar_page():
+    """find-similar'ın döndürdüğü cursor ile sonraki sayfayı getirir.
+    Küme süresi dolmuşsa 410 döner; istemci aramayı yeniden başlatmalıdır."""
+    try:
+        result_id, offset = parse_cursor(request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    result_set = ranked_results.get(result_id)
+    if result_set is None:
+        return jsonify({"status": "error", "message": "Cursor süresi dolmuş, arama yeniden yapılmalı"}), 410
+    page_size = int(request.args.get("page_size", result_set.page_size))
+    if page_size <= 0:
+        return jsonify({"status": "error", "message": "page_size pozitif olmalı"}), 400
+    return jsonify(_result_page(result_id, result_set, offset, page_size))
+
+
+def _similar_result(fname, metadata, similarity):
+    """find_similar sonuç satırını metadata ile birlikte oluşturur."""
+    meta = metadata.get(fname, {})
+    return {
+        "filename": fname,
+        "design": meta.get("design"),
+        "season": meta.get("season"),
+        "quality": meta.get("quality"),
+        "features": meta.get("features", []),
+        "cluster": meta.get("cluster"),
+        "similarity": float(similarity)
+    }
 
-            match_feature = all(f in feature_map for f in feature_filters)
 
-            match_cluster = True
-            if cluster_status == "clustered" and not cluster:
-                match_cluster = False
-            elif cluster_status == "unclustered" and cluster:
-                match_cluster = False
+@app.route("/find-similar-batch", methods=["POST"])
+def find_similar_batch():
+    """Birden çok sorgu görseliyle tek seferde arama yapar.
+    mode="each"     → her görsel için ayrı top-N (tüm sorgular tek matris-matris çarpımıyla puanlanır)
+    mode="centroid" → seçilen görsellerin ortalama vektörüne en benzer görseller
+    mode="sum"      → seçilen görsellere olan benzerliklerin toplamına göre sıralama
+    Filtreler (filters) find_similar'daki mixFilters / features / cluster ile aynı anlamdadır."""
+    data = request.get_json() or {}
+    query_names = data.get("filenames", [])
+    model = data.get("model", "pattern")
+    metric = data.get("metric", "cosine")
+    topN = int(data.get("topN", 100))
+    mode = data.get("mode", "each")
+    filters = data.get("filters")
+    exclude_anchors = bool(data.get("excludeAnchors", False))
+
+    if not query_names:
+        return jsonify({"status": "error", "message": "Sorgu görsel listesi gerekli."}), 400
+    if metric not in similarity_index.METRICS:
+        return jsonify({"status": "error", "message": f"Geçersiz metrik: {metric}"}), 400
+    if mode != "each" and mode not in similarity_index.MULTI_ANCHOR_MODES:
+        return jsonify({"status": "error", "message": f"Geçersiz mod: {mode}"}), 400
+
+    store = feature_store.get(model)
+    if store is None:
+        return jsonify({"status": "error", "message": f"{model} için feature dosyası bulunamadı."}), 404
+    meta_snapshot = feature_store.metadata()
+    metadata = meta_snapshot.data
+
+    anchors = [name for name in query_names if store.row(name) is not None]
+    missing = [name for name in query_names if store.row(name) is None]
+    if not anchors:
+        return jsonify({"status": "ok", "mode": mode, "results": {} if mode == "each" else [], "missing": missing})
+    anchor_rows = np.array([store.row(name) for name in anchors], dtype=np.int64)
+
+    allowed_mask = None
+    if filters:
+        allowed_mask = feature_store.filter_index(store, meta_snapshot).mask(filters)
+    if exclude_anchors:
+        allowed_mask = np.ones(len(store.filenames), dtype=bool) if allowed_mask is None else allowed_mask.copy()
+        allowed_mask[anchor_rows] = False
+
+    vectors = store.vectors_for(metric)
+    queries = vectors[anchor_rows]
+
+    if mode == "each":
+        batch = similarity_index.exact_search_batch(vectors, store.sq_norms, queries, metric, topN, allowed_mask)
+        results = {
+            name: [_similar_result(store.filenames[row], metadata, sim) for row, sim in zip(rows.tolist(), sims.tolist())]
+            for name, (rows, sims) in zip(anchors, batch)
+        }
+        return jsonify({"status": "ok", "mode": mode, "results": results, "missing": missing})
+
+    rows, sims, per_anchor = similarity_index.multi_anchor_search(
+        vectors, store.sq_norms, queries, metric, topN, mode, allowed_mask
+    )
+    results = []
+    for i, (row, sim) in enumerate(zip(rows.tolist(), sims.tolist())):
+        entry = _similar_result(store.filenames[row], metadata, sim)
+        if per_anchor is not None:
+            entry["anchor_similarities"] = {name: float(per_anchor[a, i]) for a, name in enumerate(anchors)}
+        results.append(entry)
+    return jsonify({"status": "ok", "mode": mode, "anchors": anchors, "results": results, "missing": missing})
+
+
+def _parse_weights(raw):
+    """"pattern:0.7,color:0.3" biçimindeki ağırlık parametresini {model: ağırlık} sözlüğüne çevirir."""
+    weights = {}
+    for part in (raw or "").split(","):
+        if not part.strip():
+            continue
+        model, _, value = part.partition(":")
+        model = model.strip()
+        if model not in MODEL_TYPES:
+            raise ValueError(f"Geçersiz model: {model}")
+        weight = float(value) if value else 1.0
+        if weight < 0:
+            raise ValueError(f"Ağırlık negatif olamaz: {model}")
+        if weight > 0:
+            weights[model] = weight
+    if not weights:
+        raise ValueError("En az bir modele pozitif ağırlık verilmeli.")
+    return weights
+
+
+@app.route("/find-similar-fused", methods=["GET", "POST"])
+def find_similar_fused():
+    """Birden çok modeli (ör. "aynı desen, benzer renk") ağırlıklarla birleştirerek arar.
+    ?weights=pattern:0.7,color:0.3 — tüm model matrisleri ortak satır sırasıyla hizalanır ve
+    tek geçişte puanlanır; her sonuç model bazında benzerlik dökümü (model_similarities) içerir.
+    POST gövdesindeki filtreler find_similar ile aynı anlamdadır."""
+    filters = request.get_json() if request.method == "POST" else None
+    filename = request.args.get("filename")
+    topN = int(request.args.get("topN", 100))
+    metric = request.args.get("metric", "cosine")
 
-            if match_mix and match_feature and match_cluster:
-                allowed_indices.append(i)
-    else:
-        allowed_indices = list(range(len(filenames)))
+    try:
+        weights = _parse_weights(request.args.get("weights", "pattern:1"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if metric not in similarity_index.METRICS:
+        return jsonify([])
 
-    if not allowed_indices:
+    models = list(weights)
+    aligned = feature_store.aligned(models)
+    if aligned is None:
         return jsonify([])
+    meta_snapshot = feature_store.metadata()
+    metadata = meta_snapshot.data
 
-    # 🔍 Sadece filtreyi geçenler ile similarity hesapla
-    filtered_features = features[allowed_indices]
-    if metric == "cosine":
-        sims = cosine_similarity(query_vector, filtered_features)[0]
-    elif metric == "euclidean":
-        dists = euclidean_distances(query_vector, filtered_features)[0]
-        sims = 1 / (1 + dists)
-    else:
+    idx = aligned.row(filename)
+    if idx is None:
         return jsonify([])
 
-    sorted_local_idx = np.argsort(-sims)
-    final_results = []
-    for local_idx in sorted_local_idx[:topN]:
-        global_idx = allowed_indices[local_idx]
-        fname = filenames[global_idx]
-        meta = metadata.get(fname, {})
-        final_results.append({
-            "filename": fname,
-            "design": meta.get("design"),
-            "season": meta.get("season"),
-            "quality": meta.get("quality"),
-            "features": meta.get("features", []),
-            "cluster": meta.get("cluster"),
-            "similarity": float(sims[local_idx])
-        })
+    allowed_mask = None
+    if filters:
+        allowed_mask = feature_store.filter_index(aligned, meta_snapshot).mask(filters)
+        if not allowed_mask.any():
+            return jsonify([])
 
+    rows, sims, per_model = similarity_index.fused_search(
+        aligned.matrix(metric), aligned.offsets, aligned.sq_norms, idx,
+        [weights[m] for m in models], metric, topN, allowed_mask
+    )
+
+    final_results = []
+    for i, (row, sim) in enumerate(zip(rows.tolist(), sims.tolist())):
+        entry = _similar_result(aligned.filenames[row], metadata, sim)
+        entry["model_similarities"] = {m: float(per_model[i, j]) for j, m in enumerate(models)}
+        final_results.append(entry)
     return jsonify(final_results)
 
 
+@app.route("/find-similar-upload", methods=["POST"])
+def find_similar_upload():
+    """Katalogda olmayan bir görseli (multipart "image") bellekteki modelle gömüp katalogda arar.
+    Ön işleme extract_features.py ile aynıdır; eş zamanlı yüklemeler tek ileri geçişte toplanır.
+    Opsiyonel "filters" form alanı find_similar'daki filtre JSON'uyla aynı anlamdadır."""
+    upload = request.files.get("image")
+    model = request.args.get("model", "pattern")
+    topN = int(request.args.get("topN", 100))
+    metric = request.args.get("metric", "cosine")
+    page_size = max(0, int(request.args.get("page_size", 0)))
+    stream = request.args.get("stream") in ("1", "true")
+
+    if upload is None:
+        return jsonify({"status": "error", "message": "image dosyası gerekli"}), 400
+    if model not in MODEL_TYPES or metric not in similarity_index.METRICS:
+        return jsonify({"status": "error", "message": "Geçersiz model veya metric"}), 400
+    try:
+        filters = json.loads(request.form["filters"]) if request.form.get("filters") else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "filters geçerli bir JSON değil"}), 400
+
+    store = feature_store.get(model)
+    if store is None:
+        return jsonify([])
+    meta_snapshot = feature_store.metadata()
+
+    try:
+        # Katalogla aynı decode yolu (draft ölçekli JPEG + EXIF yönü)
+        image = open_image(upload.stream, embedding_model.IMAGE_SIZE)
+        # Sorgu, katalog vektörlerini üreten backend'le (ve kalibre modelle) gömülür
+        vec = embedding_model.get_embedder(store.backend, store.model_id).embed(image, model)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": f"Görsel gömülemedi: {e}"}), 500
+    if vec.shape[0] != store.features.shape[1]:
+        return jsonify({"status": "error", "message": "Feature boyutu katalogla uyuşmuyor"}), 500
+
+    allowed_mask = None
+    if filters:
+        allowed_mask = feature_store.filter_index(store, meta_snapshot).mask(filters)
+        if not allowed_mask.any():
+            return jsonify([])
+
+    query = similarity_index.prepare_vectors(vec[None, :], metric)[0]
+    rows, sims = similarity_index.exact_search(
+        store.vectors_for(metric), store.sq_norms, query, metric, topN, allowed_mask
+    )
+    if page_size or stream:
+        return _ranked_response(rows, sims, store.filenames, meta_snapshot.data, page_size, stream)
+    return jsonify([
+        _similar_result(store.filenames[row], meta_snapshot.data, sim) for row, sim in zip(rows.tolist(), sims.tolist())
+    ])
+
+
+@app.route("/find-similar/cache-stats")
+def find_similar_cache_stats():
+    return jsonify(similar_cache.stats())
+
+
+@app.route("/feature-store/stats")
+def feature_store_stats():
+    return jsonify(feature_store.stats())
+
+
+@app.route("/feature-store/reload", methods=["POST"])
+def feature_store_reload():
+    model = request.args.get("model")
+    try:
+        feature_store.reload(model)
+        return jsonify({"status": "ok", "stats": feature_store.stats()})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
+
 @app.route("/update-version-comment", methods=["POST"])
 def update_version_comment():
     data = request.get_json()
@@ -290,13 +670,13 @@ def create_cluster():
         os.makedirs(new_folder, exist_ok=True)
 
         # Görselleri kopyala ve representative listesine ekle
+        copied = []
         for i, fname in enumerate(filenames):
             src = os.path.join("realImages", fname)
             dst = os.path.join(new_folder, fname)
             if os.path.exists(src):
                 shutil.copy2(src, dst)
-                # Metadatada güncelle
-                update_metadata(fname, {"cluster": new_cluster_name})
+                copied.append(fname)
                 # Cluster listesine ekle
                 clusters.append({
                     "cluster": new_cluster_name,
@@ -304,6 +684,9 @@ def create_cluster():
                     "comment": ""
                 })
 
+        # Metadatada tüm görseller için cluster'ı tek transaction'da güncelle
+        metadata_db.set_cluster(copied, new_cluster_name, create_missing=True)
+
         # ✅ Temsilci olarak ilk görseli representatives listesine ekle
         rep_data.setdefault("representatives", [])
         existing = [r["cluster"] for r in rep_data["representatives"]]
@@ -320,6 +703,9 @@ def create_cluster():
         with open(reps_path, "w", encoding="utf-8") as f:
             json.dump(rep_data, f, indent=2, ensure_ascii=False)
 
+        # Cluster atamaları değişti: önbellekteki benzerlik sonuçları geçersiz
+        similar_cache.invalidate()
+
         return jsonify({"status": "ok", "new_cluster": new_cluster_name})
 
     except Exception as e:
@@ -334,37 +720,23 @@ def submit_feedback():
     feedback = request.get_json()
     print("📩 Feedback alındı:", feedback)
 
-    feedback_file = "feedback_log.json"
-    feedback_list = []
-
-    if os.path.exists(feedback_file):
-        with open(feedback_file, "r", encoding="utf-8") as f:
-            try:
-                feedback_list = json.load(f)
-            except json.JSONDecodeError:
-                feedback_list = []
-
-    # Aynı anchor-output-model-version varsa güncelle / iptal et
-    anchor = feedback.get("anchor")
-    output = feedback.get("output")
-    model = feedback.get("model")
-    version = feedback.get("version")
-
-    feedback_list = [f for f in feedback_list if not (
-        f.get("anchor") == anchor and
-        f.get("output") == output and
-        f.get("model") == model and
-        f.get("version") == version
-    )]
-
-    if feedback.get("feedback") is not None:
-        feedback_list.append(feedback)
-
-    with open(feedback_file, "w", encoding="utf-8") as f:
-        json.dump(feedback_list, f, indent=2, ensure_ascii=False)
+    # Aynı anchor-output-model-version varsa güncelle / iptal et (feedback=None):
+    # günlüğe tek satır eklenir, bellekteki indeks son oyu tutar
+    feedback_log.submit(feedback)
 
     return jsonify({"status": "ok"})
 
+@app.route("/feedback/summary")
+def feedback_summary():
+    """Feedback özetleri: ?anchor=... ile anchor bazında (çıktı başına puanlarla),
+    anchor verilmezse model / versiyon bazında. ?model= ve ?version= ile daraltılabilir."""
+    anchor = request.args.get("anchor")
+    model = request.args.get("model")
+    version = request.args.get("version")
+    if anchor:
+        return jsonify({"anchor": anchor, "summary": feedback_log.anchor_summary(anchor, model, version)})
+    return jsonify({"summary": feedback_log.version_summary(model, version), "log": feedback_log.stats()})
+
 @app.route("/init-model-version", methods=["POST"])
 def init_model_version():
     """Yeni bir model ve versiyon kombinasyonu için gereken başlangıç yapısını oluşturur"""
@@ -405,16 +777,11 @@ def move_to_cluster():
         return jsonify({"status": "error", "message": "Eksik bilgi"}), 400
 
     # Dosya yolları
-    metadata_path = "image_metadata_map.json"
     cluster_dir = os.path.join("exported_clusters", model, version, cluster_name)  # Doğru klasör yapısı
 
     # Klasörü oluştur
     os.makedirs(cluster_dir, exist_ok=True)
 
-    # Metadata dosyasını yükle
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
-
     moved = []
 
     # Representatives dosyasını kontrol et
@@ -449,23 +816,52 @@ def move_to_cluster():
         else:
             print(f"⚠️ {img} bulunamadı")
 
-        # Metadata'da cluster güncelle
-        if img in metadata:
-            metadata[img]["cluster"] = cluster_name
-        else:
+    # Metadata'da cluster'ı tek transaction'da güncelle
+    updated = set(metadata_db.set_cluster(images, cluster_name))
+    for img in images:
+        if img not in updated:
             print(f"📛 Metadata'da {img} bulunamadı")
 
-    # Metadata'yı kaydet
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
-        
+
     # Representatives dosyasını güncelle
     rep_data["last_updated"] = datetime.now().isoformat()
     with open(rep_path, "w", encoding="utf-8") as f:
         json.dump(rep_data, f, indent=2, ensure_ascii=False)
 
+    # Cluster atamaları değişti: önbellekteki benzerlik sonuçları geçersiz
+    similar_cache.invalidate()
+
     return jsonify({"status": "ok", "moved": moved, "cluster": cluster_name})
 
+@app.route("/bulk-assign-clusters", methods=["POST"])
+def bulk_assign_clusters():
+    """Çok sayıda görseli tek seferde cluster'lara atar.
+    Gövde: {"model": "pattern", "version": "v1", "moves": [{"image": "...", "cluster": "cluster-3"}, ...]}
+    representatives.json ve metadata her biri bir kez yazılır; yanıt cluster üyelik farkını içerir."""
+    data = request.get_json() or {}
+    model = data.get("model", "pattern")
+    version = data.get("version", "v1")
+    moves = data.get("moves", [])
+
+    if not moves:
+        return jsonify({"status": "error", "message": "Eksik bilgi"}), 400
+    try:
+        cluster_ops.validate_cluster_name(model)
+        cluster_ops.validate_cluster_name(version)
+        pairs = [(move["image"], move["cluster"]) for move in moves]
+        diff = cluster_ops.apply_moves(model, version, pairs, metadata_db)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Geçersiz taşıma listesi: {e}"}), 400
+    except Exception as e:
+        print(f"Toplu cluster atama hatası: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    # Cluster atamaları değişti: önbellekteki benzerlik sonuçları geçersiz
+    similar_cache.invalidate()
+
+    return jsonify({"status": "ok", **diff})
+
 @app.route("/available-versions")
 def available_versions():
     """Bir model için mevcut tüm versiyonları listeler"""
@@ -0,0 +1,53 @@
+# atomic_io.py
+# Oluşturulma: 2025-04-30
+# Hazırlayan: Kafkas
+# Açıklama:
+# Feature matrisleri, indeksler ve JSON çıktıları için atomik dosya yazma yardımcıları.
+# Veri önce aynı klasörde sürece özel geçici bir dosyaya yazılır, diske indirilir (fsync)
+# ve os.replace ile tek adımda hedefin yerine konur. Eski dosyayı mmap ile açmış okuyucular
+# eski içeriği görmeye devam eder; yeni açanlar tam yazılmış yeni dosyayı görür.
+
+import os
+import json
+import threading
+import numpy as np
+
+
+def tmp_path_for(path):
+    """Hedefin yanında, süreç + thread'e özel geçici dosya adı."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _atomic_write(path, mode, write, encoding=None):
+    tmp_path = tmp_path_for(path)
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_save_npy(path, array):
+    """np.save'in atomik karşılığı (yarım yazılmış .npy hiçbir zaman görünmez)."""
+    _atomic_write(path, "wb", lambda f: np.save(f, array))
+
+
+def atomic_savez(path, **arrays):
+    """np.savez'in atomik karşılığı."""
+    _atomic_write(path, "wb", lambda f: np.savez(f, **arrays))
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """json.dump'ın atomik karşılığı."""
+    _atomic_write(path, "w", lambda f: json.dump(data, f, **dump_kwargs), encoding="utf-8")
+
+
+def atomic_replace(tmp_path, path):
+    """Yerinde (ör. memmap ile) yazılmış geçici dosyayı diske indirip tek adımda hedefin yerine koyar."""
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,118 @@
+# benchmark_decode.py
+# Oluşturulma: 2025-05-11
+# Hazırlayan: Kafkas
+# Açıklama:
+# Görsel açma yollarını karşılaştırır:
+# - full : eski yol, Image.open(...).convert("RGB") (tam çözünürlüklü decode)
+# - draft: image_io.open_image(..., size) (hedef boyuta yetecek en küçük DCT ölçeğinde JPEG decode + EXIF yönü)
+# Katalogdan sabit tohumla seçilen görseller her yol için ayrı bir alt süreçte açılır; raporlanan:
+# decode süresi (p50 / ortalama, görsel/s), decode edilen en büyük görüntü tamponu ve alt sürecin
+# tepe bellek (peak RSS) artışı. Pillow piksel belleğini Python ayırıcısı dışında tuttuğu için
+# tracemalloc yerine işletim sisteminin tepe RSS değeri kullanılır (resource modülü olmayan
+# sistemlerde yalnızca tampon boyutu raporlanır).
+#
+# Kullanım:
+#   python benchmark_decode.py --images 100 --repeat 3 --size 224
+
+import argparse
+import os
+import sys
+import time
+import multiprocessing
+import numpy as np
+from PIL import Image
+
+from generate_thumbnails import INPUT_DIR, IMAGE_EXTENSIONS
+from image_io import open_image
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MODES = ("full", "draft")
+
+
+def decode(mode, path, size):
+    if mode == "full":
+        with Image.open(path) as img:
+            return img.convert("RGB")
+    return open_image(path, size)
+
+
+def peak_rss():
+    """Sürecin şimdiye kadarki tepe RSS değeri (bayt); ölçülemiyorsa None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux'ta KB, macOS'ta bayt
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(mode, paths, size, repeat):
+    """Alt süreçte çalışır: bir yolun decode sürelerini ve bellek kullanımını ölçer."""
+    start_rss = peak_rss()
+    times, frame_bytes, pixels = [], 0, 0
+    for _ in range(repeat):
+        for path in paths:
+            tick = time.perf_counter()
+            img = decode(mode, path, size)
+            times.append(time.perf_counter() - tick)
+            frame_bytes = max(frame_bytes, img.width * img.height * len(img.getbands()))
+            pixels += img.width * img.height
+            del img
+    end_rss = peak_rss()
+    ms = np.array(times) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "mean_ms": float(ms.mean()),
+        "images_per_second": len(times) / float(np.sum(times)) if times else 0.0,
+        "mean_megapixels": pixels / max(1, len(times)) / 1e6,
+        "max_frame_mb": frame_bytes / 1e6,
+        "peak_rss_growth_mb": (end_rss - start_rss) / 1e6 if start_rss is not None else None,
+    }
+
+
+def benchmark(n_images, size, repeat, input_dir=INPUT_DIR, seed=0):
+    filenames = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if n_images and n_images < len(filenames):
+        rng = np.random.default_rng(seed)
+        filenames = [filenames[i] for i in sorted(rng.choice(len(filenames), n_images, replace=False))]
+    # Açılamayan dosyalar ölçüme girmez
+    paths = []
+    for fname in filenames:
+        try:
+            with Image.open(os.path.join(input_dir, fname)):
+                paths.append(os.path.join(input_dir, fname))
+        except Exception as e:
+            print(f"⚠️ {fname} atlandı: {e}")
+    print(f"🧪 {len(paths)} görsel, hedef {size[0]}×{size[1]}, {repeat} tekrar")
+
+    # Her yol temiz bir süreçte ölçülür; tepe RSS önceki yolun tamponlarından etkilenmez
+    context = multiprocessing.get_context("spawn")
+    report = {}
+    for mode in MODES:
+        with context.Pool(1) as pool:
+            report[mode] = pool.apply(measure, (mode, paths, size, repeat))
+        result = report[mode]
+        rss = result["peak_rss_growth_mb"]
+        print(f"   {mode:<6} p50={result['p50_ms']:.2f}ms ort={result['mean_ms']:.2f}ms "
+              f"{result['images_per_second']:.1f} görsel/s, ort {result['mean_megapixels']:.2f} MP, "
+              f"en büyük tampon {result['max_frame_mb']:.1f} MB"
+              + (f", tepe RSS +{rss:.1f} MB" if rss is not None else ""))
+    if report["draft"]["mean_ms"] > 0:
+        print(f"🚀 draft decode {report['full']['mean_ms'] / report['draft']['mean_ms']:.1f}× daha hızlı")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tam ve draft (DCT ölçekli) JPEG decode karşılaştırması")
+    parser.add_argument("--images", type=int, default=100, help="Örnek görsel sayısı (0 = hepsi)")
+    parser.add_argument("--size", type=int, default=224, help="Hedef kenar uzunluğu (thumbnail / model girdisi)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.images, (args.size, args.size), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
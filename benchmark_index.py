@@ -0,0 +1,131 @@
+# benchmark_index.py
+# Oluşturulma: 2025-04-23
+# Hazırlayan: Kafkas
+# Açıklama:
+# similarity_index.py içindeki ANN backend'lerini tam aramaya (exact) karşı ölçer.
+# Katalogdan rastgele sorgu görselleri seçilir, her nprobe / efSearch değeri için
+# recall@k ve sorgu başına gecikme (p50 / p95) raporlanır.
+# --save verilirse, hedef recall'ı sağlayan en hızlı ayar model bazında
+# image_features/index_config.json dosyasına yazılır (find_similar bu ayarı kullanır).
+#
+# Kullanım:
+#   python benchmark_index.py --model pattern --metric cosine --k 100 --target-recall 0.95 --save
+
+import argparse
+import json
+import time
+import numpy as np
+
+import similarity_index as si
+from feature_store import FeatureStore
+
+DEFAULT_NPROBES = [1, 2, 4, 8, 16, 32, 64]
+DEFAULT_EFS = [16, 32, 64, 128, 256]
+
+
+def run_backend(index, exact_results, queries, features, k, params):
+    recalls, latencies = [], []
+    for q_row, truth in zip(queries, exact_results):
+        start = time.perf_counter()
+        rows, _ = index.search(features[q_row], k, **params)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(truth.intersection(rows.tolist())) / max(1, len(truth)))
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+    }
+
+
+def benchmark(model, metric, k, n_queries, backends, nprobes, efs, seed=0):
+    store = FeatureStore()
+    snapshot = store.get(model)
+    if snapshot is None:
+        raise FileNotFoundError(f"{model} için feature dosyaları bulunamadı")
+
+    features = snapshot.features
+    vectors = snapshot.vectors_for(metric)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(features), min(n_queries, len(features)), replace=False)
+
+    exact = si.ExactIndex.build(vectors, metric, snapshot.sq_norms)
+    exact_stats, exact_results = [], []
+    for q_row in queries:
+        start = time.perf_counter()
+        rows, _ = exact.search(features[q_row], k)
+        exact_stats.append(time.perf_counter() - start)
+        exact_results.append(set(rows.tolist()))
+    exact_ms = np.array(exact_stats) * 1000
+    print(f"🎯 exact: p50={np.percentile(exact_ms, 50):.2f}ms p95={np.percentile(exact_ms, 95):.2f}ms")
+
+    report = {"exact": {"recall": 1.0, "p50_ms": float(np.percentile(exact_ms, 50)),
+                        "p95_ms": float(np.percentile(exact_ms, 95))}}
+    for backend in backends:
+        if backend.startswith("faiss") and si.faiss is None:
+            print(f"⚠️ {backend} atlandı: faiss kurulu değil")
+            continue
+        start = time.perf_counter()
+        index = si.build_index(vectors, metric, backend, sq_norms=snapshot.sq_norms)
+        build_s = time.perf_counter() - start
+        print(f"🧱 {backend} kuruldu: {build_s:.2f}s")
+
+        sweep_key, values = ("ef_search", efs) if backend == "faiss-hnsw" else ("nprobe", nprobes)
+        rows = []
+        for value in values:
+            result = run_backend(index, exact_results, queries, features, k, {sweep_key: value})
+            result[sweep_key] = value
+            rows.append(result)
+            print(f"   {sweep_key}={value:<4} recall@{k}={result['recall']:.4f} "
+                  f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms")
+        report[backend] = {"build_seconds": build_s, "sweep": rows}
+    return report
+
+
+def pick_settings(report, target_recall):
+    """Her backend için hedef recall'a ulaşan en düşük p50 gecikmeli ayarı seçer."""
+    chosen = {}
+    for backend, data in report.items():
+        if backend == "exact":
+            continue
+        passing = [r for r in data["sweep"] if r["recall"] >= target_recall]
+        if not passing:
+            continue
+        best = min(passing, key=lambda r: r["p50_ms"])
+        chosen[backend] = {key: best[key] for key in ("nprobe", "ef_search") if key in best}
+    return chosen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN indeks recall@k / gecikme ölçümü")
+    parser.add_argument("--model", default="pattern", choices=["pattern", "color", "texture"])
+    parser.add_argument("--metric", default="cosine", choices=list(si.METRICS))
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", default="ivf,faiss-ivf,faiss-hnsw")
+    parser.add_argument("--nprobes", default=",".join(map(str, DEFAULT_NPROBES)))
+    parser.add_argument("--efs", default=",".join(map(str, DEFAULT_EFS)))
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--save", action="store_true", help="Seçilen ayarları index_config.json'a yaz")
+    args = parser.parse_args()
+
+    report = benchmark(
+        args.model, args.metric, args.k, args.queries,
+        [b for b in args.backends.split(",") if b],
+        [int(v) for v in args.nprobes.split(",")],
+        [int(v) for v in args.efs.split(",")],
+    )
+
+    chosen = pick_settings(report, args.target_recall)
+    print(f"✅ Seçilen ayarlar (recall ≥ {args.target_recall}): {chosen}")
+
+    if args.save and chosen:
+        config = si.load_index_config()
+        config.setdefault(args.model, {}).update(chosen)
+        with open(si.INDEX_CONFIG_PATH, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        print(f"💾 Ayarlar kaydedildi → {si.INDEX_CONFIG_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# build_metadata.py
+# Oluşturulma: 2025-05-04
+# Hazırlayan: Kafkas
+# Açıklama:
+# Metadata üretim aşaması: realImages_json altındaki portal export'larından
+# image_metadata_map.json (sol panel / benzerlik filtreleri) ve merged_metadata.json'ı tek geçişte üretir.
+# - Büyük export dosyaları tamamen belleğe alınmadan, eleman eleman (stream) okunur.
+# - Detay export'undan BlendID → [(HTYPE, PERCENTAGE)] hash indeksi bir kez kurulur.
+# - Ana export tek geçişte taranır; yalnızca realImages/ içinde bulunan görsellerin kayıtları tutulur
+#   (FULLPATH → kayıt indeksi). Görsel başına tüm export'u tarayan eşleştirme yapılmaz.
+# - Her aşamanın süresi ve satır/s hızı yazdırılır.
+# - update(): export'lar değişmeden yalnızca görsel eklenip silindiğinde mevcut çıktılar güncellenir;
+#   export'lardan yalnızca eklenen görsellerin kayıtları ve onların BlendID'leri tutulur. Mevcut kayıtların
+#   cluster alanlarına dokunulmaz (arayüzün atadığı cluster'lar metadata deposundan bu dosyaya export edilir).
+#   pipeline.py metadata aşaması bu yolu kullanır.
+# - Harita yeniden üretilirken mevcut haritadaki cluster değerleri korunur (arayüzün atadığı cluster'lar
+#   metadata deposundan bu dosyaya export edilir); cluster'ı olmayan görseller için cluster klasörlerine bakılır.
+# Çıktılar atomik yazılır; çalışan sunucu yarım yazılmış dosya görmez.
+#
+# Kullanım:
+#   python build_metadata.py              (iki çıktıyı da üretir)
+#   python build_metadata.py --only map   (yalnızca image_metadata_map.json)
+
+import os
+import json
+import time
+import argparse
+from glob import glob
+
+from atomic_io import atomic_write_json
+from generate_representatives import version_dirs
+
+REAL_DIR = "realImages"
+JSON_DIR = "realImages_json"
+MAIN_JSON = os.path.join(JSON_DIR, "yunportalclaude.json")
+DETAIL_JSON = os.path.join(JSON_DIR, "yunportalclaudedetail.json")
+MAP_OUT = "image_metadata_map.json"
+MERGED_OUT = "merged_metadata.json"
+CLUSTER_BASE = "exported_clusters/pattern"
+
+CHUNK_SIZE = 1 << 20
+FEATURE_FLAGS = (
+    "MONOSTRETCH", "BISTRETCH", "POWERSTRETCH", "NATURALSTRETCH",
+    "LIGHTWEIGHT", "COMFORT", "WASHABLE", "BREATHABLE",
+    "ANTIBACTERIAL", "EASYIRONING", "MOISTUREMANAGMENT", "UVPROTECTION",
+    "WRINKLERESISTANCE", "WATERREPELLENT", "THERMALCOMFORT", "QUICKDRY",
+    "RWS", "RCSGRS"
+)
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE):
+    """Bir JSON dizisini dosyanın tamamını belleğe almadan eleman eleman döner."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path}: JSON dizisi bekleniyordu")
+        pos, eof = 1, False
+        while True:
+            # Elemanlar arasındaki boşluk ve virgülleri atla; tampon biterse devamını oku
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # Tampon sonuna denk gelen eleman (ör. sayı) yarım okunmuş olabilir
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if complete:
+                yield item
+                pos = end
+                continue
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+class StageTimer:
+    """Aşama sürelerini ve satır/s hızlarını yazdırır."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    def stage(self, name, rows=None):
+        elapsed = time.perf_counter() - self.start
+        rate = f", {rows / elapsed:,.0f} satır/s" if rows and elapsed > 0 else ""
+        count = f"{rows:,} satır, " if rows is not None else ""
+        print(f"⏱️ {name}: {count}{elapsed:.2f}s{rate}")
+        self.start = time.perf_counter()
+
+
+def build_blend_index(detail_path=DETAIL_JSON, wanted=None):
+    """BlendID → [(HTYPE, PERCENTAGE), ...] indeksi (export sırası korunur); (indeks, satır sayısı) döner.
+    wanted verilirse yalnızca o BlendID'ler tutulur."""
+    index, rows = {}, 0
+    for blend in iter_json_array(detail_path):
+        rows += 1
+        blend_id = str(blend.get("BlendID", blend.get("BlendId")))
+        if wanted is None or blend_id in wanted:
+            index.setdefault(blend_id, []).append((blend["HTYPE"], blend["PERCENTAGE"]))
+    return index, rows
+
+
+def load_cluster_lookup(cluster_base=CLUSTER_BASE):
+    """exported_clusters/pattern altındaki klasörlerden filename → cluster adı eşlemesi.
+    Versiyon klasörleri (v1, ...; arayüz cluster'ları ve representatives.json) okunmaz."""
+    lookup = {}
+    if os.path.exists(cluster_base):
+        skipped = set(version_dirs(cluster_base))
+        for cluster_name in os.listdir(cluster_base):
+            cluster_path = os.path.join(cluster_base, cluster_name)
+            if not os.path.isdir(cluster_path) or cluster_path in skipped:
+                continue
+            for fname in os.listdir(cluster_path):
+                lookup[fname] = cluster_name
+    return lookup
+
+
+def merged_entry(filename, item, blend):
+    return {
+        "filename": filename,
+        "design": item.get("DESIGN"),
+        "variant": item.get("VARIANT"),
+        "season": item.get("SEASON"),
+        "quality": item.get("QUALITY"),
+        "blend": [{"htype": htype, "percentage": pct} for htype, pct in blend],
+        "features": {flag: item.get(flag, 0) for flag in FEATURE_FLAGS},
+    }
+
+
+def map_entry(item, blend_index, fname, cluster):
+    blend_id = str(item.get("BlendId"))
+    if blend_id not in blend_index:
+        print(f"⚠️ BlendId eşleşmedi: {fname}, BlendId: {blend_id}")
+    return {
+        "design": item.get("DESIGN"),
+        "season": item.get("SEASON"),
+        "quality": item.get("QUALITY"),
+        "features": blend_index.get(blend_id, []),
+        "cluster": cluster  # olmayabilir
+    }
+
+
+def build(outputs=("map", "merged"), main_path=MAIN_JSON, detail_path=DETAIL_JSON, real_dir=REAL_DIR):
+    """Export'ları bir kez okuyup istenen çıktıları üretir; {çıktı: kayıt sayısı} döner."""
+    timer = StageTimer()
+    blend_index, detail_rows = build_blend_index(detail_path)
+    timer.stage(f"Blend indeksi ({len(blend_index):,} BlendID)", detail_rows)
+
+    # Harita yalnızca .jpg görselleri (glob sırasıyla), merged klasördeki tüm dosyaları kapsar
+    map_images = [os.path.basename(p) for p in glob(os.path.join(real_dir, "*.jpg"))]
+    existing = set(os.listdir(real_dir)) if os.path.isdir(real_dir) else set()
+    map_wanted = set(map_images)
+    timer.stage("Görsel listesi", len(existing))
+
+    # Ana export'un tek geçişi: FULLPATH → ilk kayıt (harita) + var olan görsellerin tüm kayıtları (merged)
+    by_fullpath = {}
+    merged = []
+    main_rows = 0
+    for item in iter_json_array(main_path):
+        main_rows += 1
+        fullpath = item.get("FULLPATH")
+        if "map" in outputs and fullpath in map_wanted and fullpath not in by_fullpath:
+            by_fullpath[fullpath] = item
+        if "merged" in outputs and fullpath:
+            filename = os.path.basename(fullpath)
+            if filename in existing:
+                merged.append(merged_entry(filename, item, blend_index.get(str(item.get("BlendId")), [])))
+    timer.stage("Ana export taraması", main_rows)
+
+    counts = {}
+    if "map" in outputs:
+        # Mevcut haritadaki cluster önceliklidir; cluster'ı olmayan görseller için klasörlere bakılır
+        clusters, folder_clusters = current_clusters(), load_cluster_lookup()
+        result = {}
+        for fname in map_images:
+            entry = by_fullpath.get(fname)
+            if entry:
+                cluster = clusters.get(fname) or folder_clusters.get(fname)
+                result[fname] = map_entry(entry, blend_index, fname, cluster)
+        atomic_write_json(MAP_OUT, result, indent=2, ensure_ascii=False)
+        counts["map"] = len(result)
+        timer.stage(f"{MAP_OUT} yazıldı", len(result))
+
+    if "merged" in outputs:
+        atomic_write_json(MERGED_OUT, merged, indent=2, ensure_ascii=False)
+        counts["merged"] = len(merged)
+        timer.stage(f"{MERGED_OUT} yazıldı", len(merged))
+
+    return counts
+
+
+def _load_output(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def current_clusters(map_path=MAP_OUT):
+    """Mevcut haritadaki filename → cluster değerleri. Arayüzün atadığı cluster'lar (metadata deposu) bu dosyaya
+    export edilir; yeniden üretimde korunur."""
+    current = _load_output(map_path)
+    if not isinstance(current, dict):
+        return {}
+    return {fname: entry.get("cluster") for fname, entry in current.items() if isinstance(entry, dict)}
+
+
+def update(added=(), removed=(), main_path=MAIN_JSON, detail_path=DETAIL_JSON, real_dir=REAL_DIR):
+    """Export'lar değişmediğinde mevcut iki çıktıyı artımlı günceller: silinen görsellerin kayıtları çıkarılır,
+    eklenenlerinki export'lardan okunur. Yeni kayıtlar sona eklenir; mevcut kayıtların cluster alanları korunur,
+    yeniden eklenen görsel önceki cluster'ını alır (cluster klasörleri taranmaz).
+    Çıktılardan biri yoksa / okunamıyorsa tam build() yapılır. {çıktı: kayıt sayısı} döner."""
+    current_map, merged = _load_output(MAP_OUT), _load_output(MERGED_OUT)
+    if not isinstance(current_map, dict) or not isinstance(merged, list):
+        print("⚠️ Mevcut metadata çıktıları okunamadı, tam üretim yapılıyor.")
+        return build(main_path=main_path, detail_path=detail_path, real_dir=real_dir)
+
+    timer = StageTimer()
+    added = {f for f in added if os.path.exists(os.path.join(real_dir, f))}
+    dropped = set(removed) | added
+    previous_clusters = {f: current_map[f].get("cluster") for f in added if f in current_map}
+    for fname in dropped:
+        current_map.pop(fname, None)
+    merged = [entry for entry in merged if entry["filename"] not in dropped]
+    timer.stage(f"Silinen kayıtlar ({len(dropped):,} görsel)", len(merged))
+
+    if added:
+        # Harita yalnızca .jpg görselleri (build() ile aynı glob kuralı) kapsar
+        map_wanted = {f for f in added if f.endswith(".jpg") and not f.startswith(".")}
+        by_fullpath, new_items, main_rows = {}, [], 0
+        for item in iter_json_array(main_path):
+            main_rows += 1
+            fullpath = item.get("FULLPATH")
+            if not fullpath:
+                continue
+            if fullpath in map_wanted and fullpath not in by_fullpath:
+                by_fullpath[fullpath] = item
+            if os.path.basename(fullpath) in added:
+                new_items.append(item)
+        timer.stage("Ana export taraması", main_rows)
+
+        wanted = {str(item.get("BlendId")) for item in new_items + list(by_fullpath.values())}
+        blend_index, detail_rows = build_blend_index(detail_path, wanted)
+        timer.stage(f"Blend indeksi ({len(blend_index):,} BlendID)", detail_rows)
+
+        for item in new_items:
+            blend = blend_index.get(str(item.get("BlendId")), [])
+            merged.append(merged_entry(os.path.basename(item["FULLPATH"]), item, blend))
+        for fname in sorted(by_fullpath):
+            current_map[fname] = map_entry(by_fullpath[fname], blend_index, fname, previous_clusters.get(fname))
+
+    atomic_write_json(MAP_OUT, current_map, indent=2, ensure_ascii=False)
+    atomic_write_json(MERGED_OUT, merged, indent=2, ensure_ascii=False)
+    timer.stage(f"{MAP_OUT} + {MERGED_OUT} yazıldı", len(current_map) + len(merged))
+    return {"map": len(current_map), "merged": len(merged)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="image_metadata_map.json + merged_metadata.json üretimi")
+    parser.add_argument("--only", choices=("map", "merged"), help="Yalnızca tek çıktıyı üret")
+    args = parser.parse_args()
+
+    counts = build((args.only,) if args.only else ("map", "merged"))
+    if "map" in counts:
+        print(f"✅ {counts['map']} görsel için metadata + cluster eşleşmesi tamamlandı → {MAP_OUT}")
+    if "merged" in counts:
+        print(f"✅ Toplam {counts['merged']} görsel için metadata birleştirildi → {MERGED_OUT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# change_manifest.py
+# Oluşturulma: 2025-05-07
+# Hazırlayan: Kafkas
+# Açıklama:
+# realImages/ ve realImages_json/ için içerik adresli (content-addressed) değişiklik manifesti.
+# Her dosya için (boyut, mtime, içerik hash'i) file_manifest.json'da saklanır.
+# - Boyutu ve mtime'ı değişmeyen dosyalar yeniden okunmaz; hash önceki manifestten gelir.
+# - Değişen / yeni dosyalar paralel (thread havuzu) ve parça parça (chunk) okunarak hash'lenir.
+# - Sonuç, klasör bazında kesin eklenen / değişen / silinen dosya kümeleridir; yerinde üzerine yazılmış
+#   görseller de yakalanır. Sonraki aşamalar yalnızca bu kümeler üzerinde çalışabilir.
+#
+# Kullanım:
+#   python change_manifest.py          (değişiklikleri raporlar, manifesti günceller)
+#   python change_manifest.py --dry    (yalnızca raporlar)
+
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_io import atomic_write_json
+
+MANIFEST_PATH = "file_manifest.json"
+WATCHED_DIRS = ("realImages", "realImages_json")
+HASH_ALGO = "blake2b"
+HASH_CHUNK = 1 << 20
+HASH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+
+def file_hash(path, chunk_size=HASH_CHUNK):
+    """Dosyanın içerik hash'i; dosya parça parça okunur (hashlib büyük parçalarda GIL'i bırakır)."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_files(paths, previous, workers=HASH_WORKERS):
+    """paths: {anahtar: dosya yolu}. Boyutu ve mtime'ı önceki kayıtla aynı olan dosyanın hash'i yeniden
+    hesaplanmaz; diğerleri paralel (thread havuzu) hash'lenir. ({anahtar: kayıt}, hash'lenen sayısı) döner."""
+    current, to_hash = {}, []
+    for key, path in paths.items():
+        st = os.stat(path)
+        record = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        old = previous.get(key)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            record["hash"] = old["hash"]
+        else:
+            to_hash.append((key, path))
+        current[key] = record
+
+    # Yalnızca boyutu / mtime'ı değişen dosyalar paralel olarak hash'lenir
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (key, _), digest in zip(to_hash, pool.map(lambda item: file_hash(item[1]), to_hash)):
+            current[key]["hash"] = digest
+    return current, len(to_hash)
+
+
+class ChangeSet:
+    """Klasör bazında eklenen / değişen / silinen dosyalar (klasöre göre göreli adlar)."""
+
+    def __init__(self, dirs):
+        self.added = {d: [] for d in dirs}
+        self.changed = {d: [] for d in dirs}
+        self.removed = {d: [] for d in dirs}
+
+    def __bool__(self):
+        return any(self.added.values()) or any(self.changed.values()) or any(self.removed.values())
+
+    def touched(self, directory):
+        """Bir klasörde eklenen veya içeriği değişen dosyalar."""
+        return self.added[directory] + self.changed[directory]
+
+    def any_in(self, directory):
+        return bool(self.added[directory] or self.changed[directory] or self.removed[directory])
+
+    def to_dict(self):
+        return {"added": self.added, "changed": self.changed, "removed": self.removed}
+
+    def summary(self):
+        return ", ".join(
+            f"{d}: +{len(self.added[d])} ~{len(self.changed[d])} -{len(self.removed[d])}" for d in self.added
+        )
+
+
+def diff_files(previous, current, dirs):
+    """İki dosya tablosu ({"klasör/ad": {"hash": ...}}) arasındaki farkı ChangeSet olarak döner.
+    Yalnızca dirs içindeki klasörler dikkate alınır."""
+    changes = ChangeSet(dirs)
+    for key, record in current.items():
+        directory, name = key.split("/", 1)
+        if directory not in changes.added:
+            continue
+        old = previous.get(key)
+        if old is None:
+            changes.added[directory].append(name)
+        elif old["hash"] != record["hash"]:
+            changes.changed[directory].append(name)
+    for key in previous:
+        if key not in current:
+            directory, name = key.split("/", 1)
+            if directory in changes.removed:
+                changes.removed[directory].append(name)
+    for table in (changes.added, changes.changed, changes.removed):
+        for names in table.values():
+            names.sort()
+    return changes
+
+
+class ChangeManifest:
+    def __init__(self, path=MANIFEST_PATH, dirs=WATCHED_DIRS, workers=HASH_WORKERS):
+        self.path = path
+        self.dirs = tuple(dirs)
+        self.workers = workers
+        self.files = self._load()
+        self.hashed = 0
+        self.scan_seconds = 0.0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"⚠️ {self.path} okunamadı, tüm dosyalar yeniden hash'lenecek.")
+            return {}
+        if data.get("algo") != HASH_ALGO:
+            return {}
+        return data.get("files", {})
+
+    def scan(self):
+        """Klasörleri tarar; (yeni dosya tablosu, ChangeSet) döner. Manifest diske yazılmaz."""
+        start = time.perf_counter()
+        paths = {}
+        for directory in self.dirs:
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        paths[f"{directory}/{entry.name}"] = entry.path
+
+        current, self.hashed = hash_files(paths, self.files, self.workers)
+        changes = diff_files(self.files, current, self.dirs)
+        self.scan_seconds = time.perf_counter() - start
+        return current, changes
+
+    def commit(self, files):
+        """Tarama sonucunu kalıcı manifest olarak (atomik) yazar."""
+        atomic_write_json(self.path, {"algo": HASH_ALGO, "files": files}, indent=1, ensure_ascii=False)
+        self.files = files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="realImages / realImages_json değişiklik manifesti")
+    parser.add_argument("--dry", action="store_true", help="Manifesti güncelleme, yalnızca raporla")
+    args = parser.parse_args()
+
+    manifest = ChangeManifest()
+    files, changes = manifest.scan()
+    print(f"🔍 {len(files)} dosya tarandı, {manifest.hashed} dosya hash'lendi ({manifest.scan_seconds:.2f}s)")
+    print(f"{'🔄' if changes else '✅'} {changes.summary()}")
+    if not args.dry:
+        manifest.commit(files)
+
+
+if __name__ == "__main__":
+    main()
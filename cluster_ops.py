@@ -0,0 +1,141 @@
+# cluster_ops.py
+# Oluşturulma: 2025-05-06
+# Hazırlayan: Kafkas
+# Açıklama:
+# Toplu cluster atama işlemi (/bulk-assign-clusters).
+# Bir model/versiyon için (görsel, hedef cluster) taşıma listesini tek geçişte uygular:
+# - representatives.json bir kez okunur, tüm taşımalar bellekte uygulanır ve bir kez (atomik) yazılır
+# - metadata cluster alanları tek SQLite transaction'ında güncellenir
+# - görseller hedef cluster klasörüne kopyalanmak yerine mümkünse hard link ile bağlanır
+#   (aynı dosya sisteminde anında; olmazsa shutil.copy2), eski cluster klasöründeki kopya kaldırılır
+# - cluster üyeliklerinin farkı (eklenen / çıkarılan / değişmeyen) döndürülür
+# Temsilcisi başka cluster'a taşınan cluster'a kalan ilk üye temsilci olur; boşalan cluster'ın temsilcisi silinir.
+
+import os
+import json
+import shutil
+from datetime import datetime
+
+from atomic_io import atomic_write_json
+
+REAL_DIR = "realImages"
+CLUSTER_ROOT = "exported_clusters"
+
+
+def representatives_path(model, version, root=CLUSTER_ROOT):
+    return os.path.join(root, model, version, "representatives.json")
+
+
+def load_representatives(model, version, root=CLUSTER_ROOT):
+    path = representatives_path(model, version, root)
+    default = {
+        "representatives": [],
+        "clusters": [],
+        "version_comment": f"{model} modeli {version} versiyonu",
+        "last_updated": datetime.now().isoformat()
+    }
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return default
+
+
+def validate_cluster_name(name):
+    if not name or not isinstance(name, str) or name in (".", "..") or "/" in name or "\\" in name:
+        raise ValueError(f"Geçersiz cluster adı: {name!r}")
+
+
+def _place_image(src, dst):
+    """Görseli hedef klasöre hard link ile bağlar; desteklenmiyorsa kopyalar."""
+    if os.path.exists(dst):
+        return
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def apply_moves(model, version, moves, metadata_db, root=CLUSTER_ROOT, real_dir=REAL_DIR):
+    """moves: [(görsel, hedef cluster), ...] — aynı görsel birden çok kez geçerse sonuncusu geçerlidir.
+    Üyelik farkını döner."""
+    targets = {}
+    for image, cluster in moves:
+        validate_cluster_name(cluster)
+        targets[image] = cluster
+
+    version_dir = os.path.join(root, model, version)
+    rep_data = load_representatives(model, version, root)
+    clusters = rep_data.get("clusters", [])
+    before = {entry["filename"]: entry["cluster"] for entry in clusters}
+
+    missing = [image for image in targets if not os.path.exists(os.path.join(real_dir, image))]
+    missing_set = set(missing)
+    changed = {image: cluster for image, cluster in targets.items()
+               if image not in missing_set and before.get(image) != cluster}
+    unchanged = [image for image, cluster in targets.items()
+                 if image not in missing_set and before.get(image) == cluster]
+
+    # 📁 Dosya sistemi: hedef klasörlere bağla, eski cluster klasöründeki kopyayı kaldır
+    for cluster in set(changed.values()):
+        os.makedirs(os.path.join(version_dir, cluster), exist_ok=True)
+    for image, cluster in changed.items():
+        _place_image(os.path.join(real_dir, image), os.path.join(version_dir, cluster, image))
+        old_cluster = before.get(image)
+        if old_cluster:
+            old_path = os.path.join(version_dir, old_cluster, image)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    # 🗂️ representatives.json: üyelikler bellekte güncellenir, dosya bir kez yazılır
+    clusters = [entry for entry in clusters if entry["filename"] not in changed]
+    clusters += [{"cluster": cluster, "filename": image, "comment": ""} for image, cluster in changed.items()]
+    members = {}
+    for entry in clusters:
+        members.setdefault(entry["cluster"], []).append(entry["filename"])
+
+    representatives = []
+    for rep in rep_data.get("representatives", []):
+        cluster_members = members.get(rep["cluster"])
+        if not cluster_members:
+            continue
+        if rep["filename"] not in cluster_members:
+            rep = {**rep, "filename": cluster_members[0]}
+        representatives.append(rep)
+    represented = {rep["cluster"] for rep in representatives}
+    for cluster in dict.fromkeys(changed.values()):
+        if cluster not in represented:
+            representatives.append({"cluster": cluster, "filename": members[cluster][0]})
+
+    rep_data["clusters"] = clusters
+    rep_data["representatives"] = representatives
+    rep_data["last_updated"] = datetime.now().isoformat()
+    if changed:
+        os.makedirs(version_dir, exist_ok=True)
+        atomic_write_json(representatives_path(model, version, root), rep_data, indent=2, ensure_ascii=False)
+
+    # 🧾 Metadata: tek transaction
+    updated = set(metadata_db.assign_clusters(changed)) if changed else set()
+
+    added, removed = {}, {}
+    for image, cluster in changed.items():
+        added.setdefault(cluster, []).append(image)
+        if before.get(image):
+            removed.setdefault(before[image], []).append(image)
+    sizes_before = {}
+    for cluster in before.values():
+        sizes_before[cluster] = sizes_before.get(cluster, 0) + 1
+    affected = set(added) | set(removed)
+    return {
+        "added": added,
+        "removed": removed,
+        "unchanged": unchanged,
+        "missing": missing,
+        "metadata_missing": [image for image in changed if image not in updated],
+        "cluster_sizes": {
+            cluster: {"before": sizes_before.get(cluster, 0), "after": len(members.get(cluster, []))}
+            for cluster in sorted(affected)
+        },
+    }
@@ -0,0 +1,181 @@
+# embedding_model.py
+# Oluşturulma: 2025-05-02
+# Hazırlayan: Kafkas
+# Açıklama:
+# ResNet18 (fc katmanı olmadan) gömme modeli ve model türüne (pattern / color / texture) göre transform'lar.
+# extract_features.py ile sunucu aynı transform tanımlarını buradan kullanır.
+# Sunucuda model bir kez yüklenip bellekte (warm) tutulur; eş zamanlı gelen yükleme (upload)
+# sorguları kısa bir pencere içinde toplanıp tek ileri geçişte (micro-batch) gömülür.
+# Tüm model türleri aynı ağırlıkları paylaştığı için farklı türlerin görselleri aynı batch'e girebilir.
+# Embedder, katalog feature'larını üreten çıkarım backend'iyle (inference_backends.py) kurulur;
+# backend başına bir Embedder tutulur. int8-static'te Embedder katalogu üreten kalibre modelin kimliğiyle
+# (model_id) kurulur; yeniden kalibrasyondan sonra eski model değiştirilir.
+# ModelViews, tek decode edilmiş görselden pattern / color / texture girdilerini birlikte üretir
+# (extract_features.py çoklu model çıkarımı).
+# Texture bulanıklığı sabit sigmalıdır (TEXTURE_BLUR_SIGMA); aynı görsel her çıkarımda ve upload aramasında
+# aynı vektörü verir. Ön işleme değişince PREPROCESS_VERSIONS artırılır, eski vektörlü depolar yeniden kurulur.
+
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+try:
+    import torch
+    from torchvision import models, transforms
+except ImportError:
+    torch = None
+
+IMAGE_SIZE = (224, 224)
+MAX_BATCH = 32
+BATCH_WINDOW_SECONDS = 0.01
+
+
+MODEL_TYPES = ("pattern", "color", "texture")
+# Eski tanımdaki rastgele sigma aralığının (0.1, 2.0) ortası
+TEXTURE_BLUR_SIGMA = 1.05
+# Model türü → ön işleme sürümü (texture 2: rastgele sigma yerine sabit sigma)
+PREPROCESS_VERSIONS = {"pattern": 1, "color": 1, "texture": 2}
+
+
+class ModelViews:
+    """Tek decode edilmiş görselden istenen model türlerinin girdi tensörlerini üretir:
+    pattern = gri (3 kanal) + resize, color = resize, texture = gri + resize + Gaussian blur (sabit sigma).
+    Gri + resize adımı pattern ve texture için bir kez yapılır; sonuçlar tek tek uygulamayla aynıdır.
+    Modül düzeyinde sınıf olduğu için DataLoader işçi süreçlerine aktarılabilir (pickle)."""
+
+    def __init__(self, model_types):
+        for model_type in model_types:
+            if model_type not in MODEL_TYPES:
+                raise ValueError("Geçersiz MODEL_TYPE")
+        self.model_types = tuple(model_types)
+        self.grayscale = transforms.Grayscale(num_output_channels=3)
+        self.resize = transforms.Resize(IMAGE_SIZE)
+        self.blur = transforms.GaussianBlur(kernel_size=(3, 3), sigma=TEXTURE_BLUR_SIGMA)
+        self.to_tensor = transforms.ToTensor()
+
+    def __call__(self, img):
+        color = gray = None
+        views = []
+        for model_type in self.model_types:
+            if model_type == "color":
+                color = color if color is not None else self.resize(img)
+                views.append(self.to_tensor(color))
+            else:
+                gray = gray if gray is not None else self.resize(self.grayscale(img))
+                views.append(self.to_tensor(gray if model_type == "pattern" else self.blur(gray)))
+        return views
+
+
+class SingleView:
+    """Tek model türü için ön işleme (ModelViews ile aynı tanım)."""
+
+    def __init__(self, model_type):
+        self.views = ModelViews((model_type,))
+
+    def __call__(self, img):
+        return self.views(img)[0]
+
+
+def build_transform(model_type):
+    """Model türüne uygun ön işleme (extract_features.py ile aynı)."""
+    return SingleView(model_type)
+
+
+def load_backbone(device):
+    """Pretrained ResNet18'i son (fc) katmanı olmadan, eval modunda yükler."""
+    model = models.resnet18(pretrained=True)
+    model = torch.nn.Sequential(*list(model.children())[:-1])
+    model.to(device)
+    model.eval()
+    return model
+
+
+class Embedder:
+    """Bellekte tutulan model + micro-batch kuyruğu.
+    embed() çağıran thread'i bloklar; arka plandaki işçi thread kuyruktaki istekleri
+    MAX_BATCH'e veya BATCH_WINDOW_SECONDS süresine kadar toplayıp tek seferde gömer.
+    backend: katalog vektörlerini üreten çıkarım backend'i; sorgu vektörü aynı modelle üretilir.
+    model_id: katalogu üreten kalibre modelin kimliği (inference_backends.model_id); kayıtlı model farklıysa
+    sorgu katalogla karışmasın diye RuntimeError."""
+
+    def __init__(self, backend="eager", model_id=None, max_batch=MAX_BATCH, window=BATCH_WINDOW_SECONDS):
+        if torch is None:
+            raise RuntimeError("torch / torchvision kurulu değil")
+        # inference_backends bu modülü import eder; döngüsel import olmasın diye burada yüklenir
+        import inference_backends
+        if inference_backends.model_id(backend) != model_id:
+            raise RuntimeError(f"Kayıtlı {backend} modeli katalog vektörlerini üreten modelle aynı değil; "
+                               f"feature'ları yeniden çıkarın (extract_features.py --backend {backend})")
+        self.backend = backend
+        self.model_id = model_id
+        self.device = inference_backends.backend_device(backend)
+        self.model = inference_backends.load_model(backend, self.device)
+        self.transforms = {}
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.images = 0
+        worker = threading.Thread(target=self._run, name="embedder", daemon=True)
+        worker.start()
+
+    def _transform(self, model_type):
+        if model_type not in self.transforms:
+            self.transforms[model_type] = build_transform(model_type)
+        return self.transforms[model_type]
+
+    def embed(self, image, model_type):
+        """PIL görselini gömer; float32 vektör döner (ön işleme çağıran thread'de yapılır)."""
+        tensor = self._transform(model_type)(image.convert("RGB"))
+        future = Future()
+        self._queue.put((tensor, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=self.window))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                with torch.no_grad():
+                    stacked = torch.stack([tensor for tensor, _ in batch]).to(self.device)
+                    vectors = self.model(stacked).flatten(1).cpu().numpy().astype(np.float32)
+                for (_, future), vec in zip(batch, vectors):
+                    future.set_result(vec)
+                self.batches += 1
+                self.images += len(batch)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "model_id": self.model_id,
+            "device": str(self.device),
+            "batches": self.batches,
+            "images": self.images,
+            "avg_batch": round(self.images / self.batches, 2) if self.batches else None,
+        }
+
+
+_embedders = {}
+_embedder_lock = threading.Lock()
+
+
+def get_embedder(backend="eager", model_id=None):
+    """Süreç genelinde backend başına tek Embedder döner; model backend'in ilk çağrısında, kalibre model
+    (model_id) değiştiğinde de yeniden yüklenir."""
+    with _embedder_lock:
+        current = _embedders.get(backend)
+        if current is None or current.model_id != model_id:
+            _embedders[backend] = Embedder(backend, model_id)
+        return _embedders[backend]
@@ -0,0 +1,216 @@
+# embedding_store.py
+# Oluşturulma: 2025-05-09
+# Hazırlayan: Kafkas
+# Açıklama:
+# Artımlı (incremental) feature çıkarımı için içerik adresli gömme deposu.
+# - Her model için image_features/{model}_store.<nesil>.f32 dosyası yalnızca sona eklenen ham float32 satırlardır;
+#   image_features/{model}_store.json manifesti her satırın görsel içerik hash'ini (hash → satır) ve
+#   dosya adı → (boyut, mtime, hash) tablosunu tutar.
+# - Yeni / içeriği değişen görseller gömülüp sona eklenir; içeriği depoda olan görsel (ör. yeniden adlandırma)
+#   yeniden gömülmez. Silinen veya içeriği değişen görselin satırı hemen silinmez, mezar taşı (tombstone) olur:
+#   hiçbir dosyanın işaret etmediği satır. Ölü satır oranı COMPACT_RATIO'yu aşınca depo sıkıştırılır.
+# - Manifest commit noktasıdır: çökme sonrası .f32 sonundaki yarım satırlar bir sonraki eklemede kırpılır;
+#   sıkıştırma yeni nesil dosyaya yazılır, manifest atomik olarak ona geçer, eski dosya sonra silinir.
+# - publish() canlı satırları sıralı dosya adlarıyla {model}_features.npy + {model}_filenames.json olarak
+#   (bellek sınırlı, parça parça) yazar; yayınlanan dosyalarda mezar taşı olmaz, okuyucular değişmez.
+# - Manifest vektörleri üreten çıkarım backend'ini (inference_backends.py) de tutar; farklı backend ile
+#   açılan depo, vektörler karışmasın diye sıfırdan kurulur. Ön işleme sürümü (embedding_model.PREPROCESS_VERSIONS)
+#   için de aynısı geçerlidir. Kalibre edilen backend'lerde (int8-static) kalibre model dosyasının hash'i
+#   (model_id) de tutulur; yeniden kalibrasyon depoyu baştan kurar.
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from atomic_io import atomic_write_json, atomic_replace, tmp_path_for
+from change_manifest import hash_files
+from feature_store import FEATURE_DIR, file_signature
+
+COMPACT_RATIO = 0.25
+COPY_CHUNK = 4096
+
+
+class EmbeddingStore:
+    def __init__(self, model, feature_dir=FEATURE_DIR, backend="eager", preprocess=1, model_id=None):
+        self.model = model
+        self.feature_dir = feature_dir
+        self.backend = backend
+        self.preprocess = preprocess
+        self.model_id = model_id
+        self.manifest_path = os.path.join(feature_dir, f"{model}_store.json")
+        self.generation = 0
+        self.dim = None
+        self.rows = []      # satır → içerik hash'i
+        self.files = {}     # dosya adı → {"size", "mtime_ns", "hash"}
+        self.failed = {}    # açılamayan dosya adı → hash (içerik değişmedikçe yeniden denenmez)
+        self.published = None
+        self._load()
+        self.by_hash = {h: i for i, h in enumerate(self.rows)}
+
+    # --- Manifest ---
+    @property
+    def vectors_path(self):
+        return os.path.join(self.feature_dir, f"{self.model}_store.{self.generation}.f32")
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"⚠️ {self.manifest_path} okunamadı, depo sıfırdan kurulacak.")
+            return
+        produced = (data.get("backend", "eager"), data.get("preprocess", 1), data.get("model_id"))
+        if produced != (self.backend, self.preprocess, self.model_id):
+            if produced[:2] == (self.backend, self.preprocess):
+                print(f"⚠️ {self.manifest_path} başka bir kalibre {self.backend} modeliyle üretilmiş, "
+                      f"depo sıfırdan kurulacak.")
+            else:
+                print(f"⚠️ {self.manifest_path} {produced[0]} backend'i / ön işleme v{produced[1]} ile üretilmiş, "
+                      f"{self.backend} / v{self.preprocess} için depo sıfırdan kurulacak.")
+            stale = os.path.join(self.feature_dir, f"{self.model}_store.{data['generation']}.f32")
+            if data["generation"] and os.path.exists(stale):
+                os.remove(stale)
+            return
+        self.generation = data["generation"]
+        self.dim = data["dim"]
+        self.rows = data["rows"]
+        self.files = data["files"]
+        self.failed = data.get("failed", {})
+        self.published = data.get("published")
+        committed = len(self.rows) * (self.dim or 0) * 4
+        if self.rows and (not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) < committed):
+            print(f"⚠️ {self.vectors_path} manifestle uyuşmuyor, depo sıfırdan kurulacak.")
+            self.generation, self.dim, self.rows, self.files, self.failed, self.published = 0, None, [], {}, {}, None
+
+    def _write_manifest(self):
+        atomic_write_json(self.manifest_path, {
+            "model": self.model,
+            "backend": self.backend,
+            "preprocess": self.preprocess,
+            "model_id": self.model_id,
+            "generation": self.generation,
+            "dim": self.dim,
+            "rows": self.rows,
+            "files": self.files,
+            "failed": self.failed,
+            "published": self.published,
+        })
+
+    # --- Tarama ---
+    def scan(self, input_folder, filenames):
+        """Dosyaların içerik hash'lerini (değişmeyenler yeniden okunmadan) döner; (kayıtlar, hash'lenen) döner."""
+        return hash_files({f: os.path.join(input_folder, f) for f in filenames}, self.files)
+
+    def missing(self, records):
+        """Depoda vektörü olmayan (ve daha önce aynı içerikle açılamamış) dosyalar; aynı içerik bir kez listelenir."""
+        seen, result = set(), []
+        for fname, record in records.items():
+            digest = record["hash"]
+            if digest in self.by_hash or digest in seen or self.failed.get(fname) == digest:
+                continue
+            seen.add(digest)
+            result.append(fname)
+        return result
+
+    # --- Yazma ---
+    def vectors(self):
+        if not self.rows:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.rows), self.dim))
+
+    def append(self, vectors, hashes):
+        """Vektörleri deponun sonuna ekler (commit() çağrılana kadar manifestte görünmez)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        committed = len(self.rows) * self.dim * 4
+        with open(self.vectors_path, "ab") as f:
+            # Önceki yarım kalmış eklemelerden kalan satırları kırp
+            if f.tell() != committed:
+                f.truncate(committed)
+                f.seek(committed)
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        for digest in hashes:
+            self.by_hash[digest] = len(self.rows)
+            self.rows.append(digest)
+
+    def commit(self, records, failed):
+        """Güncel dosya tablosunu ve eklenen satırları manifeste (atomik) yazar."""
+        self.files = records
+        self.failed = failed
+        self._write_manifest()
+
+    # --- Mezar taşları / sıkıştırma ---
+    def live_hashes(self):
+        return {record["hash"] for fname, record in self.files.items() if fname not in self.failed}
+
+    def dead_rows(self):
+        live = self.live_hashes()
+        return sum(1 for digest in self.rows if digest not in live)
+
+    def compact(self):
+        """Hiçbir dosyanın işaret etmediği satırları atıp depoyu yeni nesil dosyaya yazar; atılan sayıyı döner."""
+        live = self.live_hashes()
+        keep = [i for i, digest in enumerate(self.rows) if digest in live]
+        dropped = len(self.rows) - len(keep)
+        if not dropped:
+            return 0
+        source, old_path = self.vectors(), self.vectors_path
+        self.generation += 1
+        with open(self.vectors_path, "wb") as f:
+            for start in range(0, len(keep), COPY_CHUNK):
+                f.write(np.ascontiguousarray(source[keep[start:start + COPY_CHUNK]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        del source
+        self.rows = [self.rows[i] for i in keep]
+        self.by_hash = {h: i for i, h in enumerate(self.rows)}
+        self._write_manifest()
+        os.remove(old_path)
+        return dropped
+
+    # --- Yayınlama ---
+    def _publish_digest(self, filenames):
+        h = hashlib.sha1()
+        for fname in filenames:
+            h.update(f"{fname}|{self.files[fname]['hash']}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def publish(self, filenames, feature_path, filenames_path):
+        """Verilen sıradaki dosyaların vektörlerini .npy + filenames.json olarak atomik yazar."""
+        rows = np.array([self.by_hash[self.files[f]["hash"]] for f in filenames], dtype=np.int64)
+        source = self.vectors()
+        tmp_path = tmp_path_for(feature_path)
+        try:
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                            shape=(len(rows), self.dim or 0))
+            for start in range(0, len(rows), COPY_CHUNK):
+                chunk = rows[start:start + COPY_CHUNK]
+                # Depodan artan satır sırasıyla okunur, yayın sırasındaki yerlerine yazılır
+                order = np.argsort(chunk, kind="stable")
+                out[start + order] = source[chunk[order]]
+            out.flush()
+            del out, source
+            atomic_replace(tmp_path, feature_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        atomic_write_json(filenames_path, list(filenames), indent=2)
+        self.published = {
+            "digest": self._publish_digest(filenames),
+            "signatures": [list(file_signature(p)) for p in (feature_path, filenames_path)],
+        }
+        self._write_manifest()
+
+    def is_published(self, filenames, feature_path, filenames_path):
+        """Aynı dosya listesi (ad + içerik) yayınlanmışsa ve dosyalar o zamandan beri değişmediyse True."""
+        if not self.published:
+            return False
+        signatures = [file_signature(p) for p in (feature_path, filenames_path)]
+        return (self.published["signatures"] == [list(sig) if sig else None for sig in signatures]
+                and self.published["digest"] == self._publish_digest(filenames))
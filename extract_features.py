@@ -6,78 +6,422 @@
 # model türüne (desen, renk, doku) göre uygun şekilde dönüştürür,
 # pretrained ResNet18 ile feature vektörlerini çıkarır,
 # image_features klasörüne .npy ve .json dosyaları olarak kaydeder.
+# - Görseller DataLoader ile batch halinde, ayrı işçi süreçlerinde (decode workers) açılıp dönüştürülür;
+#   JPEG'ler image_io.open_image ile 224×224'e yetecek en küçük DCT ölçeğinde decode edilir (EXIF yönüyle);
+#   model torch.inference_mode altında sabit sayıda thread ile batch batch çalışır.
+# - Birden çok model türü istenirse (--models pattern,color,texture) her görsel bir kez decode edilir,
+#   tüm türlerin girdileri aynı kaynaktan üretilir (embedding_model.ModelViews) ve ortak ResNet18'den
+#   tek ileri geçişte (batch × model sayısı) geçirilir; tüm feature dosyaları birlikte yazılır.
+# - Tam çıkarım kaldığı yerden devam edebilen bir iştir (extraction_job.py): her SHARD_SIZE görsellik shard
+#   bitince diske yazılır; kesilen çalıştırma aynı komutla son tamamlanan shard'dan devam eder. Bitince
+#   shard'lar memmap ile tek matrise birleştirilip atomik olarak yerine konur.
+# - Büyük kataloglarda birden çok süreç ayrık shard aralıklarında çalışabilir (--shards 0/4 ... 3/4),
+#   sonra --merge ile birleştirilir.
+# - Sonda görsel/s hızı (model başına) ile veri bekleme / çıkarım süreleri yazdırılır
+#   (batch ve işçi sayısını ayarlamak için).
+# - --incremental: içerik hash'i anahtarlı depo (embedding_store.py) ile yalnızca yeni / değişen görseller
+#   gömülür; silinenlerin satırları mezar taşı olur ve sonra sıkıştırılır. Yayınlanan .npy + filenames.json
+#   tam çıkarımla aynı (sıralı) düzendedir.
+# - --backend: çıkarım backend'i (eager, torchscript, onnx, int8-dynamic, int8-static; inference_backends.py).
+#   Eager dışındakileri kullanmadan önce validate_backends.py ile arama sonuçlarına etkisini ölçün.
+#   Kullanılan backend {model}_features.backend.json'a yazılır; sunucu upload sorgusunu aynı backend'le gömer.
+#   int8-static bir kez, katalogun tamamından seçilen görsellerle kalibre edilir ve sonraki tüm çalıştırmalar
+#   kayıtlı modeli kullanır; --recalibrate yeniden kalibre eder (depo / iş modeli değiştiği için baştan kurulur).
+# pipeline.py "features" aşaması update_models(MODEL_TYPES) fonksiyonunu süreç içinden çağırır.
+#
+# Kullanım:
+#   python extract_features.py --models pattern --batch-size 64 --workers 4 --threads 8
+#   python extract_features.py --models pattern,color,texture --incremental [--compact]
+#   python extract_features.py --models pattern --backend torchscript
+#   python extract_features.py --models pattern,color,texture --shards 0/4   (her süreç için 0/4 ... 3/4)
+#   python extract_features.py --models pattern,color,texture --merge
 
 import os
 import json
+import time
+import argparse
 import torch
 import numpy as np
-from torchvision import models, transforms
-from PIL import Image
 from tqdm import tqdm
+from torch.utils.data import Dataset, DataLoader
+from embedding_model import ModelViews, IMAGE_SIZE, MODEL_TYPES, PREPROCESS_VERSIONS
+from image_io import open_image
+from embedding_store import EmbeddingStore, COMPACT_RATIO
+from feature_store import record_backend
+from extraction_job import ExtractionJob, SHARD_SIZE, open_job, parse_shard_range, check_shard_spec
+from inference_backends import (BACKENDS, CALIBRATION_BACKENDS, CALIBRATION_IMAGES, INT8_STATIC_PATH,
+                                backend_device, load_model, model_id)
 
 # Giriş klasörü ve model türü (pattern, color, texture)
 INPUT_FOLDER = "realImages"
 MODEL_TYPE = "pattern"  # pattern / color / texture
+FEATURE_DIR = "image_features"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Opsiyonel sıkıştırılmış kopyalar (quantize_features.py): "float16", "int8", "pq" — boş liste = üretme
+QUANTIZE_MODES = []
 
-# Çıkış yolları
-os.makedirs("image_features", exist_ok=True)
-feature_out = f"image_features/{MODEL_TYPE}_features.npy"
-filenames_out = f"image_features/{MODEL_TYPE}_filenames.json"
-
-# GPU kullanılabiliyorsa aktif et
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-# ResNet18 yüklüyoruz (son katmanı kullanmıyoruz)
-model = models.resnet18(pretrained=True)
-model = torch.nn.Sequential(*list(model.children())[:-1])
-model.to(device)
-model.eval()
-
-# Model türüne göre transform ayarı
-if MODEL_TYPE == "pattern":
-    transform = transforms.Compose([
-        transforms.Grayscale(num_output_channels=3),
-        transforms.Resize((224, 224)),
-        transforms.ToTensor()
-    ])
-elif MODEL_TYPE == "color":
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor()
-    ])
-elif MODEL_TYPE == "texture":
-    transform = transforms.Compose([
-        transforms.Grayscale(num_output_channels=3),
-        transforms.Resize((224, 224)),
-        transforms.GaussianBlur(kernel_size=(3, 3), sigma=(0.1, 2.0)),
-        transforms.ToTensor()
-    ])
-else:
-    raise ValueError("Geçersiz MODEL_TYPE")
-
-features = []
-image_paths = []
-
-print("📦 Görseller işleniyor...")
-for fname in tqdm(os.listdir(INPUT_FOLDER)):
-    if not fname.lower().endswith(('.jpg', '.jpeg', '.png')):
-        continue
-
-    fpath = os.path.join(INPUT_FOLDER, fname)
+# Batch / işçi ayarları (CPU'da çekirdeklerin bir kısmı decode'a, kalanı çıkarıma ayrılır).
+# BATCH_SIZE kaynak görsel sayısıdır; ileri geçiş batch'i BATCH_SIZE × model sayısıdır.
+BATCH_SIZE = 64
+NUM_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+TORCH_THREADS = max(1, (os.cpu_count() or 2) - NUM_WORKERS)
+# Çıkarım backend'i (inference_backends.BACKENDS)
+INFERENCE_BACKEND = "eager"
+
+
+def feature_paths(model_type, feature_dir=FEATURE_DIR):
+    """(feature matrisi, dosya adı listesi) çıktı yolları."""
+    return (os.path.join(feature_dir, f"{model_type}_features.npy"),
+            os.path.join(feature_dir, f"{model_type}_filenames.json"))
+
+
+def list_images(input_folder=INPUT_FOLDER):
+    # Sıralı liste: tüm model türlerinin {model}_filenames.json dosyaları aynı satır sırasına sahip olur
+    return [f for f in sorted(os.listdir(input_folder)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+class ImageDataset(Dataset):
+    """Görseli bir kez açıp tüm model türlerinin girdilerini üretir; (model × 3 × H × W tensor, satır, geçerli mi)
+    döner. Açılamayan görsel boş tensor + False olur."""
+
+    def __init__(self, input_folder, filenames, views):
+        self.input_folder = input_folder
+        self.filenames = filenames
+        self.views = views
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __getitem__(self, i):
+        fname = self.filenames[i]
+        try:
+            img = open_image(os.path.join(self.input_folder, fname), IMAGE_SIZE)
+            return torch.stack(self.views(img)), i, True
+        except Exception as e:
+            print(f"⚠️ Hata: {fname} atlandı. {e}")
+            return torch.zeros(len(self.views.model_types), 3, *IMAGE_SIZE), i, False
+
+
+def _worker_init(_):
+    # Decode işçileri tek thread kullanır; çekirdekler çıkarım thread'lerine kalır
+    torch.set_num_threads(1)
+
+
+class BatchEmbedder:
+    """Ortak backbone + model türü görünümleri. embed() görselleri DataLoader ile batch batch gömer ve
+    (satırlar, vektörler [batch × model × boyut], geçerli mi) üçlülerini sırayla döner;
+    veri bekleme / çıkarım sürelerini toplar."""
+
+    def __init__(self, model_types, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, threads=TORCH_THREADS,
+                 backend=INFERENCE_BACKEND):
+        self.model_types = tuple(model_types)
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.threads = threads
+        self.backend = backend
+        # GPU kullanılabiliyorsa aktif et (onnx / int8 backend'leri yalnızca CPU'da çalışır)
+        self.device = backend_device(backend)
+        torch.set_num_threads(threads)
+        # Model ilk embed() çağrısında yüklenir. Tüm model türleri aynı ağırlıkları paylaşır.
+        self.model = None
+        # Kayıtlı int8-static modeli (sunucu upload sorgusu aynı modeli açar; None = kayıtlı model kullanılmaz,
+        # kalibrasyon kaydedilmez)
+        self.calibrated_path = INT8_STATIC_PATH
+        # Model türlerine göre ön işleme (sunucudaki upload araması da aynı tanımları kullanır)
+        self.views = ModelViews(self.model_types)
+        self.wait_seconds = 0.0
+        self.infer_seconds = 0.0
+
+    def _loader(self, input_folder, filenames):
+        return DataLoader(
+            ImageDataset(input_folder, filenames, self.views),
+            batch_size=self.batch_size,
+            num_workers=self.num_workers,
+            pin_memory=self.device.type == "cuda",
+            worker_init_fn=_worker_init if self.num_workers else None,
+        )
+
+    def _calibration(self, input_folder, filenames):
+        """Kalibrasyon girdileri: listeye eşit aralıklarla yayılmış en fazla CALIBRATION_IMAGES görsel."""
+        step = max(1, len(filenames) // CALIBRATION_IMAGES)
+        sample = filenames[::step][:CALIBRATION_IMAGES]
+
+        def batches():
+            for images, _, ok in self._loader(input_folder, sample):
+                if ok.any():
+                    yield images[ok].flatten(0, 1)
+        return batches
+
+    def load(self, input_folder, filenames, recalibrate=False):
+        """Modeli yükler; int8-static kayıtlı model yoksa / recalibrate ise filenames'ten kalibre edilir."""
+        if self.model is None:
+            calibration = (self._calibration(input_folder, filenames)
+                           if self.backend in CALIBRATION_BACKENDS else None)
+            self.model = load_model(self.backend, self.device, self.threads, calibration, self.calibrated_path,
+                                    recalibrate)
+        return self.model
+
+    def embed(self, input_folder, filenames):
+        model = self.load(input_folder, filenames)
+        loader = self._loader(input_folder, filenames)
+        print(f"📦 Görseller işleniyor ({','.join(self.model_types)}, backend={self.backend}, "
+              f"batch={self.batch_size}, işçi={self.num_workers}, thread={self.threads})...")
+        tick = time.perf_counter()
+        with torch.inference_mode():
+            for images, rows, ok in tqdm(loader, total=len(loader)):
+                loaded = time.perf_counter()
+                # [batch, model, 3, H, W] → tek ileri geçiş → [batch, model, boyut]
+                vecs = model(images.flatten(0, 1).to(self.device, non_blocking=True)).flatten(1).cpu().numpy()
+                vecs = vecs.reshape(len(rows), len(self.model_types), -1)
+                self.wait_seconds += loaded - tick
+                self.infer_seconds += time.perf_counter() - loaded
+                yield rows.numpy(), vecs, ok.numpy().astype(bool)
+                tick = time.perf_counter()
+
+    def report(self, counts, elapsed):
+        """counts: model → gömülen görsel sayısı."""
+        images = max(counts.values(), default=0)
+        rate = images / elapsed if elapsed > 0 else 0.0
+        print(f"🚀 {rate:.1f} görsel/s, tek decode ({elapsed:.1f}s; veri bekleme {self.wait_seconds:.1f}s, "
+              f"çıkarım {self.infer_seconds:.1f}s)")
+        for model_type, count in counts.items():
+            print(f"   {model_type:<8} {count} görsel, {count / elapsed if elapsed > 0 else 0.0:.1f} görsel/s")
+
+
+def prepare_backend(backend, input_folder, filenames, recalibrate=False, batch_size=BATCH_SIZE,
+                    num_workers=NUM_WORKERS, threads=TORCH_THREADS):
+    """int8-static: kayıtlı kalibre model yoksa veya recalibrate ise katalogun tamamından (tüm model türü
+    görünümleriyle) bir kez kalibre edip kaydeder; böylece kalibrasyon çalıştırmanın gömdüğü alt kümeye bağlı olmaz.
+    Vektörleri üreten modelin kimliğini (model_id) döner."""
+    if backend in CALIBRATION_BACKENDS and (recalibrate or not os.path.exists(INT8_STATIC_PATH)):
+        print(f"🎯 {backend} modeli katalogdan kalibre ediliyor ({len(filenames)} görsel arasından)...")
+        BatchEmbedder(MODEL_TYPES, batch_size, num_workers, threads, backend).load(input_folder, filenames,
+                                                                                 recalibrate=True)
+    return model_id(backend)
+
+
+def _embed_shards(job, embedder, input_folder, shards):
+    """Shard'ların görsellerini tek DataLoader akışında gömer; her shard tamamlandıkça diske yazılır.
+    Gömülen görsel sayısını döner."""
+    files, starts = [], []
+    for shard in shards:
+        starts.append(len(files))
+        files += job.shard_files(shard)
+    starts = np.array(starts)
+    ends = np.append(starts[1:], len(files))
+    buffers, next_shard = {}, 0
+    for rows, vecs, ok in embedder.embed(input_folder, files):
+        # Batch'ler sırayla gelir; bir batch iki shard'a bölünebilir
+        positions = np.searchsorted(starts, rows, side="right") - 1
+        for pos in np.unique(positions):
+            sel = positions == pos
+            if pos not in buffers:
+                size = ends[pos] - starts[pos]
+                buffers[pos] = [np.zeros((size,) + vecs.shape[1:], dtype=np.float32), np.zeros(size, dtype=bool), 0]
+            buf = buffers[pos]
+            local = rows[sel] - starts[pos]
+            buf[0][local] = vecs[sel]
+            buf[1][local] = ok[sel]
+            buf[2] += int(sel.sum())
+        while next_shard in buffers and buffers[next_shard][2] == ends[next_shard] - starts[next_shard]:
+            matrix, valid, _ = buffers.pop(next_shard)
+            job.write_shard(shards[next_shard], {m: matrix[:, j] for j, m in enumerate(embedder.model_types)}, valid)
+            next_shard += 1
+    return len(files)
+
+
+def merge_job(job, quantize_modes=QUANTIZE_MODES):
+    """Tamamlanmış işin shard'larını feature dosyalarına birleştirir; model → görsel sayısı döner."""
+    if job.config is None:
+        raise RuntimeError("Birleştirilecek çıkarım işi yok")
+    model_types, backend, model = job.model_types, job.config["backend"], job.config.get("model_id")
+    count = job.merge({m: feature_paths(m) for m in model_types})
+    for model_type in model_types:
+        record_backend(model_type, backend, model)
+    print(f"✅ {count} görsel için özellik çıkarımı tamamlandı ({', '.join(model_types)}).")
+    if quantize_modes:
+        from quantize_features import quantize_model
+        for model_type in model_types:
+            quantize_model(model_type, quantize_modes)
+    return {m: count for m in model_types}
+
+
+def extract_models(model_types=(MODEL_TYPE,), input_folder=INPUT_FOLDER, quantize_modes=QUANTIZE_MODES,
+                   batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, threads=TORCH_THREADS,
+                   backend=INFERENCE_BACKEND, shard_size=SHARD_SIZE, shards=None, restart=False, recalibrate=False):
+    """Klasördeki tüm görsellerin istenen model türlerindeki feature'larını tek geçişte, shard shard çıkarır.
+    Önceki kesilmiş iş aynı ayarlarla varsa tamamlanmış shard'lar atlanır. shards ("A:B" / "k/N") verilirse
+    yalnızca o aralık çalışır ve birleştirme yapılmaz (paralel süreçler; sonra merge_job).
+    Model → işlenen görsel sayısı döner."""
+    os.makedirs(FEATURE_DIR, exist_ok=True)
+    model_types = tuple(model_types)
+
+    start = time.perf_counter()
+    filenames = list_images(input_folder)
+    if (shards is not None and backend in CALIBRATION_BACKENDS and not recalibrate
+            and not os.path.exists(INT8_STATIC_PATH)):
+        # Paralel süreçler aynı anda kalibre ederse farklı modellerle gömerdi
+        raise RuntimeError(f"{backend} modeli henüz kalibre edilmemiş; paralel shard'lardan önce tek süreçle "
+                           f"kalibre edin: --backend {backend} --recalibrate --restart --shards 0:0")
+    model = prepare_backend(backend, input_folder, filenames, recalibrate, batch_size, num_workers, threads)
+    config = {"models": list(model_types), "backend": backend, "model_id": model, "shard_size": shard_size,
+              "preprocess": [PREPROCESS_VERSIONS[m] for m in model_types], "filenames": filenames}
+    # Paralel süreçler ortak işe katılır; tanım farklıysa sessizce yeniden başlatmak diğerlerinin işini siler
+    job = open_job(config, restart, strict=shards is not None)
+    selected = range(job.num_shards) if shards is None else parse_shard_range(shards, job.num_shards)
+    todo = job.pending(selected)
+    print(f"🧩 {job.num_shards} shard × {job.shard_size} görsel; bu çalıştırma: {len(selected)} shard, "
+          f"{len(selected) - len(todo)} tamamlanmış, {len(todo)} kalan")
+
+    if todo:
+        embedder = BatchEmbedder(model_types, batch_size, num_workers, threads, backend)
+        try:
+            embedded = _embed_shards(job, embedder, input_folder, todo)
+        except KeyboardInterrupt:
+            done = len(selected) - len(job.pending(selected))
+            print(f"⏸️ Durduruldu: {done} / {len(selected)} shard tamamlandı, aynı komutla kaldığı yerden devam eder.")
+            raise
+        embedder.report({m: embedded for m in model_types}, time.perf_counter() - start)
+
+    if shards is not None:
+        remaining = len(job.pending(range(job.num_shards)))
+        print(f"✅ Shard {selected.start}:{selected.stop} tamamlandı"
+              + (f" ({remaining} shard başka süreçlerde)." if remaining else "; birleştirmek için: --merge"))
+        return {m: sum(len(job.read_shard(s)["filenames"]) for s in selected) for m in model_types}
+    return merge_job(job, quantize_modes)
+
+
+def extract_features(model_type=MODEL_TYPE, input_folder=INPUT_FOLDER, quantize_modes=QUANTIZE_MODES,
+                     batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, threads=TORCH_THREADS,
+                     backend=INFERENCE_BACKEND, recalibrate=False):
+    """Tek model türü için tam çıkarım; işlenen görsel sayısını döner."""
+    return extract_models((model_type,), input_folder, quantize_modes, batch_size, num_workers, threads,
+                          backend, recalibrate=recalibrate)[model_type]
+
+
+def update_models(model_types=(MODEL_TYPE,), input_folder=INPUT_FOLDER, quantize_modes=QUANTIZE_MODES,
+                  batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, threads=TORCH_THREADS,
+                  compact_ratio=COMPACT_RATIO, force_compact=False, backend=INFERENCE_BACKEND,
+                  recalibrate=False):
+    """Artımlı çıkarım: yalnızca içeriği depoda olmayan görseller gömülüp depoya eklenir, silinen / değişen
+    görsellerin satırları mezar taşı olur; canlı satırlar sıralı olarak yayınlanır.
+    Birden çok model türünde eksik görseller bir kez decode edilip tek geçişte gömülür.
+    Depo backend'i ya da kalibre model farklıysa (vektörler karışmasın diye) depo yeniden kurulur.
+    Model → yayınlanan görsel sayısı döner."""
+    os.makedirs(FEATURE_DIR, exist_ok=True)
+    model_types = tuple(model_types)
+
+    start = time.perf_counter()
+    filenames = list_images(input_folder)
+    model = prepare_backend(backend, input_folder, filenames, recalibrate, batch_size, num_workers, threads)
+    stores = {m: EmbeddingStore(m, backend=backend, preprocess=PREPROCESS_VERSIONS[m], model_id=model)
+              for m in model_types}
+    # İçerik hash'leri bir kez hesaplanır (boyut / mtime önbelleği ilk deponun tablosundan)
+    records, hashed = stores[model_types[0]].scan(input_folder, filenames)
+    failed, todo = {}, {}
+    for model_type, store in stores.items():
+        # Açılamayan dosyalar içerikleri değişmedikçe yeniden denenmez
+        failed[model_type] = {f: digest for f, digest in store.failed.items()
+                              if f in records and records[f]["hash"] == digest}
+        todo[model_type] = set(store.missing(records))
+    pending = [f for f in filenames if any(f in names for names in todo.values())]
+    print(f"🔍 {len(filenames)} görsel, {hashed} dosya hash'lendi, gömülecek: "
+          + ", ".join(f"{m} {len(todo[m])}" for m in model_types))
+
+    if pending:
+        # Yalnızca eksiği olan modeller için görünüm üretilir
+        needed = tuple(m for m in model_types if todo[m])
+        embedder = BatchEmbedder(needed, batch_size, num_workers, threads, backend)
+        for rows, vecs, ok in embedder.embed(input_folder, pending):
+            names = [pending[r] for r in rows]
+            for j, model_type in enumerate(needed):
+                keep = [k for k, fname in enumerate(names) if fname in todo[model_type]]
+                for k in keep:
+                    if not ok[k]:
+                        failed[model_type][names[k]] = records[names[k]]["hash"]
+                keep = [k for k in keep if ok[k]]
+                if keep:
+                    stores[model_type].append(vecs[keep, j], [records[names[k]]["hash"] for k in keep])
+        embedder.report({m: len(todo[m]) for m in needed}, time.perf_counter() - start)
+
+    result = {}
+    for model_type, store in stores.items():
+        feature_out, filenames_out = feature_paths(model_type)
+        store.commit(records, failed[model_type])
+
+        dead = store.dead_rows()
+        if dead and (force_compact or dead > compact_ratio * len(store.rows)):
+            print(f"🧹 {model_type}: {store.compact()} ölü satır sıkıştırıldı")
+
+        live = [f for f in filenames if f not in failed[model_type]]
+        result[model_type] = len(live)
+        if store.is_published(live, feature_out, filenames_out):
+            record_backend(model_type, backend, model)
+            print(f"✅ {model_type}: feature dosyaları güncel ({len(live)} görsel, {dead} ölü satır).")
+            continue
+        store.publish(live, feature_out, filenames_out)
+        record_backend(model_type, backend, model)
+        print(f"✅ {model_type}: {len(live)} görsel yayınlandı ({len(todo[model_type])} yeni gömme) → {feature_out}")
+        if quantize_modes:
+            from quantize_features import quantize_model
+            quantize_model(model_type, quantize_modes)
+    return result
+
+
+def update_features(model_type=MODEL_TYPE, input_folder=INPUT_FOLDER, quantize_modes=QUANTIZE_MODES,
+                    batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, threads=TORCH_THREADS,
+                    compact_ratio=COMPACT_RATIO, force_compact=False, backend=INFERENCE_BACKEND,
+                    recalibrate=False):
+    """Tek model türü için artımlı çıkarım; yayınlanan görsel sayısını döner."""
+    return update_models((model_type,), input_folder, quantize_modes, batch_size, num_workers, threads,
+                         compact_ratio, force_compact, backend, recalibrate)[model_type]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ResNet18 feature çıkarımı")
+    parser.add_argument("--models", default=MODEL_TYPE,
+                        help="Virgülle ayrılmış model türleri (pattern,color,texture); hepsi tek decode ile çıkarılır")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Decode işçi süreci sayısı (0 = ana süreç)")
+    parser.add_argument("--threads", type=int, default=TORCH_THREADS, help="Çıkarım için torch thread sayısı")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Yalnızca yeni / değişen görselleri göm (embedding_store.py deposu)")
+    parser.add_argument("--compact", action="store_true", help="Artımlı modda ölü satırları hemen sıkıştır")
+    parser.add_argument("--backend", choices=BACKENDS, default=INFERENCE_BACKEND,
+                        help="Çıkarım backend'i (doğruluk için: python validate_backends.py)")
+    parser.add_argument("--recalibrate", action="store_true",
+                        help="int8-static modelini katalogdan yeniden kalibre et (depolar baştan kurulur)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Tam çıkarımda shard başına görsel")
+    parser.add_argument("--shards", help="Yalnızca bu shard aralığını çıkar: A:B veya k/N (paralel süreçler)")
+    parser.add_argument("--merge", action="store_true", help="Tamamlanmış shard'ları feature dosyalarına birleştir")
+    parser.add_argument("--restart", action="store_true", help="Yarım kalan çıkarım işini silip baştan başla")
+    args = parser.parse_args()
+
+    model_types = [m for m in args.models.split(",") if m]
+    unknown = set(model_types) - set(MODEL_TYPES)
+    if unknown:
+        parser.error(f"Geçersiz model türü: {', '.join(sorted(unknown))}")
+    if args.incremental and (args.shards or args.merge):
+        parser.error("--shards / --merge yalnızca tam çıkarımda kullanılır")
+    if args.shards:
+        try:
+            check_shard_spec(args.shards)
+        except ValueError as e:
+            parser.error(str(e))
     try:
-        img = Image.open(fpath).convert("RGB")
-        img_t = transform(img).unsqueeze(0).to(device)
-
-        with torch.no_grad():
-            vec = model(img_t).squeeze().cpu().numpy()
-            features.append(vec)
-            image_paths.append(os.path.basename(fpath))
-    except Exception as e:
-        print(f"⚠️ Hata: {fname} atlandı. {e}")
-
-# Kayıt
-np.save(feature_out, np.array(features))
-with open(filenames_out, "w", encoding="utf-8") as f:
-    json.dump(image_paths, f, indent=2)
-
-print(f"✅ {len(features)} görsel için özellik çıkarımı tamamlandı.")
+        if args.merge:
+            merge_job(ExtractionJob())
+        elif args.incremental:
+            update_models(model_types, batch_size=args.batch_size, num_workers=args.workers, threads=args.threads,
+                          force_compact=args.compact, backend=args.backend, recalibrate=args.recalibrate)
+        else:
+            extract_models(model_types, batch_size=args.batch_size, num_workers=args.workers, threads=args.threads,
+                           backend=args.backend, shard_size=args.shard_size, shards=args.shards,
+                           restart=args.restart, recalibrate=args.recalibrate)
+    except (RuntimeError, ValueError) as e:
+        # ValueError: shard aralığı işin shard sayısını aşıyor
+        parser.exit(1, f"❌ {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# extraction_job.py
+# Oluşturulma: 2025-05-12
+# Hazırlayan: Kafkas
+# Açıklama:
+# Tam feature çıkarımı için kaldığı yerden devam edebilen, shard'lara bölünmüş iş (job).
+# - İş, image_features/extract_job/job.json manifestinde tanımlanır: model türleri, backend, kalibre model kimliği
+#   (int8-static, inference_backends.model_id), ön işleme sürümleri, shard boyutu ve başlangıçtaki sıralı dosya listesi.
+#   Shard i, listenin [i × boyut, (i + 1) × boyut) aralığıdır.
+# - Her shard bitince diske yazılır: model başına shard_XXXXX.{model}.npy (yalnızca açılabilen görseller)
+#   ve en son shard_XXXXX.json (dosya adları + açılamayanlar). JSON tamamlanma işaretidir; çökme / Ctrl-C
+#   sonrası aynı komut tamamlanmış shard'ları atlayıp kalanlardan devam eder (en fazla bir shard kaybolur).
+# - Birden çok yerel süreç aynı işin ayrık shard aralıklarında ("A:B" veya "k/N") paralel çalışabilir;
+#   süreçler yalnızca kendi shard dosyalarını yazar.
+# - merge(): tüm shard'lar bitince model başına shard'lar sırayla (mmap) okunup geçici .npy'ye (memmap)
+#   kopyalanır ve atomik olarak {model}_features.npy yerine konur; bellekte tek shard kadar veri tutulur.
+#   Birleştirme sonrası iş klasörü silinir.
+# Çıkarımın kendisi extract_features.py içindedir (extract_models / --shards / --merge).
+
+import os
+import json
+import shutil
+import numpy as np
+
+from atomic_io import atomic_save_npy, atomic_write_json, atomic_replace, tmp_path_for
+from feature_store import FEATURE_DIR
+
+JOB_DIR = os.path.join(FEATURE_DIR, "extract_job")
+SHARD_SIZE = 2048
+
+
+def check_shard_spec(spec):
+    """Shard tanımının sözdizimini doğrular (shard sayısı bilinmeden); ("part", k, N) veya ("range", A, B) döner.
+    B verilmemişse None'dır."""
+    if "/" in spec:
+        part, parts = (int(v) for v in spec.split("/"))
+        if parts <= 0 or not 0 <= part < parts:
+            raise ValueError(f"Geçersiz parça: {spec}")
+        return "part", part, parts
+    start, _, end = spec.partition(":")
+    start = int(start) if start else 0
+    end = int(end) if end else None
+    if start < 0 or (end is not None and start > end):
+        raise ValueError(f"Geçersiz shard aralığı: {spec}")
+    return "range", start, end
+
+
+def parse_shard_range(spec, num_shards):
+    """"A:B" (B hariç, boş uç = baş / son) veya "k/N" (N eşit parçanın k'ıncısı, 0'dan) → range.
+    B shard sayısına kırpılır; A shard sayısını aşıyorsa ValueError."""
+    kind, a, b = check_shard_spec(spec)
+    if kind == "part":
+        return range(a * num_shards // b, (a + 1) * num_shards // b)
+    end = num_shards if b is None else min(b, num_shards)
+    if a > end:
+        raise ValueError(f"Geçersiz shard aralığı: {spec} (işte {num_shards} shard var)")
+    return range(a, end)
+
+
+class ExtractionJob:
+    def __init__(self, job_dir=JOB_DIR):
+        self.job_dir = job_dir
+        self.manifest_path = os.path.join(job_dir, "job.json")
+        self.config = None
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    self.config = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print(f"⚠️ {self.manifest_path} okunamadı, iş yeniden başlatılacak.")
+                shutil.rmtree(self.job_dir)
+
+    # --- İş tanımı ---
+    @property
+    def model_types(self):
+        return tuple(self.config["models"])
+
+    @property
+    def filenames(self):
+        return self.config["filenames"]
+
+    @property
+    def shard_size(self):
+        return self.config["shard_size"]
+
+    @property
+    def num_shards(self):
+        return -(-len(self.filenames) // self.shard_size)
+
+    def create(self, config, clear=False):
+        """Yeni işi başlatır; clear=True ise önceki işin shard'ları silinir.
+        Aynı anda başlayan süreçler aynı manifesti atomik yazar, birbirlerinin dosyalarını silmez."""
+        if clear and os.path.isdir(self.job_dir):
+            shutil.rmtree(self.job_dir)
+        os.makedirs(self.job_dir, exist_ok=True)
+        atomic_write_json(self.manifest_path, config)
+        self.config = config
+
+    # --- Shard'lar ---
+    def shard_files(self, shard):
+        return self.filenames[shard * self.shard_size:(shard + 1) * self.shard_size]
+
+    def shard_path(self, shard, model_type=None):
+        suffix = f"{model_type}.npy" if model_type else "json"
+        return os.path.join(self.job_dir, f"shard_{shard:05d}.{suffix}")
+
+    def is_done(self, shard):
+        return os.path.exists(self.shard_path(shard))
+
+    def pending(self, shards):
+        return [s for s in shards if not self.is_done(s)]
+
+    def read_shard(self, shard):
+        with open(self.shard_path(shard), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_shard(self, shard, vectors, ok):
+        """vectors: model → [shard boyutu × boyut]; ok: açılabilen görseller maskesi.
+        Önce .npy'ler, en son tamamlanma işareti olan .json yazılır."""
+        names = self.shard_files(shard)
+        for model_type, matrix in vectors.items():
+            atomic_save_npy(self.shard_path(shard, model_type), np.ascontiguousarray(matrix[ok], dtype=np.float32))
+        atomic_write_json(self.shard_path(shard), {
+            "filenames": [f for f, good in zip(names, ok) if good],
+            "failed": [f for f, good in zip(names, ok) if not good],
+        })
+
+    # --- Birleştirme ---
+    def merge(self, outputs):
+        """outputs: model → (feature .npy yolu, filenames .json yolu). Shard'ları sırayla kopyalayıp
+        atomik yazar, iş klasörünü siler; birleştirilen görsel sayısını döner."""
+        if self.config is None:
+            raise RuntimeError("Birleştirilecek çıkarım işi yok")
+        missing = self.pending(range(self.num_shards))
+        if missing:
+            raise RuntimeError(f"{len(missing)} / {self.num_shards} shard tamamlanmamış (ilk eksik: {missing[0]})")
+
+        shards = [self.read_shard(s) for s in range(self.num_shards)]
+        filenames = [f for shard in shards for f in shard["filenames"]]
+        failed = sum(len(shard["failed"]) for shard in shards)
+        for model_type, (feature_path, filenames_path) in outputs.items():
+            parts = [np.load(self.shard_path(s, model_type), mmap_mode="r") for s in range(self.num_shards)]
+            dim = next((p.shape[1] for p in parts if p.ndim == 2 and len(p)), None)
+            if dim is None:
+                atomic_save_npy(feature_path, np.array([], dtype=np.float32))
+            else:
+                tmp_path = tmp_path_for(feature_path)
+                try:
+                    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                                    shape=(len(filenames), dim))
+                    row = 0
+                    for part in parts:
+                        out[row:row + len(part)] = part
+                        row += len(part)
+                    out.flush()
+                    del out
+                    atomic_replace(tmp_path, feature_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            del parts
+            atomic_write_json(filenames_path, filenames, indent=2)
+
+        if failed:
+            print(f"⚠️ {failed} görsel açılamadığı için atlandı.")
+        shutil.rmtree(self.job_dir)
+        self.config = None
+        return len(filenames)
+
+
+def open_job(config, restart=False, strict=False, job_dir=JOB_DIR):
+    """Aynı tanımlı iş varsa devam eder, yoksa yenisini başlatır. Tanım farklıysa (katalog / ayar değişti)
+    strict=False iken iş yeniden başlatılır, strict=True iken (paralel süreçler) hata verilir."""
+    job = ExtractionJob(job_dir)
+    if job.config is None or restart:
+        job.create(config, clear=restart)
+    elif job.config != config:
+        if strict:
+            raise RuntimeError(f"{job.manifest_path} farklı bir katalog / ayarla başlatılmış; "
+                               "tüm süreçleri aynı ayarlarla çalıştırın veya --restart ile yeni iş başlatın")
+        print("⚠️ Önceki çıkarım işi farklı bir katalog / ayarla başlatılmış, yeniden başlatılıyor.")
+        job.create(config, clear=True)
+    return job
@@ -0,0 +1,363 @@
+# feature_store.py
+# Oluşturulma: 2025-04-22
+# Hazırlayan: Kafkas
+# Açıklama:
+# /find-similar ve diğer benzerlik endpointleri için süreç genelinde paylaşılan feature deposu.
+# Her model türünün (pattern, color, texture) feature matrisi, filename → satır sözlüğü
+# ve image_metadata_map.json yalnızca bir kez yüklenir ve bellekte tutulur.
+# Alttaki dosyaların mtime/size bilgisi değişirse veri arka planda hazırlanıp
+# tek bir referans değişimiyle (atomik olarak) yenisiyle değiştirilir.
+# Yükleme / yeniden yükleme süreleri stats() ile dışarı verilir.
+# Yükleme sırasında puanlamaya hazır kopyalar da bir kez üretilir:
+# float32 matris, L2-normalize float32 matris (cosine) ve kare normlar (euclidean).
+#
+# Feature matrisleri memory-mapped (np.load(mmap_mode="r")) açılır; böylece birden çok sunucu
+# worker süreci aynı sayfa önbelleği (page cache) kopyasını paylaşır ve açılışta tam okuma yapılmaz.
+# Normalize matris ve kare normlar da kaynağın yanına {model}_features.normalized.npy /
+# {model}_features.sqnorms.npy olarak bir kez yazılır ve diğer worker'lar bunları mmap ile açar.
+# Tüm matris yazımları geçici dosyaya yazılıp os.replace ile atomik olarak değiştirilir;
+# okuyucular hiçbir zaman yarım yazılmış bir matris görmez (eski mmap eski dosyayı görmeye devam eder).
+# Metadata SQLite deposundan (metadata_store.py) okunur; snapshot imzası depo sürümüdür.
+# Vektörleri üreten çıkarım backend'i {model}_features.backend.json'da tutulur (extract_features.py yazar,
+# yoksa eager); upload araması sorgu görselini aynı backend'le gömer. Kalibre edilen backend'lerde kalibre model
+# dosyasının hash'i (model_id) de oraya yazılır; dosya snapshot imzasının parçası olduğundan yeniden kalibrasyon
+# sunucuyu yeniden yükletir.
+
+import os
+import json
+import time
+import threading
+import numpy as np
+
+from similarity_index import prepare_vectors, squared_norms
+from atomic_io import atomic_save_npy, atomic_write_json
+from metadata_filter import FilterIndex
+from metadata_store import metadata_db as default_metadata_db
+
+FEATURE_DIR = "image_features"
+MODEL_TYPES = ("pattern", "color", "texture")
+# False yapılırsa matrisler sürece özel olarak tamamen belleğe okunur
+MMAP_FEATURES = True
+
+
+def backend_path(model, feature_dir=FEATURE_DIR):
+    return os.path.join(feature_dir, f"{model}_features.backend.json")
+
+
+def record_backend(model, backend, model_id=None, feature_dir=FEATURE_DIR):
+    """Yayınlanan feature dosyalarını üreten çıkarım backend'ini (ve kalibre modelin kimliğini) kaydeder.
+    Kayıt değişmediyse dosyaya dokunulmaz (snapshot imzası boşuna değişmesin)."""
+    record = {"backend": backend, "model_id": model_id}
+    if read_backend(model, feature_dir) != (backend, model_id):
+        atomic_write_json(backend_path(model, feature_dir), record)
+
+
+def read_backend(model, feature_dir=FEATURE_DIR):
+    """Modelin feature'larını üreten (backend, model_id); kayıt yoksa / okunamıyorsa (eager, None)."""
+    try:
+        with open(backend_path(model, feature_dir), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("backend", "eager"), data.get("model_id")
+    except (OSError, ValueError, AttributeError):
+        return "eager", None
+
+
+def file_signature(path):
+    """Dosyanın (mtime_ns, size) imzasını döner, dosya yoksa None."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ModelFeatures:
+    """Bir model türünün bellekteki değişmez kopyası (snapshot)."""
+
+    def __init__(self, model, features, filenames, signature, load_seconds, normalized=None, sq_norms=None,
+                 backend="eager", model_id=None):
+        self.model = model
+        self.backend = backend
+        # Kalibre edilen backend'de vektörleri üreten model dosyasının hash'i (inference_backends.model_id)
+        self.model_id = model_id
+        self.features = features
+        # float32 mmap zaten C-sıralı olduğundan burada kopya oluşmaz
+        self.vectors = np.ascontiguousarray(features, dtype=np.float32)
+        self.normalized = prepare_vectors(self.vectors, "cosine") if normalized is None else normalized
+        self.sq_norms = squared_norms(self.vectors) if sq_norms is None else sq_norms
+        self.filenames = filenames
+        self.index = {name: i for i, name in enumerate(filenames)}
+        self.signature = signature
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        # similarity_index.get_index tarafından doldurulur: (backend, metric) → indeks
+        self.indexes = {}
+        # knn_graph.load_graph tarafından doldurulur: metric → (graf dosyası imzası, KnnGraph veya None)
+        self.knn_graphs = {}
+        # (metadata imzası, FilterIndex) — metadata değişince yeniden kurulur
+        self._filter_index = (None, None)
+
+    def row(self, filename):
+        """Görselin matris satırını döner, yoksa None."""
+        return self.index.get(filename)
+
+    def vectors_for(self, metric):
+        """Metriğe göre puanlamaya hazır matris: cosine → normalize, euclidean → ham float32."""
+        return self.normalized if metric == "cosine" else self.vectors
+
+
+class AlignedFeatures:
+    """Birden çok modelin ortak görseller üzerinden satır satır hizalanmış görünümü.
+    Satır i, tüm modellerde aynı görsele karşılık gelir; böylece çoklu model (fused)
+    puanlamasında satır başına sözlük araması gerekmez. Model matrisleri sütun yönünde
+    birleştirilir: [pattern | color | texture] → tek matris-matris çarpımıyla tüm model puanları."""
+
+    def __init__(self, snapshots):
+        self.models = tuple(s.model for s in snapshots)
+        self.signature = tuple(s.signature for s in snapshots)
+        base = snapshots[0]
+        if all(s.filenames == base.filenames for s in snapshots[1:]):
+            self.filenames = base.filenames
+            self.rows = [np.arange(len(base.filenames)) for _ in snapshots]
+        else:
+            # Dosya sıraları farklıysa hizalama yalnızca bir kez, burada kurulur
+            self.filenames = [f for f in base.filenames if all(f in s.index for s in snapshots[1:])]
+            self.rows = [np.array([s.index[f] for f in self.filenames], dtype=np.int64) for s in snapshots]
+        self.index = {name: i for i, name in enumerate(self.filenames)}
+        self.offsets = np.concatenate([[0], np.cumsum([s.vectors.shape[1] for s in snapshots])])
+        self.sq_norms = np.stack([s.sq_norms[r] for s, r in zip(snapshots, self.rows)], axis=1)
+        self._snapshots = snapshots
+        self._matrices = {}
+        self._lock = threading.Lock()
+        self._filter_index = (None, None)
+
+    def row(self, filename):
+        return self.index.get(filename)
+
+    def matrix(self, metric):
+        """Metriğe göre hizalanmış, sütun yönünde birleştirilmiş float32 matris (ilk kullanımda kurulur)."""
+        matrix = self._matrices.get(metric)
+        if matrix is None:
+            with self._lock:
+                matrix = self._matrices.get(metric)
+                if matrix is None:
+                    matrix = np.hstack([s.vectors_for(metric)[r] for s, r in zip(self._snapshots, self.rows)])
+                    self._matrices[metric] = matrix
+        return matrix
+
+
+class MetadataSnapshot:
+    """image_metadata_map.json içeriğinin bellekteki değişmez kopyası."""
+
+    def __init__(self, data, signature, load_seconds):
+        self.data = data
+        self.signature = signature
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+
+class FeatureStore:
+    def __init__(self, feature_dir=FEATURE_DIR, metadata_db=None):
+        self.feature_dir = feature_dir
+        self.metadata_db = metadata_db or default_metadata_db
+        self._models = {}
+        self._metadata = None
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._aligned = {}
+
+    # --- Dosya yolları ---
+    def feature_path(self, model):
+        return os.path.join(self.feature_dir, f"{model}_features.npy")
+
+    def filenames_path(self, model):
+        return os.path.join(self.feature_dir, f"{model}_filenames.json")
+
+    def derived_paths(self, model):
+        base = os.path.join(self.feature_dir, f"{model}_features")
+        return base + ".normalized.npy", base + ".sqnorms.npy", base + ".derived.json"
+
+    def _model_signature(self, model):
+        feat_sig = file_signature(self.feature_path(model))
+        names_sig = file_signature(self.filenames_path(model))
+        if feat_sig is None or names_sig is None:
+            return None
+        # Backend kaydı değişirse de snapshot yenilenir (kayıt olmayabilir)
+        return (feat_sig, names_sig, file_signature(backend_path(model, self.feature_dir)))
+
+    # --- Yükleme ---
+    def _load_derived(self, model, vectors, feature_signature):
+        """Normalize matris + kare normları diskten mmap ile açar; yoksa / eskiyse üretip atomik yazar.
+        Yazma başarısız olursa (ör. salt okunur klasör) sürece özel kopyalar kullanılır."""
+        norm_path, sq_path, meta_path = self.derived_paths(model)
+        mmap_mode = "r" if MMAP_FEATURES else None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                if tuple(json.load(f).get("source", [])) == tuple(feature_signature):
+                    return np.load(norm_path, mmap_mode=mmap_mode), np.load(sq_path)
+        except (OSError, ValueError):
+            pass
+
+        normalized = prepare_vectors(vectors, "cosine")
+        sq_norms = squared_norms(vectors)
+        try:
+            atomic_save_npy(norm_path, normalized)
+            atomic_save_npy(sq_path, sq_norms)
+            # meta en son yazılır: meta yeniyse .npy dosyaları da yenidir
+            atomic_write_json(meta_path, {"source": list(feature_signature)})
+            if MMAP_FEATURES:
+                normalized = np.load(norm_path, mmap_mode="r")
+        except OSError as e:
+            print(f"⚠️ {model} için türetilmiş matrisler yazılamadı, sürece özel kopya kullanılacak: {e}")
+        return normalized, sq_norms
+
+    def _load_model(self, model, signature):
+        start = time.perf_counter()
+        features = np.load(self.feature_path(model), mmap_mode="r" if MMAP_FEATURES else None)
+        with open(self.filenames_path(model), "r", encoding="utf-8") as f:
+            filenames = json.load(f)
+        if len(filenames) != features.shape[0]:
+            raise ValueError(
+                f"{model}: feature satır sayısı ({features.shape[0]}) ile filename sayısı ({len(filenames)}) uyuşmuyor"
+            )
+        vectors = np.ascontiguousarray(features, dtype=np.float32)
+        normalized, sq_norms = self._load_derived(model, vectors, signature[0])
+        elapsed = time.perf_counter() - start
+        backend, model_id = read_backend(model, self.feature_dir)
+        return ModelFeatures(model, features, filenames, signature, elapsed, normalized, sq_norms,
+                             backend, model_id)
+
+    def _load_metadata(self, signature):
+        start = time.perf_counter()
+        data = self.metadata_db.load_all()
+        elapsed = time.perf_counter() - start
+        return MetadataSnapshot(data, signature, elapsed)
+
+    def _record_timing(self, key, seconds, reloaded):
+        entry = self._timings.setdefault(key, {"loads": 0, "reloads": 0, "last_seconds": None, "total_seconds": 0.0})
+        entry["loads"] += 1
+        if reloaded:
+            entry["reloads"] += 1
+        entry["last_seconds"] = round(seconds, 6)
+        entry["total_seconds"] = round(entry["total_seconds"] + seconds, 6)
+
+    def get(self, model):
+        """Modelin güncel snapshot'ını döner; dosyalar yoksa None.
+        Dosya imzası değiştiyse yeni snapshot yüklenip eskisinin yerine konur."""
+        signature = self._model_signature(model)
+        if signature is None:
+            return None
+
+        current = self._models.get(model)
+        if current is not None and current.signature == signature:
+            return current
+
+        with self._lock:
+            current = self._models.get(model)
+            if current is not None and current.signature == signature:
+                return current
+            try:
+                snapshot = self._load_model(model, signature)
+            except ValueError as e:
+                # Matris ve filename dosyası ayrı ayrı değiştirilirken arada yakalandık:
+                # eldeki snapshot ile devam et, bir sonraki istekte tekrar denenecek
+                print(f"⚠️ {e}")
+                return current
+            self._models[model] = snapshot
+            self._record_timing(model, snapshot.load_seconds, reloaded=current is not None)
+            print(f"📦 {model} feature'ları yüklendi: {len(snapshot.filenames)} görsel, {snapshot.load_seconds:.3f}s")
+            return snapshot
+
+    def metadata(self):
+        """Güncel metadata snapshot'ını döner; depo boşsa boş snapshot.
+        image_metadata_map.json dışarıdan yeniden üretildiyse önce depoya alınır."""
+        self.metadata_db.sync_from_json()
+        signature = self.metadata_db.version()
+        if not signature:
+            return MetadataSnapshot({}, None, 0.0)
+
+        current = self._metadata
+        if current is not None and current.signature == signature:
+            return current
+
+        with self._lock:
+            current = self._metadata
+            if current is not None and current.signature == signature:
+                return current
+            snapshot = self._load_metadata(signature)
+            self._metadata = snapshot
+            self._record_timing("metadata", snapshot.load_seconds, reloaded=current is not None)
+            return snapshot
+
+    def aligned(self, models):
+        """Verilen modellerin hizalanmış görünümünü döner; model dosyalarından biri yoksa None.
+        Snapshot'lardan biri yenilenirse hizalama da yeniden kurulur."""
+        snapshots = [self.get(m) for m in models]
+        if any(s is None for s in snapshots):
+            return None
+        key = tuple(models)
+        signature = tuple(s.signature for s in snapshots)
+        current = self._aligned.get(key)
+        if current is not None and current.signature == signature:
+            return current
+        with self._lock:
+            current = self._aligned.get(key)
+            if current is None or current.signature != signature:
+                current = AlignedFeatures(snapshots)
+                self._aligned[key] = current
+            return current
+
+    def filter_index(self, snapshot, meta=None):
+        """Model snapshot'ının (veya AlignedFeatures) satır sırasıyla hizalı sütunsal filtre indeksini döner."""
+        meta = meta if meta is not None else self.metadata()
+        signature, index = snapshot._filter_index
+        if index is not None and signature == meta.signature:
+            return index
+        with self._lock:
+            signature, index = snapshot._filter_index
+            if index is None or signature != meta.signature:
+                index = FilterIndex(snapshot.filenames, meta.data)
+                snapshot._filter_index = (meta.signature, index)
+            return index
+
+    def reload(self, model=None):
+        """İmzadan bağımsız olarak zorla yeniden yükler (model=None ise hepsi)."""
+        with self._lock:
+            if model is None:
+                self._models.clear()
+                self._metadata = None
+            else:
+                self._models.pop(model, None)
+        models = [model] if model else list(MODEL_TYPES)
+        for m in models:
+            self.get(m)
+        self.metadata()
+
+    def stats(self):
+        models = {}
+        for name, snap in list(self._models.items()):
+            models[name] = {
+                "rows": len(snap.filenames),
+                "dim": int(snap.features.shape[1]) if snap.features.ndim == 2 else None,
+                "loaded_at": snap.loaded_at,
+                "load_seconds": round(snap.load_seconds, 6),
+                "backend": snap.backend,
+                "model_id": snap.model_id,
+            }
+            filter_index = snap._filter_index[1]
+            if filter_index is not None:
+                models[name]["filter_cache"] = {"hits": filter_index.hits, "misses": filter_index.misses}
+        meta = self._metadata
+        return {
+            "models": models,
+            "metadata": {
+                "entries": len(meta.data),
+                "loaded_at": meta.loaded_at,
+                "load_seconds": round(meta.load_seconds, 6),
+            } if meta else None,
+            "timings": dict(self._timings),
+        }
+
+
+# Süreç genelinde tek örnek
+feature_store = FeatureStore()
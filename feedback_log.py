@@ -0,0 +1,245 @@
+# feedback_log.py
+# Oluşturulma: 2025-05-05
+# Hazırlayan: Kafkas
+# Açıklama:
+# Yıldız (feedback) tıklamaları için yalnızca sona eklenen (append-only) JSONL günlüğü.
+# - Her tıklama feedback_log.jsonl'a tek satır olarak eklenir; dosya baştan yazılmaz.
+#   feedback=None satırı, aynı (anchor, output, model, version) için önceki oyu iptal eder.
+# - Bellekte (anchor, output, model, version) → son kayıt indeksi tutulur; açılışta günlük bir kez okunur.
+# - Anchor ve model/versiyon bazlı özetler (adet, ortalama, dağılım) artımlı güncellenir;
+#   okuma API'si günlüğü taramaz.
+# - fsync politikası: "always" (her satırda), "interval" (arka planda en geç FSYNC_INTERVAL saniyede bir),
+#   "never" (işletim sistemine bırakılır).
+# - Günlükteki satır sayısı canlı kayıtların COMPACT_RATIO katını aşınca arka planda sıkıştırılır:
+#   canlı kayıtlar yeni dosyaya yazılır, bu sırada eklenen satırlar sona taşınır ve dosya os.replace ile değiştirilir.
+# Eski feedback_log.json varsa ilk açılışta günlüğe aktarılır.
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from atomic_io import tmp_path_for
+
+FEEDBACK_LOG_PATH = "feedback_log.jsonl"
+LEGACY_FEEDBACK_PATH = "feedback_log.json"
+FSYNC_POLICIES = ("always", "interval", "never")
+FSYNC_POLICY = "interval"
+FSYNC_INTERVAL = 1.0
+COMPACT_RATIO = 2.0
+COMPACT_MIN_LINES = 1000
+
+
+def feedback_key(feedback):
+    return (feedback.get("anchor"), feedback.get("output"), feedback.get("model"), feedback.get("version"))
+
+
+class RatingStats:
+    """Puanların adet / toplam / dağılımı; ekleme ve çıkarma ile artımlı güncellenir."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.histogram = {}
+
+    def add(self, rating, sign=1):
+        self.count += sign
+        if isinstance(rating, (int, float)):
+            self.total += sign * rating
+        key = str(rating)
+        self.histogram[key] = self.histogram.get(key, 0) + sign
+        if not self.histogram[key]:
+            del self.histogram[key]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "histogram": dict(sorted(self.histogram.items())),
+        }
+
+
+class FeedbackLog:
+    def __init__(self, path=FEEDBACK_LOG_PATH, legacy_path=LEGACY_FEEDBACK_PATH, fsync_policy=FSYNC_POLICY,
+                 fsync_interval=FSYNC_INTERVAL, compact_ratio=COMPACT_RATIO, compact_min_lines=COMPACT_MIN_LINES):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Geçersiz fsync politikası: {fsync_policy}")
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+
+        self._lock = threading.RLock()
+        self._file = None
+        self._entries = {}          # (anchor, output, model, version) → kayıt
+        self._by_anchor = {}        # anchor → {(model, version): {output: puan}}
+        self._by_version = {}       # (model, version) → RatingStats
+        self._lines = 0
+        self._dirty = False
+        self._compacting = False
+        self.compactions = 0
+
+    # --- Açılış / yeniden oynatma ---
+    def _ensure_open(self):
+        if self._file is not None:
+            return
+        if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+            self._migrate_legacy()
+        if os.path.exists(self.path):
+            self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self.fsync_policy == "interval":
+            threading.Thread(target=self._flusher, name="feedback-fsync", daemon=True).start()
+
+    def _migrate_legacy(self):
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self._write_lines(self.path, [json.dumps(r, ensure_ascii=False) for r in records])
+        print(f"📥 {len(records)} feedback kaydı {self.legacy_path} → {self.path} aktarıldı.")
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Çökme sırasında yarım kalmış son satır olabilir
+                    print(f"⚠️ {self.path}:{line_no} okunamadı, atlandı.")
+                    continue
+                self._lines += 1
+                self._apply(record)
+
+    # --- İndeks ---
+    def _apply(self, record):
+        key = feedback_key(record)
+        anchor, output, model, version = key
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._by_version[(model, version)].add(old.get("feedback"), -1)
+            del self._by_anchor[anchor][(model, version)][output]
+
+        if record.get("feedback") is None:
+            return
+        self._entries[key] = record
+        self._by_anchor.setdefault(anchor, {}).setdefault((model, version), {})[output] = record["feedback"]
+        self._by_version.setdefault((model, version), RatingStats()).add(record["feedback"])
+
+    # --- Yazma ---
+    def submit(self, feedback):
+        """Oyu (veya feedback=None ile iptali) günlüğe ekler ve indeksi günceller."""
+        record = dict(feedback)
+        record.setdefault("ts", datetime.now().isoformat())
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._ensure_open()
+            self._file.write(line + "\n")
+            self._file.flush()
+            if self.fsync_policy == "always":
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+            self._lines += 1
+            self._apply(record)
+            if self._should_compact():
+                self._compacting = True
+                threading.Thread(target=self.compact, name="feedback-compact", daemon=True).start()
+
+    def _flusher(self):
+        while True:
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._dirty and self._file is not None:
+                    os.fsync(self._file.fileno())
+                    self._dirty = False
+
+    @staticmethod
+    def _write_lines(path, lines):
+        with open(path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    # --- Sıkıştırma ---
+    def _should_compact(self):
+        return (not self._compacting and self._lines >= self.compact_min_lines
+                and self._lines > self.compact_ratio * max(1, len(self._entries)))
+
+    def compact(self):
+        """Günlüğü yalnızca canlı kayıtlardan oluşacak şekilde yeniden yazar.
+        Canlı kayıtlar kilit dışında yazılır; bu arada eklenen satırlar değişimden hemen önce sona kopyalanır."""
+        tmp_path = tmp_path_for(self.path)
+        try:
+            with self._lock:
+                self._ensure_open()
+                records = list(self._entries.values())
+                offset = self._file.tell()
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for record in records:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                with self._lock:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        f.seek(offset)
+                        tail = f.read()
+                    out.write(tail)
+                    out.flush()
+                    os.fsync(out.fileno())
+                    out.close()
+                    self._file.close()
+                    os.replace(tmp_path, self.path)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                    self._lines = len(records) + tail.count("\n")
+                    self._dirty = False
+                    self.compactions += 1
+        finally:
+            self._compacting = False
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # --- Okuma API'si ---
+    def anchor_summary(self, anchor, model=None, version=None):
+        """Bir anchor görsel için model/versiyon bazında puan özeti ve çıktı başına puanlar."""
+        with self._lock:
+            self._ensure_open()
+            result = []
+            for (m, v), outputs in self._by_anchor.get(anchor, {}).items():
+                if (model and m != model) or (version and v != version) or not outputs:
+                    continue
+                stats = RatingStats()
+                for rating in outputs.values():
+                    stats.add(rating)
+                result.append({"model": m, "version": v, **stats.to_dict(), "outputs": dict(outputs)})
+            return result
+
+    def version_summary(self, model=None, version=None):
+        """Model / versiyon bazında puan özetleri (artımlı tutulan sayaçlardan)."""
+        with self._lock:
+            self._ensure_open()
+            return [
+                {"model": m, "version": v, **stats.to_dict()}
+                for (m, v), stats in sorted(self._by_version.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1])))
+                if stats.count and (not model or m == model) and (not version or v == version)
+            ]
+
+    def stats(self):
+        with self._lock:
+            self._ensure_open()
+            return {
+                "path": self.path,
+                "lines": self._lines,
+                "live": len(self._entries),
+                "fsync_policy": self.fsync_policy,
+                "compactions": self.compactions,
+            }
+
+
+# Uygulama genelinde tek örnek (dosya ilk kullanımda açılır)
+feedback_log = FeedbackLog()
@@ -5,44 +5,87 @@
 # Bu script, exported_clusters/pattern klasöründeki her cluster klasöründen bir temsilci görsel (ilk jpg) seçer.
 # Bunları exported_clusters/pattern/v1/representatives.json dosyasına yazar.
 # Dosya, versiyon açıklaması (version_comment) ile birlikte tüm cluster temsilcilerini içerir.
+# Versiyon klasörleri (v1, v2, ...) arayüzün yönettiği cluster'ları tutar; taranmaz. Mevcut representatives.json
+# değiştirilmez, birleştirilir: arayüz cluster'larının kayıtları (v1/<cluster>/ klasörü olanlar) ve diğer alanlar
+# korunur, yalnızca bu script'in ürettiği klasör temsilcileri yenilenir.
+# pipeline.py "representatives" aşaması generate_representatives() fonksiyonunu süreç içinden çağırır.
 
 import os
+import re
 import json
 from glob import glob
 
+from atomic_io import atomic_write_json
+
 CLUSTER_ROOT = "exported_clusters/pattern"
 VERSION = "v1"
 OUT_DIR = os.path.join(CLUSTER_ROOT, VERSION)
 OUT_FILE = os.path.join(OUT_DIR, "representatives.json")
+VERSION_PATTERN = re.compile(r"v\d+")
+
+
+def version_dirs(cluster_root=CLUSTER_ROOT):
+    """Arayüzün yönettiği versiyon klasörlerinin (v1, v2, ...) yolları."""
+    if not os.path.isdir(cluster_root):
+        return []
+    return sorted(os.path.join(cluster_root, name) for name in os.listdir(cluster_root)
+                  if VERSION_PATTERN.fullmatch(name) and os.path.isdir(os.path.join(cluster_root, name)))
+
+
+def _load_existing(out_file):
+    try:
+        with open(out_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def generate_representatives(cluster_root=CLUSTER_ROOT, version=VERSION):
+    """Her cluster klasörünün ilk jpg'sini temsilci seçip representatives.json'a birleştirir; cluster sayısını döner."""
+    out_dir = os.path.join(cluster_root, version)
+    out_file = os.path.join(out_dir, "representatives.json")
+
+    # ✅ Temsilci klasörü oluştur
+    os.makedirs(out_dir, exist_ok=True)
+
+    representatives = _load_existing(out_file)
+    representatives.setdefault(
+        "version_comment", "Otomatik oluşturulan ilk versiyon. Temsilciler klasörlerin ilk görselidir.")
+
+    # 🔄 Her klasörü tara ve ilk jpg'yi temsilci olarak seç (versiyon klasörleri hariç)
+    skipped = set(version_dirs(cluster_root)) | {out_dir}
+    generated = []
+    for cluster_name in sorted(os.listdir(cluster_root)):
+        cluster_path = os.path.join(cluster_root, cluster_name)
+        if not os.path.isdir(cluster_path) or cluster_path in skipped:
+            continue
 
-# ✅ Temsilci klasörü oluştur
-os.makedirs(OUT_DIR, exist_ok=True)
+        images = sorted(glob(os.path.join(cluster_path, "*.jpg")))
+        if not images:
+            continue
 
-representatives = {
-    "version_comment": "Otomatik oluşturulan ilk versiyon. Temsilciler klasörlerin ilk görselidir.",
-    "clusters": []
-}
+        representative_filename = os.path.basename(images[0])
 
-# 🔄 Her klasörü tara ve ilk jpg'yi temsilci olarak seç
-for cluster_name in os.listdir(CLUSTER_ROOT):
-    cluster_path = os.path.join(CLUSTER_ROOT, cluster_name)
-    if not os.path.isdir(cluster_path) or cluster_name == VERSION:
-        continue
+        generated.append({
+            "filename": representative_filename,
+            "cluster": cluster_name,
+            "comment": ""
+        })
 
-    images = sorted(glob(os.path.join(cluster_path, "*.jpg")))
-    if not images:
-        continue
+    # 🤝 Arayüz cluster'larının kayıtları korunur; eski klasör temsilcileri yenileriyle değiştirilir
+    names = {entry["cluster"] for entry in generated}
+    kept = [entry for entry in representatives.get("clusters", [])
+            if entry.get("cluster") and entry["cluster"] not in names
+            and os.path.isdir(os.path.join(out_dir, entry["cluster"]))]
+    representatives["clusters"] = kept + generated
 
-    representative_filename = os.path.basename(images[0])
+    # 💾 JSON dosyasına yaz (atomik)
+    atomic_write_json(out_file, representatives, indent=2, ensure_ascii=False)
 
-    representatives["clusters"].append({
-        "filename": representative_filename,
-        "cluster": cluster_name,
-        "comment": ""
-    })
+    print(f"✅ {len(generated)} cluster temsilcisi yazıldı ({len(kept)} arayüz kaydı korundu) → {out_file}")
+    return len(generated)
 
-# 💾 JSON dosyasına yaz
-with open(OUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(representatives, f, indent=2, ensure_ascii=False)
 
-print(f"✅ {len(representatives['clusters'])} cluster temsilcisi yazıldı → {OUT_FILE}")
+if __name__ == "__main__":
+    generate_representatives()
@@ -5,34 +5,56 @@
 # Bu script, realImages klasöründeki tüm .jpg/.png görsellerin
 # küçük boyutlu versiyonlarını oluşturur ve thumbnails/ klasörüne kaydeder.
 # Thumbnail'ler orta ve sol panelde hızlı ve kaliteli gösterim için kullanılır.
+# pipeline.py "thumbnails" aşaması yalnızca eklenen / değişen görseller için generate_thumbnails(filenames) çağırır.
+# Görseller image_io.open_image ile açılır: JPEG'ler thumbnail boyutuna yetecek en küçük DCT ölçeğinde
+# decode edilir, EXIF yönü uygulanır.
 
 import os
 from PIL import Image
 from tqdm import tqdm
+from image_io import open_image
 
 INPUT_DIR = "realImages"
 THUMBNAIL_DIR = "thumbnails"
 SIZE = (224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 
-os.makedirs(THUMBNAIL_DIR, exist_ok=True)
 
-print("📦 Thumbnail üretimi başladı...")
-count = 0
+def generate_thumbnails(filenames=None):
+    """Verilen görsellerin (None ise tüm klasörün) thumbnail'lerini üretir; üretilen sayıyı döner."""
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    if filenames is None:
+        filenames = os.listdir(INPUT_DIR)
 
-for fname in tqdm(os.listdir(INPUT_DIR)):
-    if not fname.lower().endswith((".jpg", ".jpeg", ".png")):
-        continue
+    print("📦 Thumbnail üretimi başladı...")
+    count = 0
 
-    try:
-        input_path = os.path.join(INPUT_DIR, fname)
-        output_path = os.path.join(THUMBNAIL_DIR, fname)
+    for fname in tqdm(filenames):
+        if not fname.lower().endswith(IMAGE_EXTENSIONS):
+            continue
 
-        with Image.open(input_path) as img:
-            img = img.convert("RGB")
+        try:
+            input_path = os.path.join(INPUT_DIR, fname)
+            output_path = os.path.join(THUMBNAIL_DIR, fname)
+
+            img = open_image(input_path, SIZE)
             img.thumbnail(SIZE, Image.Resampling.LANCZOS)
             img.save(output_path)
             count += 1
-    except Exception as e:
-        print(f"⚠️ {fname} thumbnail oluşturulamadı: {e}")
+        except Exception as e:
+            print(f"⚠️ {fname} thumbnail oluşturulamadı: {e}")
+
+    print(f"✅ Toplam {count} görsel için thumbnail oluşturuldu → {THUMBNAIL_DIR}")
+    return count
+
+
+def remove_thumbnails(filenames):
+    """Kaynak görseli silinmiş thumbnail'leri kaldırır."""
+    for fname in filenames:
+        path = os.path.join(THUMBNAIL_DIR, fname)
+        if os.path.exists(path):
+            os.remove(path)
+
 
-print(f"✅ Toplam {count} görsel için thumbnail oluşturuldu → {THUMBNAIL_DIR}")
+if __name__ == "__main__":
+    generate_thumbnails()
@@ -0,0 +1,43 @@
+# image_io.py
+# Oluşturulma: 2025-05-11
+# Hazırlayan: Kafkas
+# Açıklama:
+# Thumbnail üretimi, feature çıkarımı ve upload araması için ortak görsel açma.
+# - JPEG'ler draft modunda (DCT ölçekli decode: 1/2, 1/4, 1/8) açılır; hedef boyutun altına inmeyen en küçük
+#   ölçek seçilir. Tam çözünürlüklü taramalar 224×224'e küçültülmeden önce tamamen decode edilmez;
+#   decode süresi ve bellek ölçekle birlikte düşer. Sonraki resize / thumbnail adımları aynı kalır.
+# - EXIF yönü (Orientation) uygulanır; yan çekilmiş fotoğraflar doğru yönde işlenir. Döndürülecek
+#   görsellerde draft hedefi kaydırılmış eksenlere göre istenir.
+# - PNG ve diğer biçimler eskisi gibi tam decode edilir.
+# Ölçüm: python benchmark_decode.py
+
+from PIL import Image
+
+# Draft decode kapatılırsa tüm görseller tam çözünürlükte açılır (EXIF yönü yine uygulanır)
+DRAFT_DECODE = True
+ORIENTATION_TAG = 0x0112
+# EXIF Orientation → uygulanacak dönüşüm (PIL.ImageOps.exif_transpose ile aynı tablo)
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def open_image(source, size=None, draft=DRAFT_DECODE):
+    """Görseli (dosya yolu veya dosya nesnesi) yönü düzeltilmiş RGB olarak açar.
+    size (genişlik, yükseklik) verilirse JPEG'ler her iki kenarı da size'ın altına inmeyen en küçük
+    DCT ölçeğinde decode edilir."""
+    with Image.open(source) as img:
+        orientation = img.getexif().get(ORIENTATION_TAG, 1)
+        if size and draft and img.format == "JPEG":
+            # 5-8: görsel 90° döndürülecek, hedef diskteki eksenlere göre istenir
+            width, height = size
+            img.draft("RGB", (height, width) if orientation in (5, 6, 7, 8) else (width, height))
+        rgb = img.convert("RGB")
+    method = ORIENTATION_TRANSPOSE.get(orientation)
+    return rgb.transpose(method) if method is not None else rgb
@@ -0,0 +1,191 @@
+# inference_backends.py
+# Oluşturulma: 2025-05-10
+# Hazırlayan: Kafkas
+# Açıklama:
+# Feature çıkarımı için seçilebilir CPU çıkarım (inference) backend'leri. Hepsi load_backbone() ile aynı
+# arayüzü sunar: model(x [N, 3, H, W] tensor) → [N, 512, ...] tensor.
+# - eager        : torchvision ResNet18, float32 (varsayılan, referans)
+# - torchscript  : trace + torch.jit.freeze + optimize_for_inference, channels_last bellek düzeni
+# - onnx         : ONNX'e export edilmiş model, ONNX Runtime CPUExecutionProvider
+# - int8-dynamic : ONNX Runtime dinamik int8 kuantizasyonu (ağırlıklar int8, aktivasyonlar çalışırken ölçeklenir).
+#                  PyTorch'un quantize_dynamic'i yalnızca Linear/LSTM katmanlarını kapsar, fc'siz ResNet18'de
+#                  etkisiz kalacağı için dinamik mod ONNX Runtime üzerinden yapılır.
+# - int8-static  : torchvision'ın quantizable ResNet18'i ile statik int8 (conv+bn+relu birleştirme,
+#                  katalogdan kalibrasyon görselleri, fbgemm / qnnpack). Kalibrasyon bir kez yapılır: kalibre edilen
+#                  model TorchScript olarak kaydedilir ve sonraki tüm yüklemeler (artımlı çıkarım, shard'lar, sunucudaki
+#                  upload araması) aynı dosyayı açar; yeniden kalibrasyon yalnızca açıkça istenince yapılır.
+#                  Dosyanın içerik hash'i (model_id) depo manifestine, çıkarım işine ve feature kaydına yazılır;
+#                  yeniden kalibrasyon depoyu yeniden kurdurur, sunucu yeni feature'larla birlikte yeni modeli yükler.
+# onnxruntime opsiyoneldir; kurulu değilse onnx / int8-dynamic seçildiğinde açıklayıcı hata verilir.
+# Backend'lerin eager'a göre tutarlılığı validate_backends.py ile ölçülür.
+
+import os
+
+import torch
+
+from embedding_model import load_backbone, IMAGE_SIZE
+from change_manifest import file_hash
+
+BACKENDS = ("eager", "torchscript", "onnx", "int8-dynamic", "int8-static")
+# Yalnızca CPU'da çalışan backend'ler (GPU olsa da CPU kullanılır)
+CPU_BACKENDS = ("onnx", "int8-dynamic", "int8-static")
+CALIBRATION_BACKENDS = ("int8-static",)
+
+MODEL_DIR = "image_features"
+ONNX_PATH = os.path.join(MODEL_DIR, "resnet18_backbone.onnx")
+ONNX_INT8_PATH = os.path.join(MODEL_DIR, "resnet18_backbone.int8.onnx")
+INT8_STATIC_PATH = os.path.join(MODEL_DIR, "resnet18_backbone.int8-static.pt")
+ONNX_OPSET = 17
+CALIBRATION_IMAGES = 256
+
+
+class ChannelsLast:
+    """Girdiyi channels_last düzenine çevirip TorchScript modülünü çağırır."""
+
+    def __init__(self, module):
+        self.module = module
+
+    def __call__(self, x):
+        return self.module(x.contiguous(memory_format=torch.channels_last))
+
+
+class OrtModel:
+    """ONNX Runtime oturumu; torch tensor alır, torch tensor döner."""
+
+    def __init__(self, path, threads):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        out = self.session.run(None, {self.input_name: x.cpu().numpy()})[0]
+        return torch.from_numpy(out)
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        raise RuntimeError("onnx / int8-dynamic backend'i için onnxruntime kurulu olmalı (pip install onnxruntime)")
+
+
+def export_onnx(path=ONNX_PATH):
+    """Backbone'u dinamik batch boyutlu ONNX modeline export eder (varsa yeniden üretmez)."""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model = load_backbone(torch.device("cpu"))
+    tmp_path = path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(model, torch.zeros(1, 3, *IMAGE_SIZE), tmp_path,
+                          input_names=["input"], output_names=["features"],
+                          dynamic_axes={"input": {0: "batch"}, "features": {0: "batch"}},
+                          opset_version=ONNX_OPSET)
+    os.replace(tmp_path, path)
+    print(f"📤 ONNX modeli yazıldı → {path}")
+    return path
+
+
+def quantize_onnx_dynamic(source=ONNX_PATH, path=ONNX_INT8_PATH):
+    if os.path.exists(path):
+        return path
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    tmp_path = path + ".tmp"
+    # ConvInteger CPU çekirdekleri uint8 ağırlık bekler
+    quantize_dynamic(source, tmp_path, weight_type=QuantType.QUInt8)
+    os.replace(tmp_path, path)
+    print(f"🗜️ Dinamik int8 ONNX modeli yazıldı → {path}")
+    return path
+
+
+def quantization_engine():
+    engines = torch.backends.quantized.supported_engines
+    return "fbgemm" if "fbgemm" in engines else "qnnpack"
+
+
+def _torchscript(device):
+    model = load_backbone(device).to(memory_format=torch.channels_last)
+    example = torch.zeros(1, 3, *IMAGE_SIZE, device=device).contiguous(memory_format=torch.channels_last)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+        # İlk çağrılar graf optimizasyonunu tetikler; ölçümlere girmesin
+        for _ in range(2):
+            frozen(example)
+    return ChannelsLast(frozen)
+
+
+def _int8_static(calibration, path=INT8_STATIC_PATH, recalibrate=False):
+    """path'te kalibre edilmiş model varsa (recalibrate=False) onu yükler. Yoksa quantizable ResNet18'i birleştirip
+    (fuse) kalibrasyon batch'leriyle statik int8'e çevirir ve path'e kaydeder (path=None: kaydetmez)."""
+    from torchvision.models.quantization import resnet18 as quantizable_resnet18
+
+    engine = quantization_engine()
+    torch.backends.quantized.engine = engine
+    if path and os.path.exists(path) and not recalibrate:
+        return torch.jit.load(path, map_location="cpu")
+    if calibration is None:
+        raise RuntimeError(f"{path} yok; int8-static modeli önce feature çıkarımında kalibre edilmeli")
+
+    model = quantizable_resnet18(pretrained=True, quantize=False)
+    model.fc = torch.nn.Identity()
+    model.eval()
+    model.fuse_model()
+    model.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+    torch.ao.quantization.prepare(model, inplace=True)
+    seen = 0
+    with torch.no_grad():
+        for batch in calibration():
+            model(batch)
+            seen += len(batch)
+    if not seen:
+        print("⚠️ int8-static: kalibrasyon görseli yok, ölçekler varsayılan kalacak.")
+    torch.ao.quantization.convert(model, inplace=True)
+    print(f"🗜️ Statik int8 model hazır ({engine}, {seen} kalibrasyon girdisi)")
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with torch.no_grad():
+            torch.jit.save(torch.jit.trace(model, torch.zeros(1, 3, *IMAGE_SIZE)), tmp_path)
+        os.replace(tmp_path, path)
+        print(f"💾 Kalibre edilmiş model kaydedildi → {path}")
+    return model
+
+
+def load_model(backend, device, threads=None, calibration=None, calibrated_path=INT8_STATIC_PATH,
+               recalibrate=False):
+    """Seçilen backend'in modelini döner. int8-static: calibrated_path'teki kalibre model kullanılır; yalnızca
+    dosya yoksa veya recalibrate=True ise calibration (girdi batch'leri üreten fonksiyon) ile kalibre edilip
+    kaydedilir. calibrated_path=None: kayıtlı model kullanılmaz, kalibrasyon kaydedilmez."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Geçersiz backend: {backend} (seçenekler: {', '.join(BACKENDS)})")
+    threads = threads or torch.get_num_threads()
+    if backend == "eager":
+        return load_backbone(device)
+    if backend == "torchscript":
+        return _torchscript(device)
+    if backend == "int8-static":
+        return _int8_static(calibration, calibrated_path, recalibrate)
+    _require_onnxruntime()
+    path = export_onnx()
+    if backend == "int8-dynamic":
+        path = quantize_onnx_dynamic(path)
+    return OrtModel(path, threads)
+
+
+def backend_device(backend):
+    """Backend'in çalışacağı cihaz."""
+    if backend in CPU_BACKENDS or not torch.cuda.is_available():
+        return torch.device("cpu")
+    return torch.device("cuda")
+
+
+def model_id(backend, calibrated_path=INT8_STATIC_PATH):
+    """Backend'in vektörleri etkileyen kayıtlı model dosyasının içerik hash'i (int8-static kalibrasyonu);
+    diğer backend'ler ve henüz kalibre edilmemiş model için None."""
+    if backend in CALIBRATION_BACKENDS and os.path.exists(calibrated_path):
+        return file_hash(calibrated_path)
+    return None
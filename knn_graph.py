@@ -0,0 +1,129 @@
+# knn_graph.py
+# Oluşturulma: 2025-04-26
+# Hazırlayan: Kafkas
+# Açıklama:
+# Çevrimdışı (offline) k-en yakın komşu grafiği aşaması. extract_features.py'den sonra çalıştırılır.
+# Her model ve metrik için katalogdaki her görselin ilk K komşusunu (satır id + benzerlik) hesaplar.
+# Hesap, bellek sınırlı blok matris çarpımıyla yapılır (similarity_index.exact_search_batch).
+# Çıktı: image_features/{model}_{metric}_knn.npz  (ids: int32 N×K, scores: float32 N×K)
+# /find-similar filtresiz sorguları doğrudan bu graftan cevaplar; filtreli sorgularda
+# graf satırında yeterli aday kalmazsa canlı puanlamaya düşer.
+#
+# Kullanım:
+#   python knn_graph.py --k 100 --models pattern,color,texture --metrics cosine,euclidean
+
+import os
+import argparse
+import time
+import numpy as np
+
+import similarity_index as si
+from atomic_io import atomic_savez
+from feature_store import FeatureStore, FEATURE_DIR, MODEL_TYPES, file_signature
+
+DEFAULT_K = 100
+
+
+def graph_path(model, metric, feature_dir=FEATURE_DIR):
+    return os.path.join(feature_dir, f"{model}_{metric}_knn.npz")
+
+
+class KnnGraph:
+    """Satır başına ilk K komşunun id ve benzerlikleri (azalan sırada, görselin kendisi dahil)."""
+
+    def __init__(self, metric, ids, scores, signature):
+        self.metric = metric
+        self.ids = ids
+        self.scores = scores
+        self.signature = tuple(signature)
+
+    @property
+    def k(self):
+        return self.ids.shape[1]
+
+    def lookup(self, row, k, allowed=None, allowed_count=None):
+        """Graf yeterliyse (rows, sims) döner, yetmiyorsa None (canlı puanlamaya düşülmeli).
+        allowed_count, maskeyi geçen toplam satır sayısıdır (filtresizde katalog boyutu)."""
+        ids, scores = self.ids[row], self.scores[row]
+        if allowed is not None:
+            keep = allowed[ids]
+            ids, scores = ids[keep], scores[keep]
+        total = len(self.ids) if allowed_count is None else allowed_count
+        if len(ids) >= k or len(ids) >= total:
+            return ids[:k].astype(np.int64), scores[:k]
+        return None
+
+    def save(self, path):
+        atomic_savez(path, ids=self.ids, scores=self.scores, metric=np.array(self.metric),
+                     signature=np.array(self.signature, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data["metric"]), data["ids"], data["scores"], data["signature"].tolist())
+
+
+def build_graph(snapshot, metric, k=DEFAULT_K):
+    """Snapshot'taki tüm satırlar için ilk k komşuyu blok blok hesaplar."""
+    vectors = snapshot.vectors_for(metric)
+    n = len(vectors)
+    k = min(k, n)
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    results = si.exact_search_batch(vectors, snapshot.sq_norms, vectors, metric, k)
+    for row, (rows, sims) in enumerate(results):
+        ids[row] = rows
+        scores[row] = sims
+    return KnnGraph(metric, ids, scores, snapshot.signature[0])
+
+
+def load_graph(snapshot, metric, feature_dir=FEATURE_DIR):
+    """Snapshot'a bağlı grafı döner; dosya yoksa veya feature dosyasından eskiyse None.
+    Sonuç graf dosyasının imzasıyla (mtime, boyut) snapshot üzerinde önbelleklenir; graf sonradan
+    üretilir / yenilenirse bir sonraki çağrıda okunur (feature'lar yenilenince snapshot da yenilenir)."""
+    path = graph_path(snapshot.model, metric, feature_dir)
+    signature = file_signature(path)
+    cached = snapshot.knn_graphs.get(metric)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    graph = None
+    if signature is not None:
+        try:
+            graph = KnnGraph.load(path)
+        except Exception as e:
+            print(f"⚠️ kNN grafı okunamadı: {path} ({e})")
+        if graph is not None and (graph.signature != tuple(snapshot.signature[0])
+                                  or len(graph.ids) != len(snapshot.filenames)):
+            print(f"⚠️ kNN grafı güncel değil, canlı puanlama kullanılacak: {path}")
+            graph = None
+    snapshot.knn_graphs[metric] = (signature, graph)
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Önceden hesaplanmış kNN grafı üretimi")
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--models", default=",".join(MODEL_TYPES))
+    parser.add_argument("--metrics", default=",".join(si.METRICS))
+    args = parser.parse_args()
+
+    store = FeatureStore()
+    for model in [m for m in args.models.split(",") if m]:
+        snapshot = store.get(model)
+        if snapshot is None:
+            print(f"⚠️ {model} için feature dosyaları yok, atlandı.")
+            continue
+        for metric in [m for m in args.metrics.split(",") if m]:
+            start = time.perf_counter()
+            graph = build_graph(snapshot, metric, args.k)
+            path = graph_path(model, metric)
+            graph.save(path)
+            elapsed = time.perf_counter() - start
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"✅ {model}/{metric}: {len(graph.ids)} görsel × {graph.k} komşu, "
+                  f"{elapsed:.2f}s, {size_mb:.1f} MB → {path}")
+
+
+if __name__ == "__main__":
+    main()
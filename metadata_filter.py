@@ -0,0 +1,104 @@
+# metadata_filter.py
+# Oluşturulma: 2025-04-24
+# Hazırlayan: Kafkas
+# Açıklama:
+# find_similar'daki metadata filtrelerinin (mixFilters / features / cluster) sütunsal, vektörel karşılığı.
+# image_metadata_map.json bir kez sütunlara çevrilir:
+# - blend: HTYPE başına yoğun yüzde matrisi (satır × HTYPE, olmayan = 0)
+# - presence: HTYPE varlık bit maskesi (satır başına uint64 kelimeler)
+# - clustered: cluster atanmış mı bayrağı
+# Filtreler NumPy bool maskelerine derlenir; aynı filtre kombinasyonu tekrar gelirse
+# derlenmiş maske önbellekten döner. Maske, puan vektörüne uygulanır.
+
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+
+MASK_CACHE_SIZE = 128
+
+
+def canonical_filters(filters):
+    """Filtre JSON'unu anahtar sırasından bağımsız, karşılaştırılabilir bir metne çevirir."""
+    return json.dumps(filters or {}, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+class FilterIndex:
+    """Bir model snapshot'ının satır sırasına göre kurulmuş sütunsal metadata indeksi."""
+
+    def __init__(self, filenames, metadata, cache_size=MASK_CACHE_SIZE):
+        n = len(filenames)
+        htypes = sorted({f[0] for fname in filenames for f in metadata.get(fname, {}).get("features", [])})
+        self.htypes = {h: i for i, h in enumerate(htypes)}
+        self.size = n
+
+        self.blend = np.zeros((n, len(htypes)), dtype=np.float32)
+        self.presence = np.zeros((n, max(1, (len(htypes) + 63) // 64)), dtype=np.uint64)
+        self.clustered = np.zeros(n, dtype=bool)
+
+        for row, fname in enumerate(filenames):
+            meta = metadata.get(fname, {})
+            # Aynı HTYPE birden fazla kez geçerse dict'teki gibi sonuncusu geçerlidir
+            for htype, pct in meta.get("features", []):
+                col = self.htypes[htype]
+                self.blend[row, col] = pct
+                self.presence[row, col // 64] |= np.uint64(1 << (col % 64))
+            self.clustered[row] = bool(meta.get("cluster"))
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _bits_for(self, htypes):
+        """Verilen HTYPE'ların bit maskesi; bilinmeyen HTYPE varsa None."""
+        bits = np.zeros(self.presence.shape[1], dtype=np.uint64)
+        for htype in htypes:
+            col = self.htypes.get(htype)
+            if col is None:
+                return None
+            bits[col // 64] |= np.uint64(1 << (col % 64))
+        return bits
+
+    def _compile(self, filters):
+        mask = np.ones(self.size, dtype=bool)
+
+        for mix in filters.get("mixFilters", []):
+            col = self.htypes.get(mix["type"])
+            values = self.blend[:, col] if col is not None else np.zeros(self.size, dtype=np.float32)
+            mask &= (values >= mix["min"]) & (values <= mix["max"])
+
+        feature_filters = filters.get("features", [])
+        if feature_filters:
+            bits = self._bits_for(feature_filters)
+            if bits is None:
+                mask[:] = False
+            else:
+                mask &= np.all((self.presence & bits) == bits, axis=1)
+
+        cluster_status = filters.get("cluster", "")
+        if cluster_status == "clustered":
+            mask &= self.clustered
+        elif cluster_status == "unclustered":
+            mask &= ~self.clustered
+
+        mask.setflags(write=False)
+        return mask
+
+    def mask(self, filters):
+        """Filtreleri bool maskeye derler (salt okunur); sonuçlar LRU önbellekte tutulur."""
+        key = canonical_filters(filters)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+        compiled = self._compile(filters)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = compiled
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return compiled
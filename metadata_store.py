@@ -0,0 +1,378 @@
+# metadata_store.py
+# Oluşturulma: 2025-05-03
+# Hazırlayan: Kafkas
+# Açıklama:
+# Görsel metadatası için SQLite (WAL) tabanlı gömülü depo.
+# image_metadata_map.json'ın her güncellemede baştan okunup yazılması yerine:
+# - images tablosu: design / season / quality / cluster indeksli sütunlar
+# - blend tablosu: görsel başına [HTYPE, yüzde] satırları (htype + yüzde indeksli)
+# Yazmalar tek transaction içinde toplu yapılır (BEGIN IMMEDIATE); eş zamanlı istekler
+# birbirinin yazdığını ezmez. Her yazma transaction'ı depo sürümünü bir artırır.
+# Geriye uyumluluk: image_metadata_map.json export adımıyla (atomik) üretilmeye devam eder.
+# JSON dışarıdan (ör. generate_metadata_map.py ile) değişirse bir sonraki erişimde depoya yeniden alınır.
+# Export edilmemiş kullanıcı düzenlemeleri kaybolmaz: her satır son export'tan beri düzenlenen alanları
+# (edited sütunu) tutar; içe alırken bu alanlar yeni JSON'un üzerine yeniden uygulanır ve birleşik sonuç
+# hemen JSON'a export edilir.
+#
+# Kullanım:
+#   python metadata_store.py --import   (JSON → SQLite)
+#   python metadata_store.py --export   (SQLite → JSON)
+
+import os
+import json
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+
+from atomic_io import atomic_write_json
+
+DB_PATH = "image_metadata.db"
+METADATA_PATH = "image_metadata_map.json"
+# Sütunlarda tutulan alanlar; diğer alanlar extra (JSON) sütununda saklanır
+CORE_FIELDS = ("design", "season", "quality", "cluster")
+
+# Sütun tipleri bilerek boş bırakıldı (affinity yok): int / str / float değerler JSON'daki gibi geri döner
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    filename TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    design, season, quality, cluster,
+    keys TEXT NOT NULL,
+    extra TEXT,
+    edited TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_images_position ON images(position);
+CREATE INDEX IF NOT EXISTS idx_images_design ON images(design);
+CREATE INDEX IF NOT EXISTS idx_images_season ON images(season);
+CREATE INDEX IF NOT EXISTS idx_images_quality ON images(quality);
+CREATE INDEX IF NOT EXISTS idx_images_cluster ON images(cluster);
+CREATE TABLE IF NOT EXISTS blend (
+    filename TEXT NOT NULL REFERENCES images(filename) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    htype TEXT NOT NULL,
+    pct NOT NULL,
+    PRIMARY KEY (filename, position)
+);
+CREATE INDEX IF NOT EXISTS idx_blend_htype ON blend(htype, pct);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+QUERY_SORT_FIELDS = ("position", "filename", "design", "season", "quality", "cluster")
+# Aynı HTYPE birden fazla kez geçerse (FilterIndex'teki gibi) sonuncusu geçerlidir
+_BLEND_PCT_SQL = ("COALESCE((SELECT b.pct FROM blend b WHERE b.filename = i.filename AND b.htype = ? "
+                  "ORDER BY b.position DESC LIMIT 1), 0)")
+
+
+def _filter_sql(filters):
+    """find_similar filtre JSON'unu (mixFilters / features / cluster + season / quality / design) WHERE'e çevirir."""
+    clauses, params = [], []
+    for mix in filters.get("mixFilters", []):
+        clauses.append(f"{_BLEND_PCT_SQL} BETWEEN ? AND ?")
+        params += [mix["type"], mix["min"], mix["max"]]
+    for htype in filters.get("features", []):
+        clauses.append("EXISTS (SELECT 1 FROM blend b WHERE b.filename = i.filename AND b.htype = ?)")
+        params.append(htype)
+    cluster_status = filters.get("cluster", "")
+    if cluster_status == "clustered":
+        clauses.append("(i.cluster IS NOT NULL AND i.cluster != '')")
+    elif cluster_status == "unclustered":
+        clauses.append("(i.cluster IS NULL OR i.cluster = '')")
+    for field in ("design", "season", "quality"):
+        values = filters.get(field)
+        if values:
+            values = values if isinstance(values, list) else [values]
+            clauses.append(f"i.{field} IN ({','.join('?' * len(values))})")
+            params += values
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _json_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+class MetadataStore:
+    def __init__(self, db_path=DB_PATH, json_path=METADATA_PATH):
+        self.db_path = db_path
+        self.json_path = json_path
+        self._local = threading.local()
+        self._sync_lock = threading.RLock()
+        self._schema_ready = False
+
+    # --- Bağlantı / transaction ---
+    def _conn(self):
+        """Thread başına tek bağlantı (sqlite3 bağlantıları thread'ler arasında paylaşılmaz)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                # Eski depolarda edited sütunu yok
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(images)")]
+                if "edited" not in columns:
+                    conn.execute("ALTER TABLE images ADD COLUMN edited TEXT")
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Yazma transaction'ı; başarıyla biterse depo sürümü bir artar."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute(
+                "INSERT INTO store_meta(key, value) VALUES ('version', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _meta(self, conn, key, default=None):
+        row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO store_meta(key, value) VALUES (?, ?)", (key, value))
+
+    def version(self):
+        return self._meta(self._conn(), "version", 0)
+
+    # --- Satır <-> dict dönüşümü ---
+    def _write_entry(self, conn, filename, entry, position, edited=None):
+        """edited: son export'tan beri kullanıcının düzenlediği alanlar (JSON'dan alınan satırlarda None)."""
+        extra = {k: v for k, v in entry.items() if k not in CORE_FIELDS and k != "features"}
+        conn.execute(
+            "INSERT OR REPLACE INTO images(filename, position, design, season, quality, cluster, keys, extra, edited) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (filename, position, *(entry.get(k) for k in CORE_FIELDS),
+             json.dumps(list(entry), ensure_ascii=False),
+             json.dumps(extra, ensure_ascii=False) if extra else None,
+             json.dumps(sorted(edited), ensure_ascii=False) if edited else None)
+        )
+        conn.execute("DELETE FROM blend WHERE filename = ?", (filename,))
+        conn.executemany(
+            "INSERT INTO blend(filename, position, htype, pct) VALUES (?, ?, ?, ?)",
+            [(filename, i, htype, pct) for i, (htype, pct) in enumerate(entry.get("features") or [])]
+        )
+
+    @staticmethod
+    def _entry_from_row(row, features):
+        _, design, season, quality, cluster, keys, extra = row
+        values = dict(zip(CORE_FIELDS, (design, season, quality, cluster)))
+        values["features"] = features
+        if extra:
+            values.update(json.loads(extra))
+        # Alan sırası ve hangi alanların bulunduğu JSON'daki gibi korunur
+        return {k: values.get(k) for k in json.loads(keys)}
+
+    def _read(self, conn, where="", params=()):
+        features = {}
+        for filename, htype, pct in conn.execute(
+            f"SELECT b.filename, b.htype, b.pct FROM blend b JOIN images i ON i.filename = b.filename "
+            f"{where} ORDER BY b.filename, b.position", params
+        ):
+            features.setdefault(filename, []).append([htype, pct])
+        result = {}
+        for row in conn.execute(
+            f"SELECT i.filename, i.design, i.season, i.quality, i.cluster, i.keys, i.extra FROM images i "
+            f"{where} ORDER BY i.position", params
+        ):
+            result[row[0]] = self._entry_from_row(row, features.get(row[0], []))
+        return result
+
+    # --- Okuma ---
+    def load_all(self):
+        """Tüm metadata'yı JSON'daki sırayla {filename: entry} olarak döner."""
+        return self._read(self._conn())
+
+    def get(self, filename):
+        return self._read(self._conn(), "WHERE i.filename = ?", (filename,)).get(filename)
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def htypes(self):
+        """Depodaki tüm karışım (HTYPE) türleri."""
+        return [row[0] for row in self._conn().execute("SELECT DISTINCT htype FROM blend ORDER BY htype")]
+
+    def query(self, filters=None, sort="position", descending=False, offset=0, limit=100):
+        """Filtre + sıralama + sayfalama sunucu tarafında yapılır; (toplam eşleşme, sayfa) döner.
+        Filtreler find_similar ile aynı anlamdadır (mixFilters / features / cluster);
+        ek olarak season / quality / design değer listeleriyle tam eşleşme yapılabilir."""
+        if sort not in QUERY_SORT_FIELDS:
+            raise ValueError(f"Geçersiz sıralama alanı: {sort}")
+        where, params = _filter_sql(filters or {})
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM images i {where}", params).fetchone()[0]
+        direction = "DESC" if descending else "ASC"
+        page = [row[0] for row in conn.execute(
+            f"SELECT i.filename FROM images i {where} ORDER BY i.{sort} {direction}, i.position {direction} "
+            f"LIMIT ? OFFSET ?", (*params, limit, offset)
+        )]
+        if not page:
+            return total, {}
+        entries = self._read(conn, f"WHERE i.filename IN ({','.join('?' * len(page))})", page)
+        return total, {fname: entries[fname] for fname in page}
+
+    # --- Yazma ---
+    def replace_all(self, data):
+        """Depo içeriğini verilen {filename: entry} ile tek transaction'da değiştirir."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM blend")
+            conn.execute("DELETE FROM images")
+            for position, (filename, entry) in enumerate(data.items()):
+                self._write_entry(conn, filename, entry, position)
+
+    def update_many(self, updates):
+        """{filename: {alan: değer}} güncellemelerini tek transaction'da uygular (yoksa kayıt eklenir)."""
+        # Önce JSON'daki güncel içerik alınır; aksi halde sonraki içe alma bu yazmayı ezer
+        self.sync_from_json()
+        with self.transaction() as conn:
+            next_position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM images").fetchone()[0]
+            for filename, fields in updates.items():
+                current = self._read(conn, "WHERE i.filename = ?", (filename,)).get(filename)
+                if current is None:
+                    position, current, edited = next_position, {}, set()
+                    next_position += 1
+                else:
+                    position, edited = conn.execute(
+                        "SELECT position, edited FROM images WHERE filename = ?", (filename,)
+                    ).fetchone()
+                    edited = set(json.loads(edited)) if edited else set()
+                current.update(fields)
+                self._write_entry(conn, filename, current, position, edited | set(fields))
+
+    def set_cluster(self, filenames, cluster, create_missing=False):
+        """Görsellerin cluster alanını toplu günceller; güncellenen (veya eklenen) filename listesini döner."""
+        return self.assign_clusters({filename: cluster for filename in filenames}, create_missing)
+
+    def assign_clusters(self, assignments, create_missing=False):
+        """{filename: cluster} atamalarını tek transaction'da uygular; güncellenen (veya eklenen) filename listesini döner."""
+        self.sync_from_json()
+        with self.transaction() as conn:
+            updated = []
+            for filename, cluster in assignments.items():
+                cur = conn.execute("UPDATE images SET cluster = ? WHERE filename = ?", (cluster, filename))
+                if cur.rowcount:
+                    keys, edited = conn.execute(
+                        "SELECT keys, edited FROM images WHERE filename = ?", (filename,)).fetchone()
+                    keys, edited = json.loads(keys), set(json.loads(edited)) if edited else set()
+                    if "cluster" not in keys:
+                        conn.execute("UPDATE images SET keys = ? WHERE filename = ?",
+                                     (json.dumps(keys + ["cluster"], ensure_ascii=False), filename))
+                    if "cluster" not in edited:
+                        conn.execute("UPDATE images SET edited = ? WHERE filename = ?",
+                                     (json.dumps(sorted(edited | {"cluster"}), ensure_ascii=False), filename))
+                    updated.append(filename)
+                elif create_missing:
+                    position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM images").fetchone()[0]
+                    self._write_entry(conn, filename, {"cluster": cluster}, position, {"cluster"})
+                    updated.append(filename)
+            return updated
+
+    # --- JSON senkronizasyonu ---
+    def pending_edits(self):
+        """Son export'tan beri düzenlenmiş alanlar: {filename: {alan: değer}}."""
+        conn = self._conn()
+        edited = {filename: json.loads(fields) for filename, fields in conn.execute(
+            "SELECT filename, edited FROM images WHERE edited IS NOT NULL")}
+        if not edited:
+            return {}
+        entries = self._read(conn, f"WHERE i.filename IN ({','.join('?' * len(edited))})", list(edited))
+        return {filename: {field: entries[filename].get(field) for field in fields}
+                for filename, fields in edited.items()}
+
+    def import_json(self):
+        """JSON dosyasını depoya alır; export edilmemiş düzenlemeler yeni içeriğin üzerine yeniden uygulanır
+        ve birleşik sonuç JSON'a yazılır. Alınan görsel sayısını döner."""
+        with self._sync_lock:
+            with open(self.json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            edits = self.pending_edits()
+            for filename, fields in edits.items():
+                data.setdefault(filename, {}).update(fields)
+            self.replace_all(data)
+            conn = self._conn()
+            if edits:
+                print(f"🔀 {len(edits)} görselin export edilmemiş düzenlemeleri yeni JSON ile birleştirildi.")
+                self._export(conn)
+            else:
+                self._set_meta(conn, "json_signature", _json_signature(self.json_path))
+                self._set_meta(conn, "exported_version", self.version())
+            return len(data)
+
+    def sync_from_json(self):
+        """JSON dosyası son import/export'tan sonra dışarıdan değiştiyse depoya yeniden alır
+        (export edilmemiş düzenlemeler korunur)."""
+        signature = _json_signature(self.json_path)
+        if signature is None:
+            return False
+        conn = self._conn()
+        if self._meta(conn, "json_signature") == signature:
+            return False
+        with self._sync_lock:
+            if self._meta(conn, "json_signature") == signature:
+                return False
+            count = self.import_json()
+            print(f"📥 {count} görsel metadatası SQLite deposuna alındı.")
+            return True
+
+    def _export(self, conn):
+        # Yazma kilidi tutulur: okuma ile edited temizliği arasına başka düzenleme giremez (sürüm artmaz)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = self.version()
+            atomic_write_json(self.json_path, self.load_all(), indent=2, ensure_ascii=False)
+            conn.execute("UPDATE images SET edited = NULL WHERE edited IS NOT NULL")
+            self._set_meta(conn, "json_signature", _json_signature(self.json_path))
+            self._set_meta(conn, "exported_version", version)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def export_json(self, force=False):
+        """Depo JSON'dan ilerideyse image_metadata_map.json'ı atomik olarak yeniden yazar."""
+        with self._sync_lock:
+            conn = self._conn()
+            if not force and self._meta(conn, "exported_version") == self.version() and os.path.exists(self.json_path):
+                return False
+            self._export(conn)
+            return True
+
+
+# Uygulama genelinde tek örnek
+metadata_db = MetadataStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite metadata deposu import / export")
+    parser.add_argument("--import", dest="do_import", action="store_true", help="JSON → SQLite")
+    parser.add_argument("--export", action="store_true", help="SQLite → JSON")
+    args = parser.parse_args()
+
+    if args.do_import:
+        count = metadata_db.import_json()
+        print(f"✅ {count} görsel SQLite'a aktarıldı → {DB_PATH}")
+    if args.export:
+        metadata_db.export_json(force=True)
+        print(f"✅ Metadata JSON'a aktarıldı → {METADATA_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# pipeline.py
+# Oluşturulma: 2025-05-08
+# Hazırlayan: Kafkas
+# Açıklama:
+# Katalog güncelleme hattı: metadata, thumbnail, feature çıkarımı, kNN / indeks ve temsilci aşamaları
+# tek süreç içinde, bağımlılık grafına (DAG) göre çalıştırılır (alt süreç / yeniden import maliyeti yok).
+# - Her aşama okuduğu girdileri (inputs) ve ürettiği çıktıları (outputs) bildirir; bir aşamanın çıktısı
+#   diğerinin girdisiyle çakışıyorsa aralarında bağımlılık kenarı oluşur.
+# - realImages/ ve realImages_json/ girdileri change_manifest.py'nin içerik hash'leriyle dosya bazında izlenir.
+#   Her aşama son başarılı çalışmasında gördüğü hash'leri saklar ve yalnızca ondan bu yana eklenen /
+#   değişen / silinen dosyaları (delta) alır; yarıda kalan veya seçilmeyen aşama sonraki çalışmada kaldığı farkı görür.
+# - Diğer girdiler (başka aşamaların çıktıları, cluster klasörleri) boyut + mtime parmak iziyle izlenir.
+#   Girdi klasörü içinde aşamanın okumadığı yollar (exclude) parmak izine ve bağımlılık grafına girmez
+#   (ör. temsilciler aşaması arayüzün yönettiği versiyon klasörlerini okumaz).
+# - Girdisi değişmemiş ve çıktıları yerinde olan aşama atlanır; bağımlılığı bitmiş aşamalar thread havuzunda
+#   eşzamanlı çalışır. Hata veren aşamanın bağımlıları atlanır.
+# - Aşama süreleri ve sonuçları pipeline_state.json'a yazılır.
+#
+# Kullanım:
+#   python pipeline.py                                (tüm aşamalar)
+#   python pipeline.py --stages metadata,thumbnails   (yalnızca seçilen aşamalar)
+#   python pipeline.py --force features               (girdisi değişmemiş olsa da çalıştır)
+#   python pipeline.py --dry                          (yalnızca bayat aşamaları raporla)
+
+import os
+import time
+import json
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from atomic_io import atomic_write_json
+from change_manifest import ChangeManifest, diff_files, WATCHED_DIRS
+from feature_store import FEATURE_DIR, MODEL_TYPES
+from generate_thumbnails import THUMBNAIL_DIR, IMAGE_EXTENSIONS
+from similarity_index import METRICS
+from generate_representatives import OUT_DIR as REPRESENTATIVES_DIR, OUT_FILE as REPRESENTATIVES_FILE, version_dirs
+
+STATE_PATH = "pipeline_state.json"
+MAX_WORKERS = 4
+
+REAL_DIR = "realImages"
+JSON_DIR = "realImages_json"
+CLUSTER_BASE = "exported_clusters/pattern"
+
+
+def _images(names):
+    return [n for n in names if n.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+class Stage:
+    """Bir pipeline aşaması.
+    run(delta, full) → sonuç (JSON'a yazılabilir); relevant(delta) izlenen dosya farkının aşamayı ilgilendirip
+    ilgilendirmediğini söyler (ör. metadata görsel içeriğiyle değil, yalnızca adlarla ilgilenir).
+    exclude: girdi klasörlerinin içinde olup aşamanın okumadığı yollar."""
+
+    def __init__(self, name, inputs, outputs, run, relevant=None, exclude=()):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.exclude = tuple(exclude)
+        self.run = run
+        self.relevant = relevant or bool
+        self.watched = tuple(path for path in self.inputs if path in WATCHED_DIRS)
+
+
+# --- Aşamalar ---
+def run_metadata(delta, full):
+    # Export'lar değiştiyse tam üretim; yalnızca görsel eklenip silindiyse artımlı
+    from build_metadata import build, update
+    if full or delta.any_in(JSON_DIR):
+        return build()
+    return update(delta.added[REAL_DIR], delta.removed[REAL_DIR])
+
+
+def metadata_relevant(delta):
+    # Harita görsel adlarına ve portal JSON'larına bağlıdır (görsel içeriğine değil)
+    return (delta.any_in(JSON_DIR) or bool(_images(delta.added[REAL_DIR]))
+            or bool(_images(delta.removed[REAL_DIR])))
+
+
+def run_thumbnails(delta, full):
+    from generate_thumbnails import generate_thumbnails, remove_thumbnails
+    touched = _images(delta.touched(REAL_DIR))
+    removed = _images(delta.removed[REAL_DIR])
+    generated = generate_thumbnails(touched) if touched else 0
+    remove_thumbnails(removed)
+    return {"generated": generated, "removed": len(removed)}
+
+
+def images_relevant(delta):
+    return bool(_images(delta.touched(REAL_DIR)) or _images(delta.removed[REAL_DIR]))
+
+
+def run_features(delta, full):
+    # torch gerektirir; yalnızca bu aşama çalışırken import edilir.
+    # Artımlı mod: yalnızca içeriği depoda olmayan görseller gömülür (embedding_store.py)
+    # Üç model türü tek decode + tek ileri geçişle birlikte güncellenir
+    from extract_features import update_models
+    return update_models(MODEL_TYPES)
+
+
+def run_knn(delta, full):
+    """kNN graflarını ve index_config.json'da tanımlı ANN indekslerini kurar.
+    Feature imzası değişmemiş graf / indeksler yeniden hesaplanmaz."""
+    import knn_graph
+    import similarity_index as si
+    from feature_store import FeatureStore
+
+    store = FeatureStore()
+    config = si.load_index_config()
+    result = {}
+    for model in MODEL_TYPES:
+        snapshot = store.get(model)
+        if snapshot is None:
+            print(f"⚠️ {model} için feature dosyaları yok, atlandı.")
+            continue
+        built = []
+        for metric in METRICS:
+            if knn_graph.load_graph(snapshot, metric) is None:
+                knn_graph.build_graph(snapshot, metric).save(knn_graph.graph_path(model, metric))
+                built.append(f"knn/{metric}")
+            for backend in config.get(model, {}):
+                if backend not in si.BACKENDS or backend == "exact":
+                    continue
+                try:
+                    si.get_index(snapshot, backend, metric)
+                except Exception as e:
+                    print(f"⚠️ {model}/{metric} için {backend} indeksi kurulamadı: {e}")
+        result[model] = built
+    return result
+
+
+def run_representatives(delta, full):
+    from generate_representatives import generate_representatives
+    return generate_representatives()
+
+
+def default_stages():
+    feature_files = [os.path.join(FEATURE_DIR, f"{m}_{suffix}")
+                     for m in MODEL_TYPES for suffix in ("features.npy", "filenames.json")]
+    return [
+        Stage("metadata", (REAL_DIR, JSON_DIR), ("image_metadata_map.json", "merged_metadata.json"),
+              run_metadata, metadata_relevant),
+        Stage("thumbnails", (REAL_DIR,), (THUMBNAIL_DIR,), run_thumbnails, images_relevant),
+        Stage("features", (REAL_DIR,), feature_files, run_features, images_relevant),
+        Stage("knn", feature_files,
+              [os.path.join(FEATURE_DIR, f"{m}_{metric}_knn.npz") for m in MODEL_TYPES for metric in METRICS],
+              run_knn),
+        # Versiyon klasörleri (v1/cluster-N/ ...) arayüzün /create-cluster, /move-to-cluster ve
+        # /bulk-assign-clusters ile yazdığı cluster'lardır; aşama yalnızca diğer cluster klasörlerini okur
+        Stage("representatives", (CLUSTER_BASE,), (REPRESENTATIVES_FILE,), run_representatives,
+              exclude=tuple(version_dirs(CLUSTER_BASE)) + (REPRESENTATIVES_DIR,)),
+    ]
+
+
+# --- Graf ---
+def _overlaps(a, b):
+    a, b = os.path.normpath(a), os.path.normpath(b)
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def dependencies(stages):
+    """Aşama adı → önce bitmesi gereken aşamalar (çıktısı girdiyle çakışanlar)."""
+    deps = {s.name: set() for s in stages}
+    for consumer in stages:
+        for producer in stages:
+            if producer is consumer:
+                continue
+            # Tüketicinin okumadığı yollara yazan aşama bağımlılık oluşturmaz
+            read = [o for o in producer.outputs if not any(_overlaps(o, e) for e in consumer.exclude)]
+            if any(_overlaps(o, i) for o in read for i in consumer.inputs):
+                deps[consumer.name].add(producer.name)
+    return deps
+
+
+def topological_order(deps):
+    """Bağımlılıklar önce gelecek şekilde aşama sırası (Kahn); döngü varsa ValueError."""
+    order, remaining = [], {name: set(d) for name, d in deps.items()}
+    while remaining:
+        ready = [name for name, d in remaining.items() if not d]
+        if not ready:
+            raise ValueError(f"Pipeline aşamalarında döngü var: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for d in remaining.values():
+            d.difference_update(ready)
+        order += ready
+    return order
+
+
+def path_signature(path, exclude=()):
+    """Dosya / klasörün (boyut, mtime) parmak izi; klasörler özyinelemeli taranır."""
+    h = hashlib.sha1()
+    if os.path.isfile(path):
+        st = os.stat(path)
+        h.update(f"{path}|{st.st_size}|{st.st_mtime_ns}".encode())
+    elif os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for fname in sorted(files):
+                fpath = os.path.join(root, fname)
+                if any(_overlaps(fpath, e) for e in exclude):
+                    continue
+                st = os.stat(fpath)
+                h.update(f"{fpath}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    else:
+        h.update(f"{path}|missing".encode())
+    return h.hexdigest()
+
+
+# --- Çalıştırma ---
+class PipelineRun:
+    """Bir çalıştırmanın sonucu: manifest değişiklikleri ve aşama bazında durum / süre."""
+
+    def __init__(self, changes):
+        self.changes = changes
+        self.stages = {}   # ad → {"status": ran|fresh|failed|skipped|stale, "seconds": ..., ...}
+        self.seconds = 0.0
+
+    def __bool__(self):
+        return bool(self.changes) or any(s["status"] in ("ran", "failed") for s in self.stages.values())
+
+    def summary(self):
+        return ", ".join(f"{name}: {s['status']}" for name, s in self.stages.items())
+
+    def to_dict(self):
+        return {"changes": self.changes.to_dict(), "stages": self.stages, "seconds": round(self.seconds, 3)}
+
+
+class Pipeline:
+    def __init__(self, stages=None, state_path=STATE_PATH, manifest=None, max_workers=MAX_WORKERS):
+        self.stages = {s.name: s for s in (stages if stages is not None else default_stages())}
+        self.deps = dependencies(list(self.stages.values()))
+        self.order = topological_order(self.deps)
+        self.state_path = state_path
+        self.manifest = manifest or ChangeManifest()
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"⚠️ {self.state_path} okunamadı, tüm aşamalar bayat sayılacak.")
+            return {}
+
+    def plan(self, stage, files, force=False):
+        """(bayat mı, delta, tam yeniden kurulum mu, izlenen hash'ler, parmak izi) döner."""
+        previous = self.state.get(stage.name, {})
+        items = {key: record["hash"] for key, record in files.items() if key.split("/", 1)[0] in stage.watched}
+        full = force or not previous or not all(os.path.exists(p) for p in stage.outputs)
+        old_items = {} if full else previous.get("items", {})
+        delta = diff_files({k: {"hash": v} for k, v in old_items.items()},
+                           {k: {"hash": v} for k, v in items.items()}, stage.watched)
+        fingerprint = hashlib.sha1("".join(
+            path_signature(p, exclude=stage.outputs + stage.exclude) for p in stage.inputs if p not in stage.watched
+        ).encode()).hexdigest()
+        stale = full or fingerprint != previous.get("fingerprint") or stage.relevant(delta)
+        return stale, delta, full, items, fingerprint
+
+    def _execute(self, stage, files, force):
+        stale, delta, full, items, fingerprint = self.plan(stage, files, force)
+        if not stale:
+            return {"status": "fresh", "seconds": 0.0}
+        print(f"▶️ {stage.name} başladı ({'tam' if full else delta.summary() or 'girdi parmak izi değişti'})")
+        start = time.perf_counter()
+        result = stage.run(delta, full)
+        seconds = round(time.perf_counter() - start, 3)
+        print(f"⏱️ {stage.name}: {seconds:.2f}s")
+        with self._lock:
+            self.state[stage.name] = {
+                "items": items,
+                "fingerprint": fingerprint,
+                "seconds": seconds,
+                "finished_at": datetime.now().isoformat(),
+                "full": full,
+                "result": result,
+            }
+            atomic_write_json(self.state_path, self.state, ensure_ascii=False)
+        return {"status": "ran", "seconds": seconds, "full": full, "result": result}
+
+    def run(self, only=None, force=(), dry=False):
+        """Seçilen aşamaları (None = hepsi) bağımlılık sırasıyla çalıştırır; PipelineRun döner.
+        Seçilmeyen üst aşamalar beklenmez, mevcut çıktıları kullanılır."""
+        selected = [name for name in self.order if only is None or name in only]
+        unknown = set(only or ()) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Bilinmeyen aşama: {sorted(unknown)}")
+
+        start = time.perf_counter()
+        files, changes = self.manifest.scan()
+        print(f"🔍 {len(files)} dosya tarandı, {self.manifest.hashed} dosya hash'lendi "
+              f"({self.manifest.scan_seconds:.2f}s)")
+        report = PipelineRun(changes)
+
+        if dry:
+            for name in selected:
+                stale = self.plan(self.stages[name], files, name in force)[0]
+                upstream = any(report.stages.get(d, {}).get("status") == "stale" for d in self.deps[name])
+                report.stages[name] = {"status": "stale" if stale or upstream else "fresh", "seconds": 0.0}
+            report.seconds = time.perf_counter() - start
+            return report
+
+        pending = {name: self.deps[name] & set(selected) for name in selected}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in [n for n, d in pending.items() if not d - set(report.stages)]:
+                    del pending[name]
+                    failed = [d for d in self.deps[name] & set(selected)
+                              if report.stages[d]["status"] in ("failed", "skipped")]
+                    if failed:
+                        report.stages[name] = {"status": "skipped", "seconds": 0.0, "reason": f"{failed} başarısız"}
+                        print(f"⏭️ {name} atlandı: {failed} başarısız")
+                        continue
+                    running[pool.submit(self._execute, self.stages[name], files, name in force)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        report.stages[name] = future.result()
+                    except Exception as e:
+                        print(f"❌ {name} aşaması başarısız: {e}")
+                        report.stages[name] = {"status": "failed", "seconds": 0.0, "error": str(e)}
+
+        # Aşamalar kendi farklarını pipeline_state.json'da tuttuğu için manifest her durumda ilerletilebilir
+        self.manifest.commit(files)
+        report.stages = {name: report.stages[name] for name in self.stages if name in report.stages}
+        report.seconds = time.perf_counter() - start
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Katalog güncelleme pipeline'ı (DAG)")
+    parser.add_argument("--stages", help="Virgülle ayrılmış aşama adları (varsayılan: hepsi)")
+    parser.add_argument("--force", default="", help="Bayat olmasa da çalıştırılacak aşamalar")
+    parser.add_argument("--dry", action="store_true", help="Çalıştırma, yalnızca bayat aşamaları raporla")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    only = [s for s in args.stages.split(",") if s] if args.stages else None
+    force = {s for s in args.force.split(",") if s}
+    report = Pipeline(max_workers=args.workers).run(only, force, args.dry)
+    print(f"{'🔄' if report.changes else '✅'} {report.changes.summary()}")
+    for name, info in report.stages.items():
+        print(f"   {name:<16} {info['status']:<8} {info['seconds']:.2f}s")
+    print(f"⏱️ Toplam: {report.seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# quantize_features.py
+# Oluşturulma: 2025-04-29
+# Hazırlayan: Kafkas
+# Açıklama:
+# extract_features.py çıktısı olan float32 feature matrislerinin sıkıştırılmış (quantized) kopyalarını üretir
+# ve bu kopyalar üzerinde doğrudan arama yapar. Desteklenen modlar:
+# - "float16" → yarım hassasiyet (2 byte / boyut)
+# - "int8"    → boyut başına min/ölçek ile 8 bit (1 byte / boyut)
+# - "pq"      → product quantization: 8 boyutluk alt uzaylar × 256 merkez (1 byte / alt uzay)
+# Çıktı: image_features/{model}_features.{mode}.npz (kodlar + ham satır normları + kaynak imzası)
+# Arama, kodlar üzerinden yaklaşık iç çarpım ile yapılır; istenirse ilk aday kümesi
+# orijinal .npy dosyasından (mmap ile yalnızca ilgili satırlar okunarak) tam olarak yeniden sıralanır.
+#
+# Kullanım:
+#   python quantize_features.py --models pattern --modes float16,int8,pq
+#   python quantize_features.py --models pattern --modes float16,int8,pq --report --k 100 --rerank 200
+
+import os
+import json
+import time
+import argparse
+import threading
+import numpy as np
+
+import similarity_index as si
+from atomic_io import atomic_savez
+from feature_store import FEATURE_DIR, MODEL_TYPES, file_signature
+
+QUANT_MODES = ("float16", "int8", "pq")
+PQ_SUBVECTOR_DIM = 8
+PQ_CENTROIDS = 256
+DECODE_BLOCK = 65536
+
+
+class Float16Codec:
+    mode = "float16"
+
+    def __init__(self, codes):
+        self.codes = codes
+
+    @classmethod
+    def fit(cls, x):
+        return cls(x.astype(np.float16))
+
+    def dots(self, query):
+        """Tüm satırların sorguyla yaklaşık iç çarpımı (blok blok float32'ye açılarak)."""
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), DECODE_BLOCK):
+            out[start:start + DECODE_BLOCK] = self.codes[start:start + DECODE_BLOCK].astype(np.float32) @ query
+        return out
+
+    def arrays(self):
+        return {"codes": self.codes}
+
+    @classmethod
+    def from_arrays(cls, data):
+        return cls(data["codes"])
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+
+class Int8Codec:
+    """Boyut başına [min, max] aralığı 256 seviyeye bölünür: x ≈ lo + code * scale."""
+
+    mode = "int8"
+
+    def __init__(self, codes, lo, scale):
+        self.codes = codes
+        self.lo = lo
+        self.scale = scale
+
+    @classmethod
+    def fit(cls, x):
+        lo = x.min(axis=0).astype(np.float32)
+        scale = ((x.max(axis=0) - lo) / 255.0).astype(np.float32)
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint((x - lo) / scale), 0, 255).astype(np.uint8)
+        return cls(codes, lo, scale)
+
+    def dots(self, query):
+        # x·q = (lo + code * scale)·q = code·(scale * q) + lo·q
+        scaled = (self.scale * query).astype(np.float32)
+        offset = float(self.lo @ query)
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), DECODE_BLOCK):
+            out[start:start + DECODE_BLOCK] = self.codes[start:start + DECODE_BLOCK].astype(np.float32) @ scaled
+        return out + offset
+
+    def arrays(self):
+        return {"codes": self.codes, "lo": self.lo, "scale": self.scale}
+
+    @classmethod
+    def from_arrays(cls, data):
+        return cls(data["codes"], data["lo"], data["scale"])
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.lo.nbytes + self.scale.nbytes
+
+
+class PQCodec:
+    """Product quantization: vektör alt uzaylara bölünür, her alt uzay kendi k-means merkezleriyle kodlanır.
+    İç çarpım, sorgu başına hazırlanan (alt uzay × merkez) tablosundan toplanarak bulunur (ADC)."""
+
+    mode = "pq"
+
+    def __init__(self, codes, centroids):
+        self.codes = codes
+        self.centroids = centroids  # (alt uzay, merkez, alt boyut)
+
+    @classmethod
+    def fit(cls, x, subvector_dim=PQ_SUBVECTOR_DIM, n_centroids=PQ_CENTROIDS, n_iter=10, seed=42):
+        n, dim = x.shape
+        if dim % subvector_dim:
+            raise ValueError(f"Boyut ({dim}) alt uzay boyutuna ({subvector_dim}) bölünmüyor")
+        n_sub = dim // subvector_dim
+        n_centroids = min(n_centroids, n)
+        rng = np.random.default_rng(seed)
+        centroids = np.empty((n_sub, n_centroids, subvector_dim), dtype=np.float32)
+        codes = np.empty((n, n_sub), dtype=np.uint8)
+        for m in range(n_sub):
+            sub = np.ascontiguousarray(x[:, m * subvector_dim:(m + 1) * subvector_dim], dtype=np.float32)
+            centroids[m] = si.kmeans(sub, n_centroids, n_iter, rng)
+            codes[:, m] = si.nearest_centroid(sub, centroids[m])
+        return cls(codes, centroids)
+
+    def dots(self, query):
+        n_sub, _, sub_dim = self.centroids.shape
+        table = np.einsum("mcd,md->mc", self.centroids, query.reshape(n_sub, sub_dim))
+        cols = np.arange(n_sub)
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), DECODE_BLOCK):
+            block = self.codes[start:start + DECODE_BLOCK]
+            out[start:start + DECODE_BLOCK] = table[cols, block].sum(axis=1)
+        return out
+
+    def arrays(self):
+        return {"codes": self.codes, "centroids": self.centroids}
+
+    @classmethod
+    def from_arrays(cls, data):
+        return cls(data["codes"], data["centroids"])
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.centroids.nbytes
+
+
+CODECS = {codec.mode: codec for codec in (Float16Codec, Int8Codec, PQCodec)}
+
+
+def quantized_path(model, mode, feature_dir=FEATURE_DIR):
+    return os.path.join(feature_dir, f"{model}_features.{mode}.npz")
+
+
+class QuantizedFeatures:
+    """Bir modelin sıkıştırılmış feature'ları + satır normları + filename indeksi."""
+
+    def __init__(self, model, codec, norms, filenames, source_path, signature):
+        self.model = model
+        self.mode = codec.mode
+        self.codec = codec
+        self.norms = norms
+        self.sq_norms = norms.astype(np.float64) ** 2
+        self.filenames = filenames
+        self.index = {name: i for i, name in enumerate(filenames)}
+        self.source_path = source_path
+        self.signature = signature
+        self._filter_index = (None, None)
+
+    def row(self, filename):
+        return self.index.get(filename)
+
+    def raw_rows(self, rows):
+        """Orijinal float32 satırları mmap ile okur (matrisin tamamı belleğe alınmaz)."""
+        raw = np.load(self.source_path, mmap_mode="r")
+        return np.asarray(raw[np.asarray(rows)], dtype=np.float32)
+
+    @property
+    def nbytes(self):
+        return self.codec.nbytes + self.norms.nbytes
+
+    @classmethod
+    def load(cls, model, mode, feature_dir=FEATURE_DIR):
+        """Kayıtlı sıkıştırılmış kopyayı yükler; yoksa veya kaynak .npy değiştiyse None."""
+        path = quantized_path(model, mode, feature_dir)
+        source_path = os.path.join(feature_dir, f"{model}_features.npy")
+        names_path = os.path.join(feature_dir, f"{model}_filenames.json")
+        signature = quantized_signature(model, mode, feature_dir)
+        if signature is None:
+            return None
+        with np.load(path) as data:
+            if tuple(data["signature"].tolist()) != signature[0]:
+                return None
+            codec = CODECS[mode].from_arrays(data)
+            norms = data["norms"]
+        with open(names_path, "r", encoding="utf-8") as f:
+            filenames = json.load(f)
+        return cls(model, codec, norms, filenames, source_path, signature)
+
+
+def quantized_signature(model, mode, feature_dir=FEATURE_DIR):
+    """(kaynak .npy, sıkıştırılmış .npz, filenames.json) imzaları; biri yoksa None."""
+    sigs = (
+        file_signature(os.path.join(feature_dir, f"{model}_features.npy")),
+        file_signature(quantized_path(model, mode, feature_dir)),
+        file_signature(os.path.join(feature_dir, f"{model}_filenames.json")),
+    )
+    return None if any(sig is None for sig in sigs) else sigs
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def get_quantized(model, mode):
+    """Sunucu içinde sıkıştırılmış kopyayı bir kez yükleyip tutar; dosyalar değişince yeniden yükler."""
+    signature = quantized_signature(model, mode)
+    if signature is None:
+        return None
+    current = _loaded.get((model, mode))
+    if current is not None and current.signature == signature:
+        return current
+    with _loaded_lock:
+        current = _loaded.get((model, mode))
+        if current is None or current.signature != signature:
+            current = QuantizedFeatures.load(model, mode)
+            _loaded[(model, mode)] = current
+        return current
+
+
+def quantize_model(model, modes, feature_dir=FEATURE_DIR):
+    """{model}_features.npy'den istenen modlarda sıkıştırılmış kopyalar üretir."""
+    source_path = os.path.join(feature_dir, f"{model}_features.npy")
+    x = np.load(source_path, mmap_mode="r").astype(np.float32)
+    signature = np.array(file_signature(source_path), dtype=np.int64)
+    norms = np.sqrt(np.einsum("ij,ij->i", x, x)).astype(np.float32)
+    for mode in modes:
+        start = time.perf_counter()
+        codec = CODECS[mode].fit(x)
+        path = quantized_path(model, mode, feature_dir)
+        atomic_savez(path, norms=norms, signature=signature, **codec.arrays())
+        print(f"🗜️ {model}/{mode}: {x.nbytes / 1e6:.1f} MB → {codec.nbytes / 1e6:.1f} MB "
+              f"({x.nbytes / max(1, codec.nbytes):.1f}x), {time.perf_counter() - start:.2f}s → {path}")
+
+
+def _exact_sims(raw, query, metric):
+    if metric == "cosine":
+        q = si.prepare_vectors(query[None, :], "cosine")[0]
+        return si.prepare_vectors(raw, "cosine") @ q
+    diff = raw.astype(np.float64) - query.astype(np.float64)
+    return 1.0 / (1.0 + np.sqrt(np.einsum("ij,ij->i", diff, diff)))
+
+
+def quantized_search(qf, query_row, metric, k, allowed=None, rerank=0):
+    """Sıkıştırılmış kodlar üzerinde arama. rerank > 0 ise ilk max(k, rerank) aday
+    orijinal float32 satırlarla tam olarak yeniden puanlanır ve sıralanır."""
+    query = qf.raw_rows([query_row])[0]
+    dots = qf.codec.dots(query)
+    if metric == "cosine":
+        q_norm = float(np.linalg.norm(query)) or 1.0
+        norms = np.where(qf.norms == 0, 1.0, qf.norms)
+        sims = dots / (norms * q_norm)
+    else:
+        sims = si.distances_to_similarity(qf.sq_norms - 2.0 * dots + float(query @ query))
+
+    if not rerank:
+        rows = si.top_k(sims, k, allowed)
+        return rows, sims[rows]
+
+    rows = si.top_k(sims, max(k, rerank), allowed)
+    exact = _exact_sims(qf.raw_rows(rows), query, metric)
+    order = np.lexsort((rows, -exact))[:k]
+    return rows[order], exact[order]
+
+
+def report(model, modes, metric, k, n_queries, rerank, seed=0):
+    """Mod başına bellek kullanımı ve tam aramaya göre recall@k raporu."""
+    raw = np.load(os.path.join(FEATURE_DIR, f"{model}_features.npy")).astype(np.float32)
+    vectors = si.prepare_vectors(raw, metric)
+    sq_norms = si.squared_norms(raw)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(raw), min(n_queries, len(raw)), replace=False)
+    truth = [set(si.exact_search(vectors, sq_norms, vectors[q], metric, k)[0].tolist()) for q in queries]
+    print(f"📏 {model}/{metric}: float32 = {raw.nbytes / 1e6:.1f} MB, recall@{k}, {len(queries)} sorgu")
+
+    for mode in modes:
+        qf = QuantizedFeatures.load(model, mode)
+        if qf is None:
+            print(f"⚠️ {mode}: kayıtlı kopya yok veya eski, önce quantize edin.")
+            continue
+        for rr in sorted({0, rerank}):
+            start = time.perf_counter()
+            recalls = [len(t.intersection(quantized_search(qf, q, metric, k, rerank=rr)[0].tolist())) / len(t)
+                       for q, t in zip(queries, truth)]
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            label = f"rerank={rr}" if rr else "rerank yok"
+            print(f"   {mode:<8} {qf.nbytes / 1e6:8.1f} MB ({raw.nbytes / qf.nbytes:5.1f}x)  "
+                  f"{label:<12} recall={np.mean(recalls):.4f}  {ms:.2f} ms/sorgu")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature matrislerini sıkıştır ve raporla")
+    parser.add_argument("--models", default=",".join(MODEL_TYPES))
+    parser.add_argument("--modes", default=",".join(QUANT_MODES))
+    parser.add_argument("--report", action="store_true", help="Sıkıştırmadan sonra bellek / recall raporu ver")
+    parser.add_argument("--metric", default="cosine", choices=list(si.METRICS))
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rerank", type=int, default=200)
+    parser.add_argument("--skip-build", action="store_true", help="Yalnızca mevcut kopyaları raporla")
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(",") if m]
+    for mode in modes:
+        if mode not in QUANT_MODES:
+            raise ValueError(f"Geçersiz mod: {mode}")
+    for model in [m for m in args.models.split(",") if m]:
+        if not os.path.exists(os.path.join(FEATURE_DIR, f"{model}_features.npy")):
+            print(f"⚠️ {model} için feature dosyası yok, atlandı.")
+            continue
+        if not args.skip_build:
+            quantize_model(model, modes)
+        if args.report:
+            report(model, modes, args.metric, args.k, args.queries, args.rerank)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# result_cache.py
+# Oluşturulma: 2025-04-27
+# Hazırlayan: Kafkas
+# Açıklama:
+# /find-similar için sınırlı (kayıt sayısı + byte) LRU sonuç önbelleği.
+# Anahtar: filename, model, metric, topN, indeks backend'i, filtre JSON'unun kanonik hash'i ve yanıt biçimi
+# (tek parça JSON liste veya stream=1 NDJSON akışı; akış gövdesi sonuna kadar gönderilince saklanır).
+# Her kayıt, üretildiği andaki veri sürümüyle (feature dosyası + image_metadata_map.json imzası)
+# saklanır; sürüm değiştiyse kayıt okunurken düşürülür. /move-to-cluster ve /create-cluster
+# cluster atamalarını değiştirdiğinde önbellek tamamen temizlenir.
+# Kayıtlar hazır JSON / NDJSON gövdesi (bytes) olarak tutulur; isabette yeniden serileştirme yapılmaz.
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from metadata_filter import canonical_filters
+
+MAX_ENTRIES = 512
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def filter_hash(filters):
+    """Filtre JSON'unun anahtar sırasından bağımsız kısa hash'i (filtre yoksa boş metin)."""
+    if not filters:
+        return ""
+    return hashlib.sha1(canonical_filters(filters).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key → (version, body)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                # Veri değişmiş: eski sonucu düşür
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, body):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, body)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                old_key = next(iter(self._entries))
+                self._remove(old_key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def invalidate(self):
+        """Tüm kayıtları siler (ör. cluster atamaları değiştiğinde)."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# /find-similar sonuçları için süreç genelinde tek örnek
+similar_cache = ResultCache()
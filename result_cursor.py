@@ -0,0 +1,86 @@
+# result_cursor.py
+# Oluşturulma: 2025-05-01
+# Hazırlayan: Kafkas
+# Açıklama:
+# /find-similar için sunucu tarafında kısa süreli (TTL) tutulan sıralı sonuç kümeleri.
+# İlk istekte sıralama bir kez yapılır ve (satır, benzerlik) dizileri saklanır;
+# sonraki sayfalar imleç (cursor) ile bu kümeden dilimlenir, yeniden puanlama yapılmaz.
+# İmleç biçimi: "<küme id>.<offset>"
+
+import time
+import secrets
+import threading
+from collections import OrderedDict
+
+CURSOR_TTL_SECONDS = 300
+MAX_RESULT_SETS = 256
+
+
+class RankedResultSet:
+    """Sıralanmış sonuçlar + sonuç satırlarını üretmek için gereken snapshot referansları."""
+
+    def __init__(self, rows, sims, filenames, metadata, page_size, ttl):
+        self.rows = rows
+        self.sims = sims
+        self.filenames = filenames
+        self.metadata = metadata
+        self.page_size = page_size
+        self.expires_at = time.time() + ttl
+
+    @property
+    def total(self):
+        return len(self.rows)
+
+    def expires_in(self):
+        return max(0, int(self.expires_at - time.time()))
+
+
+class CursorStore:
+    def __init__(self, ttl=CURSOR_TTL_SECONDS, max_sets=MAX_RESULT_SETS):
+        self.ttl = ttl
+        self.max_sets = max_sets
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        expired = [key for key, rs in self._sets.items() if rs.expires_at <= now]
+        for key in expired:
+            del self._sets[key]
+        while len(self._sets) > self.max_sets:
+            self._sets.popitem(last=False)
+
+    def put(self, rows, sims, filenames, metadata, page_size):
+        """Kümeyi saklar; (küme id, küme) döner."""
+        result_set = RankedResultSet(rows, sims, filenames, metadata, page_size, self.ttl)
+        result_id = secrets.token_urlsafe(8)
+        with self._lock:
+            self._sets[result_id] = result_set
+            self._purge(time.time())
+        return result_id, result_set
+
+    def get(self, result_id):
+        """Küme süresi dolmadıysa döner (erişim TTL'i uzatmaz), aksi halde None."""
+        with self._lock:
+            result_set = self._sets.get(result_id)
+            if result_set is None:
+                return None
+            if result_set.expires_at <= time.time():
+                del self._sets[result_id]
+                return None
+            return result_set
+
+
+def make_cursor(result_id, offset):
+    return f"{result_id}.{offset}"
+
+
+def parse_cursor(token):
+    """İmleci (küme id, offset) olarak çözer; geçersizse ValueError."""
+    result_id, _, offset = (token or "").rpartition(".")
+    if not result_id or not offset.isdigit():
+        raise ValueError("Geçersiz cursor")
+    return result_id, int(offset)
+
+
+# /find-similar sayfalaması için süreç genelinde tek örnek
+ranked_results = CursorStore()
@@ -0,0 +1,480 @@
+# similarity_index.py
+# Oluşturulma: 2025-04-23
+# Hazırlayan: Kafkas
+# Açıklama:
+# /find-similar için takılabilir (pluggable) indeks katmanı.
+# Desteklenen backend'ler:
+# - "exact"      → Tüm satırlara karşı kaba kuvvet (brute-force) tam arama
+# - "ivf"        → Saf NumPy IVF (k-means kaba kuantalayıcı + ters listeler)
+# - "faiss-ivf"  → faiss IndexIVFFlat (faiss-cpu / faiss-gpu kuruluysa)
+# - "faiss-hnsw" → faiss IndexHNSWFlat (faiss kuruluysa)
+# İndeksler image_features/{model}_features.npy'den kurulur ve yanına
+# image_features/{model}_{metric}.{backend}.npz / .faiss olarak kaydedilir.
+# Kayıtlı indeks, feature dosyasının imzası (mtime/size) tutmuyorsa yeniden kurulur.
+# Model bazında nprobe / efSearch ayarları image_features/index_config.json'dan okunur
+# (benchmark_index.py bu dosyayı üretir).
+#
+# Tüm backend'ler, feature store'un hazırladığı float32 matrisler üzerinde çalışır:
+# cosine için L2-normalize kopya, euclidean için ham matris + önceden hesaplanmış kare normlar.
+# Böylece puanlama tek bir BLAS mat-vec çarpımıdır; sıralama yalnızca ilk k için
+# np.argpartition + küçük dilimin sıralanmasıyla yapılır ("hızlı tam" arama).
+
+import os
+import json
+import time
+import threading
+import numpy as np
+
+from atomic_io import atomic_savez, atomic_write_json, tmp_path_for
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+FEATURE_DIR = "image_features"
+INDEX_CONFIG_PATH = os.path.join(FEATURE_DIR, "index_config.json")
+BACKENDS = ("exact", "ivf", "faiss-ivf", "faiss-hnsw")
+METRICS = ("cosine", "euclidean")
+
+DEFAULT_NPROBE = 8
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+FAISS_FILTER_OVERSAMPLE = 4
+# Euclidean'da float32 mat-vec ile seçilen adaylara eklenen pay; bu adaylar float64'te yeniden ölçülür
+EUCLIDEAN_RERANK_MARGIN = 32
+# Toplu sorgularda bir seferde üretilecek (sorgu × katalog) puan matrisinin üst sınırı
+BATCH_SCORE_BYTES = 256 * 1024 * 1024
+MULTI_ANCHOR_MODES = ("centroid", "sum")
+
+
+def prepare_vectors(features, metric):
+    """Metriğe uygun float32 matris üretir (cosine için satırlar L2-normalize edilir).
+    Normlar sklearn.preprocessing.normalize ile aynı şekilde (sqrt(einsum)) hesaplanır,
+    böylece puanlar sklearn cosine_similarity ile birebir aynı çıkar."""
+    x = np.ascontiguousarray(features, dtype=np.float32)
+    if metric == "cosine":
+        norms = np.sqrt(np.einsum("ij,ij->i", x, x))
+        norms[norms == 0] = 1.0
+        x = x / norms[:, None]
+    return x
+
+
+def squared_norms(vectors):
+    """Satırların kare normları (float64; euclidean mesafe hesabı için)."""
+    return np.einsum("ij,ij->i", vectors, vectors, dtype=np.float64)
+
+
+def distances_to_similarity(sq_dists):
+    """Kare öklid mesafelerini find_similar'daki 1 / (1 + d) benzerliğine çevirir."""
+    return 1.0 / (1.0 + np.sqrt(np.maximum(sq_dists, 0.0)))
+
+
+def score_rows(vectors, sq_norms, query, metric, rows=None):
+    """Sorgu vektörünü (hazırlanmış) satırlara karşı puanlar; tek bir mat-vec çarpımı."""
+    x = vectors if rows is None else vectors[rows]
+    dots = x @ query
+    if metric == "cosine":
+        return dots
+    norms = sq_norms if rows is None else sq_norms[rows]
+    return distances_to_similarity(norms - 2.0 * dots + float(query @ query))
+
+
+def top_k(scores, k, allowed=None):
+    """En yüksek k puanın satırlarını azalan sırada döner.
+    np.argpartition ile O(N) seçim yapılır, yalnızca seçilen k'lık dilim sıralanır.
+    allowed (bool maske) verilirse sadece maskeyi geçen satırlar aday olur."""
+    rows = np.flatnonzero(allowed) if allowed is not None else None
+    candidates = scores if rows is None else scores[rows]
+    k = min(int(k), len(candidates))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(candidates):
+        part = np.argpartition(-candidates, k - 1)[:k]
+    else:
+        part = np.arange(len(candidates))
+    # Eşit puanlarda küçük satır numarası önce gelir (deterministik sıra)
+    part = part[np.lexsort((part, -candidates[part]))]
+    return part if rows is None else rows[part]
+
+
+def rerank_euclidean(vectors, query, rows):
+    """Aday satırların öklid benzerliğini float64'te doğrudan (x - q) üzerinden yeniden hesaplar."""
+    diff = vectors[rows].astype(np.float64) - query.astype(np.float64)
+    sims = 1.0 / (1.0 + np.sqrt(np.einsum("ij,ij->i", diff, diff)))
+    order = np.lexsort((rows, -sims))
+    return rows[order], sims[order]
+
+
+def exact_search(vectors, sq_norms, query, metric, k, allowed=None):
+    """Hızlı tam arama: tek mat-vec + argpartition top-k.
+    Euclidean'da float32 yuvarlama hatası sırayı bozmasın diye ilk k + pay aday float64'te yeniden puanlanır."""
+    sims = score_rows(vectors, sq_norms, query, metric)
+    if metric == "cosine":
+        rows = top_k(sims, k, allowed)
+        return rows, sims[rows]
+    rows = top_k(sims, k + EUCLIDEAN_RERANK_MARGIN, allowed)
+    rows, exact_sims = rerank_euclidean(vectors, query, rows)
+    return rows[:k], exact_sims[:k]
+
+
+def score_matrix(vectors, sq_norms, queries, metric):
+    """Birden çok sorguyu tek matris-matris çarpımıyla puanlar (sorgu × satır)."""
+    dots = queries @ vectors.T
+    if metric == "cosine":
+        return dots
+    return distances_to_similarity(squared_norms(queries)[:, None] + sq_norms[None, :] - 2.0 * dots)
+
+
+def _query_blocks(queries, n_rows):
+    block = max(1, BATCH_SCORE_BYTES // max(1, 8 * n_rows))
+    for start in range(0, len(queries), block):
+        yield queries[start:start + block]
+
+
+def exact_search_batch(vectors, sq_norms, queries, metric, k, allowed=None):
+    """Her sorgu için ayrı top-k; puanlar blok blok matris-matris çarpımıyla hesaplanır."""
+    results = []
+    for block in _query_blocks(queries, len(vectors)):
+        sims = score_matrix(vectors, sq_norms, block, metric)
+        for query, row_sims in zip(block, sims):
+            if metric == "cosine":
+                rows = top_k(row_sims, k, allowed)
+                results.append((rows, row_sims[rows]))
+            else:
+                rows = top_k(row_sims, k + EUCLIDEAN_RERANK_MARGIN, allowed)
+                rows, exact_sims = rerank_euclidean(vectors, query, rows)
+                results.append((rows[:k], exact_sims[:k]))
+    return results
+
+
+def multi_anchor_search(vectors, sq_norms, queries, metric, k, mode, allowed=None):
+    """Birden çok referans (anchor) görselle tek sıralama üretir.
+    - centroid: anchor vektörlerinin ortalamasına en yakın satırlar
+    - sum: anchor'lara olan benzerliklerin toplamı en yüksek satırlar
+    (rows, puanlar, anchor başına benzerlikler [anchor × k] veya None) döner."""
+    if mode == "centroid":
+        centroid = queries.mean(axis=0, keepdims=True)
+        if metric == "cosine":
+            centroid = prepare_vectors(centroid, "cosine")
+        rows, sims = exact_search(vectors, sq_norms, centroid[0].astype(np.float32), metric, k, allowed)
+        return rows, sims, None
+
+    if mode != "sum":
+        raise ValueError(f"Bilinmeyen çoklu anchor modu: {mode}")
+
+    total = np.zeros(len(vectors), dtype=np.float64)
+    for block in _query_blocks(queries, len(vectors)):
+        total += score_matrix(vectors, sq_norms, block, metric).sum(axis=0)
+
+    if metric == "cosine":
+        rows = top_k(total, k, allowed)
+        per_anchor = queries @ vectors[rows].T
+        return rows, total[rows], per_anchor
+
+    # Euclidean: adayların anchor başına benzerliği float64'te doğrudan yeniden hesaplanır
+    rows = top_k(total, k + EUCLIDEAN_RERANK_MARGIN, allowed)
+    candidates = vectors[rows].astype(np.float64)
+    per_anchor = np.empty((len(queries), len(rows)), dtype=np.float64)
+    for a, query in enumerate(queries.astype(np.float64)):
+        diff = candidates - query
+        per_anchor[a] = 1.0 / (1.0 + np.sqrt(np.einsum("ij,ij->i", diff, diff)))
+    exact_total = per_anchor.sum(axis=0)
+    order = np.lexsort((rows, -exact_total))[:k]
+    return rows[order], exact_total[order], per_anchor[:, order]
+
+
+def fused_search(matrix, offsets, sq_norms, query_row, weights, metric, k, allowed=None):
+    """Hizalanmış çoklu model matrisinde ağırlıklı birleşik (fused) arama.
+    Sorgu satırı blok-köşegen bir matrise (boyut × model) yerleştirilir; tek matris çarpımı
+    her satır için model başına skorları (satır × model) verir. Birleşik skor, ağırlıkların
+    toplamına bölünmüş ağırlıklı ortalamadır. (rows, birleşik skor, model skorları [k × model]) döner."""
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    n_models = len(offsets) - 1
+    query = matrix[query_row]
+    block_query = np.zeros((matrix.shape[1], n_models), dtype=matrix.dtype)
+    for m in range(n_models):
+        block_query[offsets[m]:offsets[m + 1], m] = query[offsets[m]:offsets[m + 1]]
+
+    dots = matrix @ block_query
+    if metric == "cosine":
+        per_model = dots
+    else:
+        per_model = distances_to_similarity(sq_norms - 2.0 * dots + sq_norms[query_row][None, :])
+    total = per_model @ weights
+
+    if metric == "cosine":
+        rows = top_k(total, k, allowed)
+        return rows, total[rows], per_model[rows]
+
+    # Euclidean: adayların model başına mesafesi float64'te doğrudan yeniden hesaplanır
+    rows = top_k(total, k + EUCLIDEAN_RERANK_MARGIN, allowed)
+    diff = matrix[rows].astype(np.float64) - query.astype(np.float64)
+    sq = diff * diff
+    per_model = np.stack([sq[:, offsets[m]:offsets[m + 1]].sum(axis=1) for m in range(n_models)], axis=1)
+    per_model = 1.0 / (1.0 + np.sqrt(per_model))
+    exact_total = per_model @ weights
+    order = np.lexsort((rows, -exact_total))[:k]
+    return rows[order], exact_total[order], per_model[order]
+
+
+def load_index_config(path=INDEX_CONFIG_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def search_params(model, backend, config=None):
+    """Model + backend için kayıtlı arama ayarlarını döner (nprobe / ef_search)."""
+    config = load_index_config() if config is None else config
+    params = {"nprobe": DEFAULT_NPROBE, "ef_search": DEFAULT_EF_SEARCH}
+    params.update(config.get(model, {}).get(backend, {}))
+    return params
+
+
+def nearest_centroid(x, centroids, block=8192):
+    """Her satırın en yakın (L2) merkezinin numarası; bellek için blok blok hesaplanır."""
+    c_norms = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        out[start:start + block] = np.argmin(c_norms[None, :] - 2.0 * chunk @ centroids.T, axis=1)
+    return out
+
+
+def kmeans(x, n_clusters, n_iter, rng, sample_per_cluster=64):
+    """Basit Lloyd k-means (örneklem üzerinde); IVF kaba kuantalayıcısı ve PQ alt uzayları için."""
+    sample_size = min(len(x), n_clusters * sample_per_cluster)
+    sample = np.ascontiguousarray(x[rng.choice(len(x), sample_size, replace=False)], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=n_clusters > len(sample))].copy()
+    for _ in range(n_iter):
+        assign = nearest_centroid(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=n_clusters)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class ExactIndex:
+    """Kaba kuvvet tam arama; ANN backend'leri için referans ve yedek (fallback)."""
+
+    backend = "exact"
+
+    def __init__(self, metric, vectors, sq_norms=None):
+        self.metric = metric
+        self.vectors = vectors
+        self.sq_norms = squared_norms(vectors) if sq_norms is None else sq_norms
+
+    @classmethod
+    def build(cls, vectors, metric, sq_norms=None):
+        return cls(metric, vectors, sq_norms)
+
+    def prepare_query(self, query):
+        return prepare_vectors(np.asarray(query).reshape(1, -1), self.metric)[0]
+
+    def search(self, query, k, allowed=None, **params):
+        q = self.prepare_query(query)
+        return exact_search(self.vectors, self.sq_norms, q, self.metric, k, allowed)
+
+
+class IVFIndex:
+    """Saf NumPy IVF: satırlar en yakın k-means merkezine göre listelere ayrılır,
+    sorguda yalnızca en yakın nprobe liste taranır."""
+
+    backend = "ivf"
+
+    def __init__(self, metric, vectors, centroids, order, offsets, sq_norms=None):
+        self.metric = metric
+        self.vectors = vectors
+        self.sq_norms = squared_norms(vectors) if sq_norms is None else sq_norms
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, metric, nlist=None, n_iter=10, seed=42, sq_norms=None):
+        n = len(vectors)
+        nlist = nlist or max(1, min(n, int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        centroids = kmeans(vectors, nlist, n_iter, rng)
+        assign = nearest_centroid(vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(metric, vectors, centroids, order, offsets, sq_norms)
+
+    def save(self, path, signature):
+        atomic_savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                     metric=np.array(self.metric), signature=np.array(signature, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path, vectors, metric, signature, sq_norms=None):
+        """Kayıtlı indeksi yükler; imza veya metrik uyuşmuyorsa None döner."""
+        with np.load(path) as data:
+            if str(data["metric"]) != metric or tuple(data["signature"].tolist()) != tuple(signature):
+                return None
+            centroids, order, offsets = data["centroids"], data["order"], data["offsets"]
+        if len(order) != len(vectors):
+            return None
+        return cls(metric, vectors, centroids, order, offsets, sq_norms)
+
+    def prepare_query(self, query):
+        return prepare_vectors(np.asarray(query).reshape(1, -1), self.metric)[0]
+
+    def search(self, query, k, allowed=None, nprobe=DEFAULT_NPROBE, **params):
+        q = self.prepare_query(query)
+        nprobe = max(1, min(int(nprobe), self.nlist))
+        c_dists = np.einsum("ij,ij->i", self.centroids, self.centroids) - 2.0 * self.centroids @ q
+        probe = np.argpartition(c_dists, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe])
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        sims = score_rows(self.vectors, self.sq_norms, q, self.metric, rows=candidates)
+        top = top_k(sims, k)
+        return candidates[top], sims[top]
+
+
+class FaissIndex:
+    """faiss IVF-Flat / HNSW-Flat sarmalayıcısı (faiss kurulu değilse kullanılamaz)."""
+
+    def __init__(self, backend, metric, index):
+        self.backend = backend
+        self.metric = metric
+        self.index = index
+
+    @classmethod
+    def build(cls, vectors, metric, backend, nlist=None):
+        if faiss is None:
+            raise RuntimeError("faiss kurulu değil (pip install faiss-cpu)")
+        n, dim = vectors.shape
+        faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+        if backend == "faiss-hnsw":
+            index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss_metric)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        else:
+            nlist = nlist or max(1, min(n, int(4 * np.sqrt(n))))
+            quantizer = faiss.IndexFlatIP(dim) if metric == "cosine" else faiss.IndexFlatL2(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+            index.train(vectors)
+        index.add(vectors)
+        return cls(backend, metric, index)
+
+    def save(self, path, signature):
+        tmp_path = tmp_path_for(path)
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+        atomic_write_json(path + ".json", {"metric": self.metric, "signature": list(signature)})
+
+    @classmethod
+    def load(cls, path, vectors, metric, signature, backend):
+        if faiss is None or not os.path.exists(path + ".json"):
+            return None
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("metric") != metric or tuple(meta.get("signature", [])) != tuple(signature):
+            return None
+        index = faiss.read_index(path)
+        if index.ntotal != len(vectors):
+            return None
+        return cls(backend, metric, index)
+
+    def search(self, query, k, allowed=None, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH, **params):
+        q = prepare_vectors(np.asarray(query).reshape(1, -1), self.metric)
+        if self.backend == "faiss-hnsw":
+            self.index.hnsw.efSearch = max(int(ef_search), k)
+        else:
+            self.index.nprobe = int(nprobe)
+        fetch = k if allowed is None else k * FAISS_FILTER_OVERSAMPLE
+        fetch = min(fetch, self.index.ntotal)
+        scores, rows = self.index.search(q, fetch)
+        scores, rows = scores[0], rows[0]
+        keep = rows >= 0
+        if allowed is not None:
+            keep &= allowed[np.maximum(rows, 0)]
+        rows, scores = rows[keep][:k], scores[keep][:k]
+        if self.metric == "euclidean":
+            scores = distances_to_similarity(scores)
+        return rows.astype(np.int64), scores
+
+
+def index_path(model, metric, backend, feature_dir=FEATURE_DIR):
+    ext = "faiss" if backend.startswith("faiss") else "npz"
+    return os.path.join(feature_dir, f"{model}_{metric}.{backend}.{ext}")
+
+
+def build_index(vectors, metric, backend, nlist=None, sq_norms=None):
+    """Hazırlanmış (prepare_vectors) matristen indeks kurar."""
+    if backend == "exact":
+        return ExactIndex.build(vectors, metric, sq_norms)
+    if backend == "ivf":
+        return IVFIndex.build(vectors, metric, nlist=nlist, sq_norms=sq_norms)
+    if backend in ("faiss-ivf", "faiss-hnsw"):
+        return FaissIndex.build(vectors, metric, backend, nlist=nlist)
+    raise ValueError(f"Bilinmeyen indeks backend'i: {backend}")
+
+
+def load_or_build_index(model, vectors, metric, backend, signature, feature_dir=FEATURE_DIR, sq_norms=None):
+    """Kayıtlı indeksi yükler, yoksa / eskiyse kurup feature dosyasının yanına kaydeder."""
+    if backend == "exact":
+        return ExactIndex.build(vectors, metric, sq_norms)
+
+    path = index_path(model, metric, backend, feature_dir)
+    index = None
+    if os.path.exists(path):
+        try:
+            if backend == "ivf":
+                index = IVFIndex.load(path, vectors, metric, signature, sq_norms)
+            else:
+                index = FaissIndex.load(path, vectors, metric, signature, backend)
+        except Exception as e:
+            print(f"⚠️ İndeks okunamadı, yeniden kurulacak: {path} ({e})")
+
+    if index is None:
+        start = time.perf_counter()
+        index = build_index(vectors, metric, backend, sq_norms=sq_norms)
+        index.save(path, signature)
+        print(f"🧱 {model}/{metric} için {backend} indeksi kuruldu: {time.perf_counter() - start:.2f}s → {path}")
+    return index
+
+
+_index_lock = threading.Lock()
+
+
+def get_index(snapshot, backend, metric, feature_dir=FEATURE_DIR):
+    """Feature store snapshot'ına bağlı indeksi döner; snapshot yenilenince indeks de yenilenir."""
+    cache = snapshot.indexes
+    key = (backend, metric)
+    index = cache.get(key)
+    if index is None:
+        with _index_lock:
+            index = cache.get(key)
+            if index is None:
+                index = load_or_build_index(snapshot.model, snapshot.vectors_for(metric), metric, backend,
+                                            snapshot.signature[0], feature_dir, snapshot.sq_norms)
+                cache[key] = index
+    return index
+
+
+def search(snapshot, backend, metric, query, k, allowed=None, params=None):
+    """ANN araması yapar; filtre sonrası k sonuçtan azı kalırsa tam aramaya düşer."""
+    params = params if params is not None else search_params(snapshot.model, backend)
+    index = get_index(snapshot, backend, metric)
+    rows, sims = index.search(query, k, allowed=allowed, **params)
+    available = len(snapshot.filenames) if allowed is None else int(np.count_nonzero(allowed))
+    if backend != "exact" and len(rows) < min(k, available):
+        exact = get_index(snapshot, "exact", metric)
+        rows, sims = exact.search(query, k, allowed=allowed)
+    return rows, sims
@@ -240,6 +240,82 @@ window.addMaterialFilter = function (materialType) {
   materialRows.set(materialType, { minInput, maxInput });
 };
 
+let similarRequestCounter = 0;
+
+// NDJSON yanıtını satır satır okur; tarayıcı akışı desteklemiyorsa tüm gövdeyi bekler
+function readNdjson(res, onLine) {
+  if (!res.body || typeof res.body.getReader !== "function") {
+    return res.text().then(text => text.split("\n").forEach(onLine));
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  const pump = () => reader.read().then(({ done, value }) => {
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    lines.forEach(onLine);
+    if (done) {
+      onLine(buffer);
+      return;
+    }
+    return pump();
+  });
+  return pump();
+}
+
+function createSimilarResultBox(result, selectedFilename, model, version) {
+  const featureMap = Object.fromEntries(result.features || []);
+  const box = document.createElement("div");
+  box.className = "image-box";
+  box.style.position = "relative";
+  box.dataset.featureMap = JSON.stringify(featureMap);
+  box.dataset.cluster = result.cluster || "";
+
+  const img = document.createElement("img");
+  img.src = `thumbnails/${result.filename}`;
+  img.loading = "lazy";
+  img.alt = result.filename;
+
+  const tooltip = document.createElement("div");
+  tooltip.className = "tooltip";
+  const blendText = result.features?.map(f => `${f[0]} (${f[1]}%)`).join(", ") || "Yok";
+  tooltip.innerHTML = `
+    <img src='realImages/${result.filename}' />
+    <strong>${result.design}</strong><br>
+    Season: ${result.season}<br>
+    Quality: ${result.quality}<br>
+    Blend: ${blendText}<br>
+    Cluster: ${result.cluster || 'Yok'}<br>
+    Similarity: ${result.similarity?.toFixed(3) || '—'}
+  `;
+
+  const checkbox = document.createElement("input");
+  checkbox.type = "checkbox";
+  checkbox.style.position = "absolute";
+  checkbox.style.top = "5px";
+  checkbox.style.right = "5px";
+  checkbox.checked = window.selectedImages.includes(result.filename);
+
+  checkbox.addEventListener("change", () => {
+    if (checkbox.checked) {
+      if (!window.selectedImages.includes(result.filename)) {
+        window.selectedImages.push(result.filename);
+      }
+    } else {
+      window.selectedImages = window.selectedImages.filter(f => f !== result.filename);
+    }
+  });
+
+  const starRating = createStarRating(result.filename, selectedFilename, model, version);
+
+  box.appendChild(img);
+  box.appendChild(tooltip);
+  box.appendChild(checkbox);
+  box.appendChild(starRating);
+  return box;
+}
+
 window.loadSimilarImages = function loadSimilarImages(selectedFilename, model = "pattern", topN = 10, metric = "cosine", customFilters = null) {
   if (!centerContainer) {
     console.warn("❌ centerContainer tanımlı değil.");
@@ -252,71 +328,29 @@ window.loadSimilarImages = function loadSimilarImages(selectedFilename, model =
   const preFilterEnabled = document.getElementById("center-pre-filter")?.checked;
   const filters = customFilters || (preFilterEnabled && typeof window.getFilterParams === "function" ? getFilterParams() : null);
 
-  fetch(`/find-similar?filename=${encodeURIComponent(selectedFilename)}&model=${model}&topN=${topN}&metric=${metric}`, {
+  // Sonuçlar NDJSON akışı olarak gelir (stream=1); her satır geldikçe kutusu eklenir
+  const requestId = ++similarRequestCounter;
+  let received = 0;
+  const handleLine = line => {
+    if (requestId !== similarRequestCounter || !line.trim()) return;
+    const result = JSON.parse(line);
+    // Sonuç yoksa sunucu akış yerine boş liste ([]) döner
+    if (Array.isArray(result)) return;
+    if (received === 0) centerContainer.innerHTML = "";
+    received++;
+    centerContainer.appendChild(createSimilarResultBox(result, selectedFilename, model, version));
+  };
+
+  fetch(`/find-similar?filename=${encodeURIComponent(selectedFilename)}&model=${model}&topN=${topN}&metric=${metric}&stream=1`, {
     method: filters ? "POST" : "GET",
     headers: filters ? { "Content-Type": "application/json" } : {},
     body: filters ? JSON.stringify(filters) : null
   })
-    .then(res => res.json())
-    .then(results => {
-      centerContainer.innerHTML = "";
-
-      if (!Array.isArray(results) || results.length === 0) {
+    .then(res => readNdjson(res, handleLine))
+    .then(() => {
+      if (requestId === similarRequestCounter && received === 0) {
         centerContainer.innerHTML = "Sonuç bulunamadı.";
-        return;
       }
-
-      results.forEach(result => {
-        const featureMap = Object.fromEntries(result.features || []);
-        const box = document.createElement("div");
-        box.className = "image-box";
-        box.style.position = "relative";
-        box.dataset.featureMap = JSON.stringify(featureMap);
-        box.dataset.cluster = result.cluster || "";
-
-        const img = document.createElement("img");
-        img.src = `thumbnails/${result.filename}`;
-        img.loading = "lazy";
-        img.alt = result.filename;
-
-        const tooltip = document.createElement("div");
-        tooltip.className = "tooltip";
-        const blendText = result.features?.map(f => `${f[0]} (${f[1]}%)`).join(", ") || "Yok";
-        tooltip.innerHTML = `
-          <img src='realImages/${result.filename}' />
-          <strong>${result.design}</strong><br>
-          Season: ${result.season}<br>
-          Quality: ${result.quality}<br>
-          Blend: ${blendText}<br>
-          Cluster: ${result.cluster || 'Yok'}<br>
-          Similarity: ${result.similarity?.toFixed(3) || '—'}
-        `;
-
-        const checkbox = document.createElement("input");
-        checkbox.type = "checkbox";
-        checkbox.style.position = "absolute";
-        checkbox.style.top = "5px";
-        checkbox.style.right = "5px";
-        checkbox.checked = window.selectedImages.includes(result.filename);
-
-        checkbox.addEventListener("change", () => {
-          if (checkbox.checked) {
-            if (!window.selectedImages.includes(result.filename)) {
-              window.selectedImages.push(result.filename);
-            }
-          } else {
-            window.selectedImages = window.selectedImages.filter(f => f !== result.filename);
-          }
-        });
-
-        const starRating = createStarRating(result.filename, selectedFilename, model, version);
-
-        box.appendChild(img);
-        box.appendChild(tooltip);
-        box.appendChild(checkbox);
-        box.appendChild(starRating);
-        centerContainer.appendChild(box);
-      });
     })
     .catch(err => {
       centerContainer.innerText = `❌ Benzer görseller yüklenemedi: ${err}`;
@@ -5,19 +5,37 @@
 // Sol panelde tüm görseller listelenir. Hover'da metadata ve büyük görsel görünür.
 // Bir görsele tıklanınca seçilen modele göre benzerleri orta panelde yüklenir.
 // Ek olarak: Karışım, özellik ve cluster filtrelerine göre dinamik filtreleme yapılır.
+// Görseller /metadata/query ile sayfa sayfa (sunucu tarafında filtrelenip) yüklenir;
+// liste sonuna gelindikçe sonraki sayfa istenir. Değişmeyen sayfalar ETag ile 304 döner.
+
+const LEFT_PAGE_SIZE = 200;
+
+function fetchMetadataPage(filters, offset) {
+  const params = new URLSearchParams({ offset, limit: LEFT_PAGE_SIZE, filters: JSON.stringify(filters || {}) });
+  return fetch(`/metadata/query?${params}`).then(res => {
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    return res.json();
+  });
+}
 
 window.onload = function () {
   console.log("✅ left_panel.js window.onload tetiklendi");
 
-  fetch('image_metadata_map.json')
-    .then(res => res.json())
-    .then(metadataMap => {
-      console.log("📦 Metadata başarıyla alındı. Toplam:", Object.keys(metadataMap).length);
+  const container = document.getElementById("image-container");
+  const sentinel = document.createElement("div");
+  sentinel.className = "load-more-sentinel";
+
+  let currentFilters = {};
+  let loadedCount = 0;
+  let totalCount = 0;
+  let loading = false;
+  let queryId = 0;
+
+  fetchMetadataPage(currentFilters, 0)
+    .then(firstPage => {
+      console.log("📦 Metadata ilk sayfası alındı. Toplam:", firstPage.catalog_total);
 
-      const container = document.getElementById("image-container");
-      const filenames = Object.keys(metadataMap);
-      let allBoxes = []; // 🎯 Filtrelemeye yardımcı olmak için tüm box'ları saklıyoruz
-      const blendSet = new Set();
+      const blendSet = new Set(firstPage.htypes);
       
       
       const featureSet = new Set([
@@ -29,8 +47,8 @@ window.onload = function () {
       ]);
       window.featureSet = featureSet;
 
-      filenames.forEach((name) => {
-        const data = metadataMap[name];
+      function createImageBox(data) {
+        const name = data.filename;
         const box = document.createElement("div");
         box.className = "image-box";
         box.style.cursor = "pointer";
@@ -43,8 +61,6 @@ window.onload = function () {
         box.dataset.cluster = data.cluster || "";
         box.dataset.blendMap = JSON.stringify(blendMap);
 
-        blendKeys.forEach(k => blendSet.add(k));
-
         box.addEventListener("click", () => {
           console.log("🔁 Benzer görseller yükleniyor:", name);
 
@@ -99,9 +115,40 @@ window.onload = function () {
 
         box.appendChild(img);
         box.appendChild(tooltip);
-        container.appendChild(box);
-        allBoxes.push(box);
-      });
+        return box;
+      }
+
+      function appendPage(page, reset) {
+        if (reset) {
+          container.innerHTML = "";
+          loadedCount = 0;
+        }
+        page.items.forEach(item => container.appendChild(createImageBox(item)));
+        loadedCount += page.items.length;
+        totalCount = page.total;
+        container.appendChild(sentinel);
+        if (totalCount === 0) container.innerText = "Sonuç bulunamadı.";
+      }
+
+      // Filtre değişince ilk sayfa baştan; liste sonuna gelince sonraki sayfa istenir
+      function loadPage(reset) {
+        if (!reset && (loading || loadedCount >= totalCount)) return;
+        const id = reset ? ++queryId : queryId;
+        loading = true;
+        fetchMetadataPage(currentFilters, reset ? 0 : loadedCount)
+          .then(page => {
+            if (id === queryId) appendPage(page, reset);
+          })
+          .catch(err => console.error("❌ Metadata sayfası yüklenemedi:", err))
+          .finally(() => {
+            if (id === queryId) loading = false;
+          });
+      }
+
+      appendPage(firstPage, true);
+      new IntersectionObserver(entries => {
+        if (entries.some(e => e.isIntersecting)) loadPage(false);
+      }, { root: null, rootMargin: "400px" }).observe(sentinel);
 
       const blendSelect = document.getElementById("blend-filter");
 blendSet.forEach(b => {
@@ -317,27 +364,17 @@ window.populateMaterialDropdown();
       }
 
       window.applyFilters = function () {
-        const blendValue = document.getElementById("blend-filter")?.value?.trim().toLowerCase();
-        const featureValue = document.getElementById("feature-filter")?.value?.trim().toLowerCase();
+        const blendValue = document.getElementById("blend-filter")?.value?.trim();
+        const featureValue = document.getElementById("feature-filter")?.value?.trim();
         const clusterValue = document.getElementById("cluster-filter")?.value?.trim().toLowerCase();
-        const mixFilters = getMixFilterValues();
 
-        allBoxes.forEach(box => {
-          const matchBlend = !blendValue || box.dataset.blend.toLowerCase().includes(blendValue);
-          const matchFeature = !featureValue || box.dataset.features.toLowerCase().includes(featureValue);
-
-          const matchCluster = !clusterValue ||
-            (clusterValue === "clustered" && box.dataset.cluster) ||
-            (clusterValue === "unclustered" && !box.dataset.cluster);
-
-          const blendMap = JSON.parse(box.dataset.blendMap || "{}");
-          const matchMix = mixFilters.every(filter => {
-            const val = blendMap[filter.htype] || 0;
-            return val >= filter.min && val <= filter.max;
-          });
-
-          box.style.display = (matchBlend && matchFeature && matchCluster && matchMix) ? "block" : "none";
-        });
+        // find_similar ile aynı filtre biçimi; eleme sunucuda yapılır
+        currentFilters = {
+          features: [blendValue, featureValue].filter(Boolean),
+          cluster: clusterValue || "",
+          mixFilters: getMixFilterValues().map(f => ({ type: f.htype, min: f.min, max: f.max }))
+        };
+        loadPage(true);
       };
 
       document.getElementById("blend-filter")?.addEventListener("change", applyFilters);
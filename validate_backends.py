@@ -0,0 +1,147 @@
+# validate_backends.py
+# Oluşturulma: 2025-05-10
+# Hazırlayan: Kafkas
+# Açıklama:
+# inference_backends.py içindeki çıkarım backend'lerini eager (float32) modele karşı ölçer.
+# Katalogdan sabit tohumla seçilen örnek görseller her backend ile gömülür ve raporlanır:
+# - çıkarım hızı (görsel/s, yalnızca ileri geçiş süresi)
+# - kosinüs uyumu: aynı görselin backend vektörü ile eager vektörü arasındaki kosinüs (ortalama / en düşük)
+# - top-k örtüşmesi: örnekteki her görsel için (kendisi hariç) en yakın k komşunun eager komşularıyla
+#   ortak oranı (ortalama / en düşük); arama sonuçlarının ne kadar değiştiğini doğrudan gösterir
+# Hedef örtüşmeyi sağlayan en hızlı backend önerilir (extract_features.py --backend ile kullanılır).
+# Kurulu olmayan backend'ler (ör. onnxruntime yoksa onnx / int8-dynamic) uyarıyla atlanır.
+#
+# Kullanım:
+#   python validate_backends.py --model pattern --sample 1000 --k 20 --target-overlap 0.95
+#   python validate_backends.py --backends torchscript,int8-static --sample 0 --out backend_report.json
+
+import os
+import argparse
+import numpy as np
+
+import similarity_index as si
+from atomic_io import atomic_write_json
+from embedding_model import MODEL_TYPES
+from extract_features import (BatchEmbedder, list_images, INPUT_FOLDER, BATCH_SIZE, NUM_WORKERS,
+                              TORCH_THREADS)
+from inference_backends import BACKENDS, INT8_STATIC_PATH
+
+
+def sample_images(input_folder, n, seed=0):
+    """Katalogdan sabit tohumla n görsel (0 = hepsi); sıralı döner."""
+    filenames = list_images(input_folder)
+    if n <= 0 or n >= len(filenames):
+        return filenames
+    rng = np.random.default_rng(seed)
+    return sorted(filenames[i] for i in rng.choice(len(filenames), n, replace=False))
+
+
+def embed_sample(backend, model_type, input_folder, filenames, batch_size, num_workers, threads):
+    """(vektörler [n × boyut], geçerli mi maskesi, çıkarım saniyesi) döner."""
+    embedder = BatchEmbedder((model_type,), batch_size, num_workers, threads, backend)
+    # int8-static: katalog çıkarımının kaydettiği kalibre model ölçülür; henüz yoksa örnekle kalibre edilir
+    # ama kaydedilmez (kalibrasyon extract_features.py'nin işidir)
+    embedder.calibrated_path = INT8_STATIC_PATH if os.path.exists(INT8_STATIC_PATH) else None
+    vectors, valid = None, np.zeros(len(filenames), dtype=bool)
+    for rows, vecs, ok in embedder.embed(input_folder, filenames):
+        if vectors is None:
+            vectors = np.zeros((len(filenames), vecs.shape[2]), dtype=np.float32)
+        vectors[rows] = vecs[:, 0]
+        valid[rows] = ok
+    return vectors, valid, embedder.infer_seconds
+
+
+def neighbours(vectors, metric, k):
+    """Her satırın (kendisi hariç) en yakın k komşusu."""
+    prepared = si.prepare_vectors(vectors, metric)
+    sq_norms = si.squared_norms(prepared)
+    results = si.exact_search_batch(prepared, sq_norms, prepared, metric, k + 1)
+    return [[r for r in rows.tolist() if r != i][:k] for i, (rows, _) in enumerate(results)]
+
+
+def compare(reference, vectors, reference_nn, metric, k):
+    """Kosinüs uyumu ve top-k örtüşme istatistikleri."""
+    a = si.prepare_vectors(reference, "cosine")
+    b = si.prepare_vectors(vectors, "cosine")
+    cosines = np.einsum("ij,ij->i", a, b)
+    nn = neighbours(vectors, metric, k)
+    overlaps = np.array([len(set(x).intersection(y)) / max(1, len(x)) for x, y in zip(reference_nn, nn)])
+    return {
+        "cosine_mean": float(cosines.mean()),
+        "cosine_min": float(cosines.min()),
+        "overlap_mean": float(overlaps.mean()),
+        "overlap_min": float(overlaps.min()),
+    }
+
+
+def validate(model_type, backends, input_folder=INPUT_FOLDER, n_sample=1000, k=20, metric="cosine",
+             batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, threads=TORCH_THREADS, seed=0):
+    filenames = sample_images(input_folder, n_sample, seed)
+    if len(filenames) <= k:
+        raise ValueError(f"Örnek ({len(filenames)} görsel) k={k} için çok küçük")
+    print(f"🧪 {model_type}: {len(filenames)} görsel, metric={metric}, k={k}")
+
+    runs = {}
+    for backend in ["eager"] + [b for b in backends if b != "eager"]:
+        try:
+            runs[backend] = embed_sample(backend, model_type, input_folder, filenames,
+                                         batch_size, num_workers, threads)
+        except (ImportError, RuntimeError) as e:
+            if backend == "eager":
+                raise
+            print(f"⚠️ {backend} atlandı: {e}")
+
+    # Yalnızca tüm backend'lerde açılabilen görseller karşılaştırılır
+    valid = np.logical_and.reduce([run[1] for run in runs.values()])
+    reference = runs["eager"][0][valid]
+    reference_nn = neighbours(reference, metric, k)
+    count = int(valid.sum())
+
+    report = {"model": model_type, "metric": metric, "k": k, "images": count, "backends": {}}
+    for backend, (vectors, _, seconds) in runs.items():
+        result = {"images_per_second": len(filenames) / seconds if seconds > 0 else 0.0,
+                  **compare(reference, vectors[valid], reference_nn, metric, k)}
+        report["backends"][backend] = result
+        print(f"   {backend:<13} {result['images_per_second']:>8.1f} görsel/s  "
+              f"kosinüs ort={result['cosine_mean']:.5f} min={result['cosine_min']:.5f}  "
+              f"top-{k} örtüşme ort={result['overlap_mean']:.4f} min={result['overlap_min']:.4f}")
+    return report
+
+
+def pick_backend(report, target_overlap):
+    """Ortalama top-k örtüşmesi hedefi sağlayan en hızlı backend."""
+    passing = {b: r for b, r in report["backends"].items() if r["overlap_mean"] >= target_overlap}
+    return max(passing, key=lambda b: passing[b]["images_per_second"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Çıkarım backend'lerinin eager modele göre doğruluk / hız ölçümü")
+    parser.add_argument("--model", default="pattern", choices=list(MODEL_TYPES))
+    parser.add_argument("--backends", default=",".join(b for b in BACKENDS if b != "eager"))
+    parser.add_argument("--metric", default="cosine", choices=list(si.METRICS))
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--sample", type=int, default=1000, help="Örnek görsel sayısı (0 = tüm katalog)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--threads", type=int, default=TORCH_THREADS)
+    parser.add_argument("--target-overlap", type=float, default=0.95)
+    parser.add_argument("--out", help="Raporu JSON olarak kaydet")
+    args = parser.parse_args()
+
+    backends = [b for b in args.backends.split(",") if b]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Geçersiz backend: {', '.join(sorted(unknown))}")
+
+    report = validate(args.model, backends, n_sample=args.sample, k=args.k, metric=args.metric,
+                      batch_size=args.batch_size, num_workers=args.workers, threads=args.threads)
+    report["recommended"] = pick_backend(report, args.target_overlap)
+    print(f"✅ Önerilen backend (top-{args.k} örtüşme ≥ {args.target_overlap}): {report['recommended']}")
+
+    if args.out:
+        atomic_write_json(args.out, report, indent=2)
+        print(f"💾 Rapor kaydedildi → {args.out}")
+
+
+if __name__ == "__main__":
+    main()